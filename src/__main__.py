@@ -0,0 +1,66 @@
+# __main__.py
+"""Runs the pipeline from the command line, see `src.pipeline`:
+
+    python -m src --raw-comments data/raw/new_character_reveal_comments.csv
+    python -m src --help
+
+"""
+
+import argparse
+
+from src.pipeline import STAGES, PipelineConfig, run_pipeline
+
+
+def main(args=None):
+    """Parses the command line arguments and runs the pipeline."""
+    defaults = PipelineConfig()
+    parser = argparse.ArgumentParser(prog="python -m src",
+                                     description="Fetch, clean, annotate, vectorize, model and report on YouTube "
+                                                 "comments, reusing the cached output of unchanged stages.")
+
+    source = parser.add_argument_group("fetch")
+    source.add_argument("--raw-comments", help="a CSV or Parquet file of comments to use instead of the YouTube API")
+    source.add_argument("--channel-id", dest="channel_ids", action="append", default=[],
+                        help="a channel to search for videos (can be given more than once)")
+    source.add_argument("--published-after", help="RFC 3339 date-time, e.g. 2023-11-01T00:00:00Z")
+    source.add_argument("--published-before", help="RFC 3339 date-time, e.g. 2023-12-21T00:00:00Z")
+    source.add_argument("--search-term")
+    source.add_argument("--video-title", help="only fetch comments for videos whose title contains this")
+    source.add_argument("--fetch-date", help="the date (YYYY-MM-DD) a fetch from the API is cached for, defaults to "
+                                             "today so the comments are fetched again each day")
+    source.add_argument("--max-workers", type=int, default=defaults.max_workers)
+
+    processing = parser.add_argument_group("clean and annotate")
+    processing.add_argument("--min-length", type=int, default=defaults.min_length)
+    processing.add_argument("--batch-size", type=int, default=defaults.batch_size)
+    processing.add_argument("--n-process", type=int, default=defaults.n_process)
+
+    modeling = parser.add_argument_group("vectorize, model and report")
+    modeling.add_argument("--no-below", type=int, default=defaults.no_below)
+    modeling.add_argument("--no-above", type=float, default=defaults.no_above)
+    modeling.add_argument("--keep-n", type=int, default=defaults.keep_n)
+    modeling.add_argument("--model", choices=("nmf", "lda"), default=defaults.model)
+    modeling.add_argument("--num-topics", type=int, default=defaults.num_topics)
+    modeling.add_argument("--random-state", type=int, default=defaults.random_state)
+    modeling.add_argument("--number-of-words", type=int, default=defaults.number_of_words)
+
+    run = parser.add_argument_group("run")
+    run.add_argument("--until", choices=STAGES, default="report", help="the last stage to run")
+    run.add_argument("--force", choices=STAGES, action="append", default=[],
+                     help="run a stage (and the stages after it) even if its output is cached")
+    run.add_argument("--output-dir", default=defaults.output_dir)
+    run.add_argument("--cache-dir", default=defaults.cache_dir)
+    run.add_argument("--trace-memory", action="store_true", help="also measure Python's peak memory per stage")
+
+    args = vars(parser.parse_args(args))
+    until = args.pop("until")
+    force = args.pop("force")
+
+    if args["raw_comments"] is None and not args["channel_ids"]:
+        parser.error("give --raw-comments or at least one --channel-id")
+
+    run_pipeline(PipelineConfig(**args), until=until, force=force)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,187 @@
+# batch_sink.py
+"""Module contains a sink that writes batches of rows (e.g. the pages yielded by
+`iter_top_level_comments`) to a CSV or Parquet file incrementally, as each one arrives:
+
+    `BatchSink(path, schema)`
+    `arrow_schema(columns, dtypes)`
+
+Example
+--------
+    from src.api.batch_sink import BatchSink
+    from src.api.get_youtube_data import iter_top_level_comments
+
+    with BatchSink("data/raw/new_character_reveal_comments.parquet", schema="comments") as sink:
+        for page in sink.stream(iter_top_level_comments(youtube, video_ids)):
+            clean(page)   # each page is written and then cleaned before the next page is requested
+
+"""
+
+from pathlib import Path
+
+
+# columns holding a list of strings for each row
+_LIST_COLUMNS = {"tags"}
+
+
+class BatchSink:
+    """Appends batches of rows to a CSV or Parquet file, so nothing needs to be kept in memory
+    between batches. The file is overwritten when the sink is opened.
+
+    Parameters
+    ----------
+    path : str or Path
+        The file to write to, the format is chosen from the extension (".csv" or ".parquet").
+
+    schema : str or pyarrow Schema
+        The Parquet schema every batch is written with: "comments", "replies" or "videos" for the
+        dataframes returned by `src.api.get_youtube_data` (see `arrow_schema`), or any pyarrow
+        Schema. None to use the schema of the first batch with any rows, which fails for later
+        batches if a column of that batch is all missing values. Not used for CSV files.
+
+    Notes
+    ------
+    Writing Parquet needs `pyarrow`. Empty batches are skipped until the schema is known, so a
+    video without comments doesn't decide the schema.
+
+    """
+
+    def __init__(self, path, schema=None):
+        self.path = Path(path)
+        self.rows_written = 0
+
+        if self.path.suffix not in (".csv", ".parquet"):
+            raise ValueError(f"Unsupported file type '{self.path.suffix}', use '.csv' or '.parquet'.")
+
+        self._parquet_writer = None
+        self._schema = _resolve_schema(schema) if self.path.suffix == ".parquet" else None
+        self._header_written = False
+
+        # overwrite the file now, so a run that writes no batches doesn't leave the last run's rows
+        if self.path.suffix == ".csv":
+            self.path.write_text("")
+        elif self._schema is not None:
+            self._open_parquet_writer()
+        else:
+            self.path.unlink(missing_ok=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def write(self, batch):
+        """Appends a batch of rows to the file.
+
+        Parameters
+        ----------
+        batch : dataframe
+            The rows to write.
+
+        Returns
+        -------
+        None
+
+        """
+        if self.path.suffix == ".csv":
+            batch.to_csv(self.path, mode="a", header=not self._header_written, index=False)
+            self._header_written = True
+        elif len(batch) or self._schema is not None:
+            self._write_parquet(batch)
+
+        self.rows_written += len(batch)
+
+    def stream(self, batches):
+        """Writes each batch to the file and then yields it, so the batches can be processed one at a
+        time as they arrive while still being saved. The batches are taken from `batches` one at a 
+        time, so the next one isn't fetched while the current one is being written or processed.
+
+        Parameters
+        ----------
+        batches : iterable of dataframes
+            The batches of rows.
+
+        Yields
+        -------
+        batch : dataframe
+            Each batch, once it has been written.
+
+        """
+        for batch in batches:
+            self.write(batch)
+            yield batch
+
+    def close(self):
+        """Finishes writing the file."""
+        if self._parquet_writer is not None:
+            self._parquet_writer.close()
+            self._parquet_writer = None
+
+    def _open_parquet_writer(self):
+        """Helper method that starts the Parquet file with the sink's schema."""
+        import pyarrow.parquet as pq
+
+        self._parquet_writer = pq.ParquetWriter(self.path, self._schema)
+
+    def _write_parquet(self, batch):
+        """Helper method that writes a batch to the Parquet file as a new row group."""
+        import pyarrow as pa
+
+        if self._schema is None:
+            table = pa.Table.from_pandas(batch, preserve_index=False)
+            self._schema = table.schema
+        else:
+            # columns of an empty batch are float64 (pandas' default), which can't be converted
+            table = pa.Table.from_pandas(batch if len(batch) else batch.astype(object), schema=self._schema,
+                                         preserve_index=False)
+
+        if self._parquet_writer is None:
+            self._open_parquet_writer()
+
+        self._parquet_writer.write_table(table)
+
+
+def arrow_schema(columns, dtypes):
+    """Builds the Parquet schema for one of the dataframes returned by `src.api.get_youtube_data`.
+
+    Parameters
+    ----------
+    columns : list of str
+        The columns, e.g. `COMMENT_COLUMNS`.
+
+    dtypes : dict
+        The dtypes the columns are converted to, e.g. `COMMENT_DTYPES`. Columns without one hold
+        strings (or, for "tags", lists of strings).
+
+    Returns
+    -------
+    schema : pyarrow Schema
+        The schema, with timestamps as UTC and counts as (nullable) 64 bit integers.
+
+    """
+    import pyarrow as pa
+
+    types = {"datetime64[ns, UTC]": pa.timestamp("ns", tz="UTC"), "int64": pa.int64(), "Int64": pa.int64()}
+
+    return pa.schema([(column, types[dtypes[column]] if column in dtypes
+                       else pa.list_(pa.string()) if column in _LIST_COLUMNS else pa.string())
+                      for column in columns])
+
+
+def _resolve_schema(schema):
+    """Helper function that returns the pyarrow Schema for a `schema` argument. Used as a helper for
+    `BatchSink`.
+
+    """
+    if not isinstance(schema, str):
+        return schema
+
+    from src.api import get_youtube_data
+
+    schemas = {"comments": (get_youtube_data.COMMENT_COLUMNS, get_youtube_data.COMMENT_DTYPES),
+               "replies": (get_youtube_data.REPLY_COLUMNS, get_youtube_data.REPLY_DTYPES),
+               "videos": (get_youtube_data.VIDEO_COLUMNS, get_youtube_data.VIDEO_DTYPES)}
+    if schema not in schemas:
+        raise ValueError(f"Unknown schema '{schema}', use one of {list(schemas)} or a pyarrow Schema.")
+
+    return arrow_schema(*schemas[schema])
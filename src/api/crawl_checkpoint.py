@@ -0,0 +1,113 @@
+# crawl_checkpoint.py
+"""Module contains a checkpoint store that records each page received from the YouTube API, so a
+crawl that stops part way through (e.g. a crash or running out of quota) can be resumed without
+requesting the same pages again:
+
+    `CrawlCheckpoint(path)`
+
+Example
+--------
+    from src.api.crawl_checkpoint import CrawlCheckpoint
+    from src.api.get_youtube_data import get_top_level_comments
+
+    checkpoint = CrawlCheckpoint("data/raw/crawl_checkpoint.sqlite")
+    df = get_top_level_comments(youtube, video_ids, checkpoint=checkpoint, resume=True)
+
+"""
+
+import json
+import sqlite3
+import threading
+
+
+class CrawlCheckpoint:
+    """Stores the responses received for each stream of pages in a SQLite database. A stream is
+    one paginated request, e.g. the commentThreads for one video, identified by a string key.
+
+    The next page token of a stream is the `nextPageToken` of its last stored page, and a stream
+    is complete when its last stored page doesn't have one.
+
+    Parameters
+    ----------
+    path : str or Path
+        The path of the SQLite database, it is created if it doesn't exist.
+
+    Notes
+    ------
+    The store can be shared by several threads.
+
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute("CREATE TABLE IF NOT EXISTS pages "
+                                 "(stream TEXT NOT NULL, page_number INTEGER NOT NULL, response TEXT NOT NULL, "
+                                 "PRIMARY KEY (stream, page_number))")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def pages(self, stream):
+        """Returns the pages stored for a stream.
+
+        Parameters
+        ----------
+        stream : str
+            The key of the stream.
+
+        Returns
+        -------
+        responses : list
+            The stored responses, in the order they were received.
+
+        """
+        with self._lock:
+            rows = self._connection.execute("SELECT response FROM pages WHERE stream = ? ORDER BY page_number",
+                                            (stream,)).fetchall()
+
+        return [json.loads(response) for response, in rows]
+
+    def add_page(self, stream, page_number, response):
+        """Stores a page of a stream.
+
+        Parameters
+        ----------
+        stream : str
+            The key of the stream.
+
+        page_number : int
+            The position of the page in the stream, starting from 0.
+
+        response : dict
+            The response received for the page.
+
+        Returns
+        -------
+        None
+
+        """
+        with self._lock, self._connection:
+            self._connection.execute("INSERT OR REPLACE INTO pages (stream, page_number, response) VALUES (?, ?, ?)",
+                                     (stream, page_number, json.dumps(response)))
+
+    def clear(self, stream):
+        """Removes the pages stored for a stream, so it is fetched again from the first page."""
+        with self._lock, self._connection:
+            self._connection.execute("DELETE FROM pages WHERE stream = ?", (stream,))
+
+    def is_complete(self, stream):
+        """Returns True if every page of the stream has been stored."""
+        with self._lock:
+            row = self._connection.execute("SELECT response FROM pages WHERE stream = ? "
+                                           "ORDER BY page_number DESC LIMIT 1", (stream,)).fetchone()
+
+        return row is not None and json.loads(row[0]).get("nextPageToken") is None
+
+    def close(self):
+        """Closes the connection to the database."""
+        self._connection.close()
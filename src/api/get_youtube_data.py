@@ -2,18 +2,68 @@
 """Module contains functions that connect to the YouTube API and retrieve video data.
 
 Functions include:
-    `get_video_ids(youtube_service_object, channel_id: str, published_after, published_before, search_term: str = None)`
-    `get_video_data(video_ids)`
-    `get_top_level_comments(youtube_service_object, video_ids)`
+    `get_video_ids(youtube_service_object, channel_id: str, published_after, published_before, search_term: str = None, checkpoint, resume, executor)`
+    `discover_video_ids(youtube_service_object, channel_ids, published_after, published_before, search_term, max_workers, service_factory, executor, checkpoint, resume, max_results, min_window)`
+    `get_video_data(video_ids, checkpoint, resume, executor)`
+    `get_top_level_comments(youtube_service_object, video_ids, max_workers, service_factory, executor, checkpoint, resume, since, include_replies)`
+    `get_comment_replies(youtube_service_object, parent_ids, max_workers, service_factory, executor, checkpoint, resume)`
+    `iter_top_level_comments(youtube_service_object, video_ids, executor, checkpoint, resume)`
+    `iter_video_data(youtube_service_object, video_ids, checkpoint, resume, executor)`
+    `comment_high_water_marks(df)`
+    `upsert_comments(df, new_comments)`
+
+Each function can record the pages it receives in a `src.api.crawl_checkpoint.CrawlCheckpoint` and,
+with `resume=True`, continue a crawl that stopped part way through from where it stopped.
+
+Every request is made through a `src.api.request_executor.RequestExecutor`, which retries temporary 
+errors, can limit the rate quota is used at and can cache responses (`src.api.response_cache`). 
+Functions use `DEFAULT_EXECUTOR` (retries only) unless they are passed one.
 
 """
 
+import hashlib
+import threading
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
 import googleapiclient.discovery
 import pandas as pd
 from tqdm.notebook import tqdm
 
+from src.api.request_executor import QUOTA_COSTS, RequestExecutor
+
+
+# used by every request made without an executor being passed, its `quota_used` is the running 
+# total for the process
+DEFAULT_EXECUTOR = RequestExecutor()
+
+
+# the columns of the dataframe returned by `get_top_level_comments` and the dtypes they are converted to
+COMMENT_COLUMNS = ["commentId", "videoId", "authorDisplayName", "publishedAt", "updatedAt", "likeCount", "totalReplyCount", 
+                   "textDisplay"]
+COMMENT_DTYPES = {"publishedAt": "datetime64[ns, UTC]", 
+                  "updatedAt": "datetime64[ns, UTC]", 
+                  "likeCount": "int64", 
+                  "totalReplyCount": "int64"}
 
-def get_video_ids(youtube_service_object, channel_id: str, published_after, published_before, search_term: str = None):
+# the columns of the replies dataframe, `parentId` is the `commentId` of the top level comment replied to
+REPLY_COLUMNS = ["commentId", "parentId", "videoId", "authorDisplayName", "publishedAt", "updatedAt", "likeCount", 
+                 "textDisplay"]
+REPLY_DTYPES = {"publishedAt": "datetime64[ns, UTC]", 
+                "updatedAt": "datetime64[ns, UTC]", 
+                "likeCount": "int64"}
+
+# the columns of the dataframe returned by `get_video_data` and the dtypes they are converted to
+VIDEO_COLUMNS = ["channelTitle", "channelId", "videoId", "publishedAt", "title", "description", "tags", 
+                 "viewCount", "likeCount", "commentCount", "favoriteCount"]
+VIDEO_DTYPES = {"publishedAt": "datetime64[ns, UTC]", 
+                "viewCount": "Int64",   # nullable, as the counts are missing for some videos
+                "likeCount": "Int64", 
+                "commentCount": "Int64", 
+                "favoriteCount": "Int64"}
+
+
+def get_video_ids(youtube_service_object, channel_id: str, published_after, published_before, search_term: str = None, 
+                  checkpoint=None, resume: bool = False, executor=None):
     """Connects to the YouTube Data API using 'search' and returns video Ids for a specified request.
 
     
@@ -35,6 +85,15 @@ def get_video_ids(youtube_service_object, channel_id: str, published_after, publ
         A search term if you wish to narrow down the search using keywords. See Notes for 
         further information.
 
+    checkpoint : CrawlCheckpoint
+        Records each page of results received, None to not record them.
+
+    resume : bool
+        Whether to reuse the pages already recorded in `checkpoint` and only request the pages 
+        after them. When False any recorded pages are discarded and the search starts again.
+
+    executor : RequestExecutor
+        Makes the requests, defaults to `DEFAULT_EXECUTOR`.
 
 
     Returns
@@ -61,57 +120,176 @@ def get_video_ids(youtube_service_object, channel_id: str, published_after, publ
     
     """
     
-    # make a request to the youtube api
-    request = youtube_service_object.search().list(
-        channelId=channel_id,
-        publishedAfter=published_after,
-        publishedBefore=published_before,
-        q=search_term,
-        part="snippet", 
-        type="video",
-        order="date",
-        maxResults=50,
-    )
-    response = request.execute()
-    
+    pages = _iter_search_pages(youtube_service_object, channel_id, published_after, published_before, search_term, 
+                               executor, checkpoint, resume)
+
     video_ids = []
 
-    # loop through response and store video Ids in a list
-    for i, v in enumerate(range(len(response["items"]))):
-        video_ids.append(response["items"][i]["id"]["videoId"])
+    # loop through each page of the response and store video Ids in a list
+    for response in pages:
+        video_ids.extend(item["id"]["videoId"] for item in response["items"])
     
-    next_page_token = response.get("nextPageToken", None)
-    more_pages = True
-    
-    while more_pages == True:
-        if next_page_token is None:
-            more_pages = False
+    return video_ids
+
+
+
+def discover_video_ids(youtube_service_object, channel_ids, published_after, published_before, search_term: str = None,
+                       max_workers: int = 1, service_factory=None, executor=None, checkpoint=None, resume: bool = False,
+                       max_results: int = 500, min_window=pd.Timedelta(hours=1)):
+    """Searches several channels over a long date range, splitting the range into shorter windows 
+    wherever a search has more results than YouTube will return, and searching the windows at the
+    same time.
+
+    Parameters
+    ----------
+    youtube_service_object : googleapiclient object
+        a service object created using `googleapiclinet.discovery.build`
+
+    channel_ids : list or str
+        The ids of the YouTube channels you want to search for videos.
+
+    published_after : str or datetime
+        The start of the date range, e.g. an RFC 3339 formatted date-time value (1970-01-01T00:00:00Z).
+
+    published_before : str or datetime
+        The end of the date range, e.g. an RFC 3339 formatted date-time value (1970-01-01T00:00:00Z).
+
+    search_term : str
+        A search term if you wish to narrow down the search using keywords, see `get_video_ids`.
+
+    max_workers : int
+        The number of windows searched at the same time.
+
+    service_factory : callable
+        A function that returns a new service object, see `get_top_level_comments`. Required when 
+        `max_workers` is more than 1.
+
+    executor : RequestExecutor
+        Makes the requests, defaults to `DEFAULT_EXECUTOR`. It is shared by all the workers.
+
+    checkpoint : CrawlCheckpoint
+        Records each page of results received, None to not record them.
+
+    resume : bool
+        Whether to reuse the pages already recorded in `checkpoint`.
+
+    max_results : int
+        The most results a single search can return. A window whose first page reports more 
+        results than this (`pageInfo.totalResults`) is split in half and each half searched.
+
+    min_window : timedelta
+        Windows this short aren't split any further, all the results YouTube returns for them are used.
+
+    Returns
+    --------
+    video_ids : list
+        The video ids found, without duplicates. Ordered by channel (in the order of `channel_ids`) 
+        and then newest first.
+
+    Notes
+    ------
+    Each search request costs 100 units of quota, including the first page of a window that then 
+    has to be split. `totalResults` is only an estimate, so a window may still be cut short.
     
-        else: 
-            # make a request to the youtube api to get the next page results
-            request = youtube_service_object.search().list(
-            channelId=channel_id,
-            publishedAfter=published_after,
-            publishedBefore=published_before,
-            q=search_term,
-            part="snippet", 
-            type="video",
-            order="date",
-            maxResults=50,
-            pageToken=next_page_token
-            )
-            response = request.execute()
+    """
+    if isinstance(channel_ids, str):
+        channel_ids = [channel_ids]
+    _check_service_factory(max_workers, service_factory)
+
+    thread_data = threading.local()
+
+    def search(channel_id, window_start, window_end):
+        service = youtube_service_object
+        if service_factory is not None:
+            if not hasattr(thread_data, "service"):
+                thread_data.service = service_factory()
+            service = thread_data.service
+
+        can_split = window_end - window_start > min_window
+        pages = _iter_search_pages(service, channel_id, _rfc3339(window_start), _rfc3339(window_end), search_term, 
+                                   executor, checkpoint, resume)
+
+        video_ids = []
+        for response in pages:
+            if can_split and not video_ids and response.get("pageInfo", {}).get("totalResults", 0) > max_results:
+                pages.close()
+                return None   # too many results, the window needs splitting
+
+            video_ids.extend(item["id"]["videoId"] for item in response["items"])
+
+        return video_ids
+
+    start = _to_utc(published_after)
+    end = _to_utc(published_before)
+    window_video_ids = {}   # the video ids found in each window, keyed by (channel position, window start)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        pending = {pool.submit(search, channel_id, start, end): (index, channel_id, start, end) 
+                   for index, channel_id in enumerate(channel_ids)}
+
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+
+            for future in done:
+                index, channel_id, window_start, window_end = pending.pop(future)
+                video_ids = future.result()
+
+                if video_ids is not None:
+                    window_video_ids[(index, window_start)] = video_ids
+                    continue
+
+                middle = (window_start + (window_end - window_start) / 2).floor("s")
+                for half_start, half_end in ((window_start, middle), (middle, window_end)):
+                    pending[pool.submit(search, channel_id, half_start, half_end)] = (index, channel_id, half_start, 
+                                                                                    half_end)
+
+    # newest window first within each channel, matching the order of `get_video_ids`. The windows 
+    # share their boundaries, so a video published on one may be found twice
+    windows = sorted(window_video_ids, key=lambda window: (window[0], -window[1].value))
+    return list(dict.fromkeys(video_id for window in windows for video_id in window_video_ids[window]))
+
+
+
+def _iter_search_pages(youtube_service_object, channel_id, published_after, published_before, search_term=None, 
+                       executor=None, checkpoint=None, resume=False):
+    """Helper function that yields each page of the search results for the videos published by a 
+    channel in a date range, newest first. Used as a helper for `get_video_ids` and 
+    `discover_video_ids`.
     
-            for i, v in enumerate(range(len(response["items"]))):
-                video_ids.append(response["items"][i]["id"]["videoId"])
-            
-            next_page_token = response.get("nextPageToken", None)
+    """
+    stream = f"search:{channel_id}:{published_after}:{published_before}:{search_term}"
+    return _iter_pages(youtube_service_object.search().list, executor, QUOTA_COSTS["search"], 
+                       checkpoint=checkpoint, stream=stream, resume=resume,
+                       channelId=channel_id,
+                       publishedAfter=published_after,
+                       publishedBefore=published_before,
+                       q=search_term,
+                       part="snippet", 
+                       type="video",
+                       order="date",
+                       maxResults=50)
+
+
+
+def _to_utc(date_time):
+    """Helper function that converts a date-time (or RFC 3339 string) to a UTC timestamp, treating 
+    a date-time without a timezone as UTC. Used as a helper for `discover_video_ids`.
     
-    return video_ids
+    """
+    date_time = pd.Timestamp(date_time)
+    return date_time.tz_localize("UTC") if date_time.tzinfo is None else date_time.tz_convert("UTC")
 
 
 
-def get_video_data(youtube_service_object, video_ids):
+def _rfc3339(date_time):
+    """Helper function that formats a UTC timestamp as an RFC 3339 date-time value, as used by the 
+    search endpoint. Used as a helper for `discover_video_ids`.
+    
+    """
+    return date_time.strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+def get_video_data(youtube_service_object, video_ids, checkpoint=None, resume: bool = False, executor=None):
     """Retrieves statistics for a given YouTube video ID and creates a dataframe with data for the
     videos that contain "tekken" in the title.
 
@@ -123,14 +301,27 @@ def get_video_data(youtube_service_object, video_ids):
     video_ids : list or str
         A list of video IDs or a single string if only wanting to return data for one video ID.
 
+    checkpoint : CrawlCheckpoint
+        Records the responses received for each batch of video IDs, None to not record them.
+
+    resume : bool
+        Whether to reuse the batches already recorded in `checkpoint` rather than requesting them
+        again.
+
+    executor : RequestExecutor
+        Makes the requests, defaults to `DEFAULT_EXECUTOR`.
+
     Returns
     --------
     df : dataframe
         A dataframe with the data for video Ids whose title contains the word "tekken".
     
     """
+    if isinstance(video_ids, str):
+        video_ids = [video_ids]
 
-    all_data_dict = {}
+    # one list per column, so the dataframe is only built (and its dtypes converted) once at the end
+    videos = {column: [] for column in VIDEO_COLUMNS}
     
     # split video_ids list into batches of 50 and process each batch using helper function
     for index, batch_start in tqdm(enumerate(range(0, len(video_ids), 50))):
@@ -140,19 +331,12 @@ def get_video_data(youtube_service_object, video_ids):
         batch_ids = video_ids[batch_start:batch_end]
 
         # get data for the batch of <=50 video ids using helper function
-        batch_data = _get_video_data_for_batch(youtube_service_object, batch_ids)
-        all_data_dict.update(batch_data)
-
-
-    # create dataframe from dictionary data
-    df = (pd.DataFrame.from_dict(all_data_dict, orient="index")
-          .rename_axis("videoId")
-          .astype({"publishedAt": "datetime64[ns, UTC]", 
-                           "viewCount": "int64", 
-                           "likeCount": "int64", 
-                           "commentCount": "int64", 
-                           "favoriteCount": "int64"})
-          .drop_duplicates(subset=['videoId'])
+        _get_video_data_for_batch(youtube_service_object, batch_ids, videos, executor, checkpoint, resume)
+
+    # create dataframe from the columns, keeping the latest data for a video ID requested more than once
+    df = (pd.DataFrame(videos, columns=VIDEO_COLUMNS)
+          .drop_duplicates(subset=['videoId'], keep="last")
+          .astype(VIDEO_DTYPES)
           .sort_values(by=["publishedAt"])
           .reset_index(drop=True)
          )
@@ -166,194 +350,673 @@ def get_video_data(youtube_service_object, video_ids):
 
 
 
-def _get_video_data_for_batch(youtube_service_object, video_ids):
-    """Helper function that retrieves statistics for a given YouTube video ID, in batches 
-    of 50 video ids at a time.
+def _get_video_data_for_batch(youtube_service_object, video_ids, videos, executor=None, checkpoint=None, resume=False):
+    """Helper function that retrieves statistics for a batch of (up to 50) YouTube video IDs and 
+    appends them to the column lists in `videos`.
 
     Parameters
     ----------
     youtube_service_object : googleapiclient object
         a service object created using `googleapiclinet.discovery.build`
     
+    video_ids : list
+        A list of (up to 50) video IDs.
+
+    videos : dict
+        A list for each column in `VIDEO_COLUMNS`, the data for each video is appended to them.
+
+    executor : RequestExecutor
+        Makes the requests, defaults to `DEFAULT_EXECUTOR`.
+
+    checkpoint : CrawlCheckpoint
+        Records the responses received, None to not record them.
+
+    resume : bool
+        Whether to reuse the responses already recorded in `checkpoint`.
+
+    Returns
+    -------
+    None
+    
+    """
+    stream = "videos:" + hashlib.sha1(",".join(video_ids).encode("utf-8")).hexdigest()
+    pages = _iter_pages(youtube_service_object.videos().list, executor, QUOTA_COSTS["videos"], 
+                        checkpoint=checkpoint, stream=stream, resume=resume,
+                        part="snippet,statistics",
+                        maxResults=50,
+                        id=video_ids)
+
+    for response in pages:
+        _append_videos(videos, response)
+
+
+
+def _append_videos(videos, response):
+    """Helper function that appends the values for each video in a videos response to the column 
+    lists in `videos`. Used as a helper for `_get_video_data_for_batch`.
+    
+    """
+    (channel_titles, channel_ids, video_ids, published, titles, descriptions, tags, 
+     views, likes, comments, favorites) = videos.values()
+
+    for item in response["items"]:
+        snippet = item["snippet"]
+        statistics = item.get("statistics", {})
+        channel_titles.append(snippet["channelTitle"])
+        channel_ids.append(snippet["channelId"])
+        video_ids.append(item["id"])
+        published.append(snippet["publishedAt"])
+        titles.append(snippet["title"])
+        descriptions.append(snippet["description"])
+        tags.append(snippet.get("tags"))   # use .get() so none is returned if 'tags' isn't present (video doesn't have tags)
+        # counts are missing when hidden (likes) or disabled (comments)
+        views.append(statistics.get("viewCount"))
+        likes.append(statistics.get("likeCount"))
+        comments.append(statistics.get("commentCount"))
+        favorites.append(statistics.get("favoriteCount"))
+
+
+
+def get_top_level_comments(youtube_service_object, video_ids, max_workers: int = 1, service_factory=None, 
+                           executor=None, checkpoint=None, resume: bool = False, since: dict = None, 
+                           include_replies: bool = False):
+    """Retrieves the commentThreads for a given YouTube video ID or list of video IDs.
+
+    Parameters
+    ----------
+    youtube_service_object : googleapiclient object
+        a service object created using `googleapiclinet.discovery.build`
+
     video_ids : list or str
         A list of video IDs or a single string if only wanting to return data for one video ID.
 
+    max_workers : int
+        The number of videos whose comments are fetched at the same time. The pages of comments for
+        each video are always fetched one after another.
+
+    service_factory : callable
+        A function that returns a new service object, e.g. 
+        `lambda: googleapiclient.discovery.build("youtube", "v3", developerKey=API_KEY)`. Each worker
+        thread uses its own service object, as the http object used by `googleapiclient` isn't 
+        thread safe. Required when `max_workers` is more than 1.
+
+    executor : RequestExecutor
+        Makes the requests, defaults to `DEFAULT_EXECUTOR`. It is shared by all the workers, so its 
+        rate limit applies to the requests made by all of them.
+
+    checkpoint : CrawlCheckpoint
+        Records each page of comments received, None to not record them.
+
+    resume : bool
+        Whether to reuse the pages already recorded in `checkpoint` and only request the pages 
+        after them. When False any recorded pages are discarded and each video starts again. The 
+        pages of a crawl with `since` are recorded separately from those of a full crawl, so only 
+        a crawl with the same high-water mark is resumed.
+
+    since : dict
+        The publishedAt of the newest comment already stored for each video ID (see 
+        `comment_high_water_marks`), for only fetching the comments added since the last crawl. 
+        Paging stops at the first page reaching a comment published before this time, and only 
+        comments published at or after it are returned. Videos not in the dictionary are fetched 
+        in full. Combine the result with the stored comments using `upsert_comments`.
+
+        Edits to older comments are not picked up: the API only orders comments by when they were 
+        published, so an older comment edited since the last crawl is only returned if it happens 
+        to be on the last page fetched. Fetch the video in full (leave it out of `since`) to 
+        refresh the edits.
+
+    include_replies : bool
+        Whether to also return the replies to the comments. The commentThreads response includes up 
+        to 5 replies for each comment, the rest are only requested (with `get_comment_replies`) for 
+        the comments with more replies than that.
+
     Returns
-    -------
-    data_dict : dictionary
-        A dictionary with the data for the passed video IDs.
+    --------
+    df : dataframe
+        A dataframe with the top level comments for the video ID, one row for each commentId, 
+        sorted by publishedAt. Different comments with the same text (e.g., "First") are all kept.
+
+    replies : dataframe
+        Only returned if `include_replies` is True. A dataframe with the columns in `REPLY_COLUMNS`,
+        linked to `df` by its parentId (the commentId of the comment replied to).
     
     """
- 
-    request = youtube_service_object.videos().list(
-        part="snippet,statistics",
-        maxResults=50,
-        id=video_ids
-    )
+
+    # check if the video_ids input is a single string or list
+    if isinstance(video_ids, str):
+        video_ids = [video_ids]
+    _check_service_factory(max_workers, service_factory)
+
+    thread_data = threading.local()
+
+    def get_comments(video_id):
+        service = youtube_service_object
+        if service_factory is not None:
+            if not hasattr(thread_data, "service"):
+                thread_data.service = service_factory()
+            service = thread_data.service
+
+        return _get_top_level_comments_for_video(service, video_id, executor, checkpoint, resume, 
+                                                 since.get(video_id) if since else None, include_replies)
+
+    # one list per column, so the dataframe is only built (and its dtypes converted) once at the end
+    comments = {column: [] for column in COMMENT_COLUMNS}
+    replies = {column: [] for column in REPLY_COLUMNS}
+    unfetched_replies = {}   # the comments whose replies weren't all included, mapped to their video ID
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        # map returns the results in the same order as video_ids, whichever video finishes first
+        video_comments = pool.map(get_comments, video_ids) if max_workers > 1 else map(get_comments, video_ids)
+
+        # loop through the video ids, adding the comments for each video
+        for video_comment_columns, video_reply_columns, video_unfetched_replies in video_comments:
+            for column, values in video_comment_columns.items():
+                comments[column].extend(values)
+            for column, values in video_reply_columns.items():
+                replies[column].extend(values)
+            unfetched_replies.update(video_unfetched_replies)
+
+    df = (pd.DataFrame(comments, columns=COMMENT_COLUMNS)
+          .astype(COMMENT_DTYPES)
+          .drop_duplicates(subset=["commentId"])
+          .sort_values(by=["publishedAt"], kind="stable")
+          .reset_index(drop=True)
+         )
+
+    if not include_replies:
+        return df
+
+    fetched_replies = get_comment_replies(youtube_service_object, unfetched_replies, max_workers, service_factory, 
+                                          executor, checkpoint, resume)
+    replies = (pd.concat([pd.DataFrame(replies, columns=REPLY_COLUMNS).astype(REPLY_DTYPES), fetched_replies], 
+                         ignore_index=True)
+               .sort_values(by=["publishedAt"], kind="stable")
+               .reset_index(drop=True)
+              )
     
-    response = request.execute()
+    return df, replies
+
+
+
+def get_comment_replies(youtube_service_object, parent_ids, max_workers: int = 1, service_factory=None, executor=None, 
+                        checkpoint=None, resume: bool = False):
+    """Retrieves every reply to a list of top level comments, fetching the replies for `max_workers`
+    comments at the same time.
+
+    Parameters
+    ----------
+    youtube_service_object : googleapiclient object
+        a service object created using `googleapiclinet.discovery.build`
+
+    parent_ids : list or dict
+        The commentIds of the top level comments, or a dictionary of commentId to videoId (the
+        videoId is used for any reply that doesn't include it).
+
+    max_workers : int
+        The number of comments whose replies are fetched at the same time.
+
+    service_factory : callable
+        A function that returns a new service object, see `get_top_level_comments`. Required when 
+        `max_workers` is more than 1.
+
+    executor : RequestExecutor
+        Makes the requests, defaults to `DEFAULT_EXECUTOR`. It is shared by all the workers.
+
+    checkpoint : CrawlCheckpoint
+        Records each page of replies received, None to not record them.
+
+    resume : bool
+        Whether to reuse the pages already recorded in `checkpoint` and only request the pages 
+        after them.
+
+    Returns
+    --------
+    df : dataframe
+        A dataframe with the columns in `REPLY_COLUMNS`, sorted by publishedAt.
+
+    Notes
+    ------
+    The comments endpoint only takes one parentId per request, so each comment needs at least one 
+    request (costing 1 unit of quota, with up to 100 replies per page).
     
-    data_dict = {}
+    """
+    if isinstance(parent_ids, str):
+        parent_ids = [parent_ids]
+    if not isinstance(parent_ids, dict):
+        parent_ids = dict.fromkeys(parent_ids)
+    _check_service_factory(max_workers, service_factory)
+
+    thread_data = threading.local()
+
+    def get_replies(parent_id):
+        service = youtube_service_object
+        if service_factory is not None:
+            if not hasattr(thread_data, "service"):
+                thread_data.service = service_factory()
+            service = thread_data.service
+
+        parent_replies = {column: [] for column in REPLY_COLUMNS}
+        for response in _iter_pages(service.comments().list, executor, QUOTA_COSTS["comments"], 
+                                    checkpoint=checkpoint, stream=f"comments:{parent_id}", resume=resume,
+                                    part="snippet",
+                                    parentId=parent_id,
+                                    maxResults=100):
+            _append_replies(parent_replies, response["items"], parent_ids[parent_id])
+
+        return parent_replies
+
+    replies = {column: [] for column in REPLY_COLUMNS}
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        parent_replies = pool.map(get_replies, parent_ids) if max_workers > 1 else map(get_replies, parent_ids)
+
+        for parent_reply_columns in parent_replies:
+            for column, values in parent_reply_columns.items():
+                replies[column].extend(values)
+
+    df = (pd.DataFrame(replies, columns=REPLY_COLUMNS)
+          .astype(REPLY_DTYPES)
+          .sort_values(by=["publishedAt"], kind="stable")
+          .reset_index(drop=True)
+         )
+
+    return df
+
+
+
+def _check_service_factory(max_workers, service_factory):
+    """Helper function that raises a ValueError if several workers would share one service object.
+    Used as a helper for the functions that take `max_workers`.
+
+    """
+    if max_workers > 1 and service_factory is None:
+        raise ValueError("A service_factory is needed when max_workers is more than 1, the googleapiclient "
+                         "service object isn't thread safe so each worker needs its own.")
+
+
+def _get_top_level_comments_for_video(youtube_service_object, video_id, executor=None, checkpoint=None, resume=False, 
+                                      since=None, include_replies=False):
+    """Helper function that retrieves every page of top level comments for a single video ID.
+
+    Parameters
+    ----------
+    youtube_service_object : googleapiclient object
+        a service object created using `googleapiclinet.discovery.build`
+
+    video_id : str
+        The video ID.
+
+    executor : RequestExecutor
+        Makes the requests, defaults to `DEFAULT_EXECUTOR`.
+
+    checkpoint : CrawlCheckpoint
+        Records each page of comments received, None to not record them.
+
+    resume : bool
+        Whether to reuse the pages already recorded in `checkpoint`.
+
+    since : timestamp
+        Only return the comments published at or after this time (or edited after it, for the 
+        older comments on the last page), and stop paging once a comment published before it is 
+        reached. None for every comment.
+
+    include_replies : bool
+        Whether to also request the replies included with each comment.
+
+    Returns
+    --------
+    comments : dict
+        A list of values for each column in `COMMENT_COLUMNS`.
+
+    replies : dict
+        A list of values for each column in `REPLY_COLUMNS`, for the comments whose replies were
+        all included. Empty if `include_replies` is False.
+
+    unfetched_replies : dict
+        The commentId of each comment with more replies than were included, mapped to the video ID.
     
-    # loop through response and store data about each video in a dictionary
-    for i, v in enumerate(response["items"]):
-        data_dict_ = {
-            response["items"][i]["id"]: {"channelTitle": response["items"][i]["snippet"]["channelTitle"],
-                                         "channelId": response["items"][i]["snippet"]["channelId"],
-                                         "videoId": response["items"][i]["id"],
-                                         "publishedAt": response["items"][i]["snippet"]["publishedAt"],
-                                         "title": response["items"][i]["snippet"]["title"],
-                                         "description": response["items"][i]["snippet"]["description"],
-                                         "tags": response["items"][0]["snippet"].get("tags"),   # use .get() so none is returned if 'tags' isn't present (video doesn't have tags)
-                                         "viewCount": response["items"][i]["statistics"]["viewCount"],
-                                         "likeCount": response["items"][i]["statistics"]["likeCount"],
-                                         "commentCount": response["items"][i]["statistics"]["commentCount"],
-                                         "favoriteCount": response["items"][i]["statistics"]["favoriteCount"],
-                                        }
-        }
-        
-        # add the data to the data dictionary
-        data_dict.update(data_dict_)
+    """
+    comments = {column: [] for column in COMMENT_COLUMNS}
+    replies = {column: [] for column in REPLY_COLUMNS}
+    unfetched_replies = {}
+
+    def append(response):
+        _append_comments(comments, response)
+        if include_replies:
+            unfetched_replies.update(_append_thread_replies(replies, response, video_id))
+
+    if since is None:
+        for response in _iter_comment_pages(youtube_service_object, video_id, executor, checkpoint, resume, 
+                                            include_replies=include_replies):
+            append(response)
+
+        return comments, replies, unfetched_replies
+
+    since = pd.Timestamp(since)
+    if since.tzinfo is None:
+        since = since.tz_localize("UTC")
+
+    def reached_stored_comments(response):
+        # comments are ordered newest first, so only the last comment on a page needs checking
+        return bool(response["items"]) and _comment_time(response["items"][-1], "publishedAt") < since
+
+    for response in _iter_comment_pages(youtube_service_object, video_id, executor, checkpoint, resume,
+                                        stop=reached_stored_comments, include_replies=include_replies, since=since):
+        items = [item for item in response["items"] 
+                 if _comment_time(item, "publishedAt") >= since or _comment_time(item, "updatedAt") > since]
+        append({"items": items})
+
+    return comments, replies, unfetched_replies
+
+
+
+def _comment_time(item, field):
+    """Helper function that returns the publishedAt or updatedAt time of a commentThreads item as a 
+    timestamp. Used as a helper for `_get_top_level_comments_for_video`.
+    
+    """
+    return pd.Timestamp(item["snippet"]["topLevelComment"]["snippet"][field])
+
+
+
+def _iter_comment_pages(youtube_service_object, video_id, executor=None, checkpoint=None, resume=False, stop=None,
+                        include_replies=False, since=None):
+    """Helper function that yields each page of the commentThreads response for a video ID, newest 
+    comments first. The pages of a delta crawl (`since` given) are recorded under their own stream, 
+    so resuming one never replays the pages of a full crawl or of a crawl since another time.
+    
+    """
+    part, stream = ("snippet,replies", f"commentThreads+replies:{video_id}") if include_replies else \
+                   ("snippet", f"commentThreads:{video_id}")
+    if since is not None:
+        stream += f"@{since.isoformat()}"
+    return _iter_pages(youtube_service_object.commentThreads().list, executor, QUOTA_COSTS["commentThreads"], 
+                       checkpoint=checkpoint, stream=stream, resume=resume, stop=stop,
+                       part=part,
+                       videoId=video_id,
+                       order="time",
+                       maxResults=50)
+
+
+
+def _iter_pages(list_method, executor=None, cost=1, checkpoint=None, stream=None, resume=False, stop=None, **parameters):
+    """Helper function that makes a request with the given parameters and yields the response, then
+    requests and yields each following page until there is no `nextPageToken`.
+
+    Parameters
+    ----------
+    list_method : callable
+        The `list` method of a resource, e.g. `youtube_service_object.commentThreads().list`.
+
+    executor : RequestExecutor
+        Makes the requests, defaults to `DEFAULT_EXECUTOR`.
+
+    cost : int
+        The number of quota units each request uses, see `QUOTA_COSTS`.
+
+    checkpoint : CrawlCheckpoint
+        Records each page received under the key `stream`, None to not record them.
+
+    stream : str
+        The key the pages are recorded under in `checkpoint`.
+
+    resume : bool
+        Whether to first yield the pages already recorded in `checkpoint`, then carry on from the
+        last recorded page's `nextPageToken`. When False the recorded pages are discarded.
+
+    stop : callable
+        Called with each response, no more pages are requested once it returns True.
+
+    **parameters
+        The parameters passed to `list_method` for every page.
+
+    Yields
+    -------
+    response : dict
+        The response for each page.
     
-    next_page_token = response.get("nextPageToken", None)
-    more_pages = True
+    """
+    executor = executor or DEFAULT_EXECUTOR
+    next_page_token = None
+    page_number = 0
+
+    if checkpoint is not None:
+        if resume:
+            for response in checkpoint.pages(stream):
+                yield response
+                page_number += 1
+                next_page_token = response.get("nextPageToken", None)
+                if next_page_token is None or (stop is not None and stop(response)):
+                    return
+        else:
+            checkpoint.clear(stream)
+
+    while True:
+        page_parameters = parameters if next_page_token is None else {**parameters, "pageToken": next_page_token}
+        response = executor.execute(list_method(**page_parameters), cost)
+
+        if checkpoint is not None:
+            checkpoint.add_page(stream, page_number, response)
+        yield response
+
+        page_number += 1
+        next_page_token = response.get("nextPageToken", None)
+        if next_page_token is None or (stop is not None and stop(response)):
+            return
+
+
+
+def _append_comments(comments, response):
+    """Helper function that appends the values for each comment in a commentThreads response to the 
+    column lists in `comments`. Used as a helper for `_get_top_level_comments_for_video`.
     
-    while more_pages == True:
-        if next_page_token is None:
-            more_pages = False
+    """
+    comment_ids, video_ids, authors, published, updated, likes, replies, texts = comments.values()
+
+    for item in response['items']:
+        comment = item['snippet']['topLevelComment']['snippet']
+        comment_ids.append(item['snippet']['topLevelComment']['id'])
+        video_ids.append(comment['videoId'])
+        authors.append(comment['authorDisplayName'])
+        published.append(comment['publishedAt'])
+        updated.append(comment['updatedAt'])
+        likes.append(comment['likeCount'])
+        replies.append(item['snippet']['totalReplyCount'])   # reply count not stored in same section of json response as all the others
+        texts.append(comment['textDisplay'])
+
+
+
+def _append_thread_replies(replies, response, video_id):
+    """Helper function that appends the replies included in a commentThreads response to the column
+    lists in `replies`, for the comments whose replies were all included. Used as a helper for 
+    `_get_top_level_comments_for_video`.
+
+    Returns
+    --------
+    unfetched_replies : dict
+        The commentId of each comment with more replies than were included, mapped to `video_id`.
     
-        else: 
-            # make a request to the youtube api to get the next page results   
-            request = youtube_service_object.videos().list(
-                part="snippet,statistics",
-                maxResults=50,
-                id=video_ids,
-                pageToken=next_page_token,
-            )
-            
-            response = request.execute()
-                
-            # loop through response and store data about each video in a dictionary
-            for i, v in enumerate(response["items"]):
-                data_dict_ = {
-                    response["items"][i]["id"]: {"channelTitle": response["items"][i]["snippet"]["channelTitle"],
-                                                 "channelId": response["items"][i]["snippet"]["channelId"],
-                                                 "videoId": response["items"][i]["id"],
-                                                 "publishedAt": response["items"][i]["snippet"]["publishedAt"],
-                                                 "title": response["items"][i]["snippet"]["title"],
-                                                 "description": response["items"][i]["snippet"]["description"],
-                                                 "tags": response["items"][i]["snippet"].get("tags"),   # use .get() so none is returned if 'tags' isn't present (video doesn't have tags)
-                                                 "viewCount": response["items"][i]["statistics"]["viewCount"],
-                                                 "likeCount": response["items"][i]["statistics"]["likeCount"],
-                                                 "commentCount": response["items"][i]["statistics"]["commentCount"],
-                                                 "favoriteCount": response["items"][i]["statistics"]["favoriteCount"],
-                                                }
-                }
-                
-                # add the data to the data dictionary
-                data_dict.update(data_dict_)
-        
-            next_page_token = response.get("nextPageToken", None)
+    """
+    unfetched_replies = {}
+
+    for item in response['items']:
+        reply_count = item['snippet']['totalReplyCount']
+        if not reply_count:
+            continue
+
+        included_replies = item.get('replies', {}).get('comments', [])
+        if len(included_replies) >= reply_count:
+            _append_replies(replies, included_replies, video_id)
+        else:
+            unfetched_replies[item['snippet']['topLevelComment']['id']] = video_id
+
+    return unfetched_replies
 
+
+
+def _append_replies(replies, items, video_id=None):
+    """Helper function that appends the values for each reply in a list of comments resources to the
+    column lists in `replies`. Used as a helper for `get_comment_replies` and `_append_thread_replies`.
     
-    return data_dict
+    """
+    comment_ids, parent_ids, video_ids, authors, published, updated, likes, texts = replies.values()
 
+    for item in items:
+        reply = item['snippet']
+        comment_ids.append(item['id'])
+        parent_ids.append(reply['parentId'])
+        video_ids.append(reply.get('videoId', video_id))
+        authors.append(reply['authorDisplayName'])
+        published.append(reply['publishedAt'])
+        updated.append(reply['updatedAt'])
+        likes.append(reply['likeCount'])
+        texts.append(reply['textDisplay'])
 
 
 
-def get_top_level_comments(youtube_service_object, video_ids):
-    """Retrieves the commentThreads for a given YouTube video ID or list of video IDs.
+def comment_high_water_marks(df):
+    """Returns the publishedAt of the newest comment stored for each video, to pass as `since` to 
+    `get_top_level_comments` so only the comments added since the last crawl are fetched.
 
     Parameters
     ----------
-    video_ids : list or str
-        A list of video IDs or a single string if only wanting to return data for one video ID.
+    df : dataframe
+        The stored comments, e.g. a dataframe returned by `get_top_level_comments`.
+
+    Returns
+    --------
+    high_water_marks : dict
+        The latest publishedAt for each videoId.
+    
+    """
+    return pd.to_datetime(df["publishedAt"], utc=True).groupby(df["videoId"]).max().to_dict()
+
+
+
+def upsert_comments(df, new_comments):
+    """Adds newly fetched comments to the stored comments, replacing the stored version of any 
+    comment that has been fetched again (comments are matched by their commentId, and the version 
+    with the latest updatedAt is kept).
+
+    Parameters
+    ----------
+    df : dataframe
+        The stored comments, with a commentId column (comments saved before it was added to 
+        `COMMENT_COLUMNS` need fetching again).
+
+    new_comments : dataframe
+        The comments returned by `get_top_level_comments`, e.g. with `since` set.
 
     Returns
     --------
     df : dataframe
-        A dataframe with the top level comments for the video ID.
+        The combined comments, sorted by publishedAt.
     
     """
+    if "commentId" not in df.columns:
+        raise ValueError("The stored comments have no commentId column, fetch them again with "
+                         "`get_top_level_comments`.")
+
+    df = (pd.concat([df.astype(COMMENT_DTYPES), new_comments], ignore_index=True)
+          .sort_values(by=["updatedAt"], kind="stable")
+          .drop_duplicates(subset=["commentId"], keep="last")
+          .sort_values(by=["publishedAt"], kind="stable")
+          .reset_index(drop=True)
+         )
 
-    # check if the video_ids input is a single string or list
+    return df
+
+
+
+def iter_top_level_comments(youtube_service_object, video_ids, executor=None, checkpoint=None, resume: bool = False):
+    """Yields the top level comments for a video ID or list of video IDs one page (up to 50 
+    comments) at a time, as soon as each page is received. Nothing is kept in memory between pages,
+    so the comments can be written out or cleaned incrementally, one page after another. The next 
+    page is only requested once the caller asks for it, so fetching and processing don't overlap.
+
+    Parameters
+    ----------
+    youtube_service_object : googleapiclient object
+        a service object created using `googleapiclinet.discovery.build`
+
+    video_ids : list or str
+        A list of video IDs or a single string if only wanting to return data for one video ID.
+
+    executor : RequestExecutor
+        Makes the requests, defaults to `DEFAULT_EXECUTOR`.
+
+    checkpoint : CrawlCheckpoint
+        Records each page of comments received, None to not record them.
+
+    resume : bool
+        Whether to reuse the pages already recorded in `checkpoint` (they are yielded again) and 
+        only request the pages after them.
+
+    Yields
+    -------
+    df : dataframe
+        A dataframe with the columns in `COMMENT_COLUMNS` for each page of comments.
+
+    Notes
+    ------
+    Unlike `get_top_level_comments` the comments aren't de-duplicated or sorted, as that needs every
+    comment at once. See `src.api.batch_sink.BatchSink` for writing the pages to a file.
+    
+    """
     if isinstance(video_ids, str):
         video_ids = [video_ids]
-  
-    
-    comments = []
-    
-    # loop through the remaining video ids, get the comments for these videos
-    for index, video_id in enumerate(video_ids): 
-        # make a request for first video id
-        request = youtube_service_object.commentThreads().list(
-            part="snippet",
-            videoId=video_id,  
-            order="time",
-            maxResults=50
-        )
-        
-        response = request.execute()
-        
-        for item in response['items']:
-            comment = item['snippet']['topLevelComment']['snippet']
-            comments.append([
-                comment['videoId'],
-                comment['authorDisplayName'],
-                comment['publishedAt'],
-                comment['updatedAt'],
-                comment['likeCount'],
-                item['snippet']['totalReplyCount'], # reply count not stored in same section of json response as all the others        
-                comment['textDisplay']
-            ])
-        
-        next_page_token = response.get("nextPageToken", None)
-        more_pages = True
+
+    for video_id in video_ids:
+        for response in _iter_comment_pages(youtube_service_object, video_id, executor, checkpoint, resume):
+            comments = {column: [] for column in COMMENT_COLUMNS}
+            _append_comments(comments, response)
             
-        while more_pages == True:
-            if next_page_token is None:
-                more_pages = False
-        
-            else: 
-                # make a request to the youtube api to get the next page results   
-                request = youtube_service_object.commentThreads().list(
-                    part="snippet",
-                    videoId=video_id,
-                    order="time",
-                    maxResults=50,
-                    pageToken=next_page_token,
-                )
-                
-                response = request.execute()
-        
-                # loop through response and store data about each video in a dictionary
-                for item in response['items']:
-                    comment = item['snippet']['topLevelComment']['snippet']
-                    comments.append([
-                        comment['videoId'],
-                        comment['authorDisplayName'],
-                        comment['publishedAt'],
-                        comment['updatedAt'],
-                        comment['likeCount'],
-                        item['snippet']['totalReplyCount'], # reply count not stored in same section of json response as all the others        
-                        comment['textDisplay']
-                    ])
-        
-                
-                next_page_token = response.get("nextPageToken", None)         
-    
-        
-        
-        df = (pd.DataFrame(data=comments, columns=['videoId', 'authorDisplayName', 'publishedAt', 'updatedAt', 
-                                                  'likeCount', 'totalReplyCount', 'textDisplay'])
-                        .astype({"publishedAt": "datetime64[ns, UTC]", 
-                                 "updatedAt": "datetime64[ns, UTC]", 
-                                 "likeCount": "int64", 
-                                 "totalReplyCount": "int64"})
-                        .drop_duplicates(subset=["textDisplay"])
-                        .sort_values(by=["publishedAt"])
-                        .reset_index(drop=True)
-                       )
+            yield pd.DataFrame(comments, columns=COMMENT_COLUMNS).astype(COMMENT_DTYPES)
+
+
+
+def iter_video_data(youtube_service_object, video_ids, checkpoint=None, resume: bool = False, executor=None):
+    """Yields the data for the videos whose title contains "tekken", one batch of (up to) 50 video 
+    IDs at a time, as soon as each batch is received.
+
+    Parameters
+    ----------
+    youtube_service_object : googleapiclient object
+        a service object created using `googleapiclinet.discovery.build`
     
+    video_ids : list or str
+        A list of video IDs or a single string if only wanting to return data for one video ID.
+
+    checkpoint : CrawlCheckpoint
+        Records the responses received for each batch of video IDs, None to not record them.
+
+    resume : bool
+        Whether to reuse the batches already recorded in `checkpoint` rather than requesting them
+        again.
+
+    executor : RequestExecutor
+        Makes the requests, defaults to `DEFAULT_EXECUTOR`.
+
+    Yields
+    -------
+    df : dataframe
+        A dataframe with the same columns as the one returned by `get_video_data` for each batch of 
+        video IDs. Video IDs already yielded in an earlier batch are left out.
     
-    return df
\ No newline at end of file
+    """
+    if isinstance(video_ids, str):
+        video_ids = [video_ids]
+
+    seen_video_ids = set()
+
+    for batch_start in range(0, len(video_ids), 50):
+        videos = {column: [] for column in VIDEO_COLUMNS}
+        _get_video_data_for_batch(youtube_service_object, video_ids[batch_start:batch_start + 50], videos, executor, 
+                                  checkpoint, resume)
+
+        df = (pd.DataFrame(videos, columns=VIDEO_COLUMNS)
+              .drop_duplicates(subset=['videoId'], keep="last"))
+        df = df.loc[~df['videoId'].isin(seen_video_ids)].astype(VIDEO_DTYPES)
+        seen_video_ids.update(df['videoId'])
+
+        yield df.loc[df['title'].str.lower().str.contains("tekken")].reset_index(drop=True)
@@ -0,0 +1,209 @@
+# request_executor.py
+"""Module contains the executor every YouTube API request is made through. It retries failed
+requests with exponential backoff, limits the rate quota units are used at and keeps a running
+total of the quota used:
+
+    `RequestExecutor(max_retries, backoff_base, backoff_max, units_per_second, burst, quota_limit, cache)`
+    `QuotaExceededError`
+
+Example
+--------
+    from src.api.request_executor import RequestExecutor
+
+    # spread a day's 10,000 units evenly over 24 hours
+    executor = RequestExecutor(units_per_second=10_000 / 86_400, burst=200, quota_limit=10_000)
+    df = get_top_level_comments(youtube, video_ids, executor=executor)
+    print(executor.quota_used)
+
+References
+-----------
+    https://developers.google.com/youtube/v3/determine_quota_cost
+
+"""
+
+import json
+import random
+import threading
+import time
+
+from googleapiclient.errors import HttpError
+
+
+# the number of quota units used by a request to each resource's `list` method
+QUOTA_COSTS = {"search": 100,
+               "videos": 1,
+               "commentThreads": 1,
+               "comments": 1}
+
+# HTTP status codes for errors that are likely to succeed if the request is retried
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+
+# reasons given for a 403 error that mean the request is being made too quickly, rather than that
+# the daily quota has run out or the request isn't allowed
+RATE_LIMIT_REASONS = {"rateLimitExceeded", "userRateLimitExceeded"}
+
+
+class QuotaExceededError(Exception):
+    """Raised when the API quota has been used up, either according to the API or because the
+    executor's `quota_limit` would be exceeded. Retrying won't help until the quota resets, so
+    resume the crawl later (see `src.api.crawl_checkpoint`).
+
+    """
+
+
+class RequestExecutor:
+    """Executes API requests, retrying errors that are likely to be temporary and limiting the rate
+    quota units are used at with a token bucket. The executor can be shared by several threads.
+
+    Parameters
+    ----------
+    max_retries : int
+        The number of times a failed request is retried before the error is raised.
+
+    backoff_base : float
+        The wait (in seconds) before the first retry, doubled for each retry after it. Each wait is
+        a random time between 0 and this value ("full jitter"), so workers don't retry in step.
+
+    backoff_max : float
+        The longest wait (in seconds) between retries.
+
+    units_per_second : float
+        The rate quota units are added to the bucket at, None for no rate limit.
+
+    burst : float
+        The size of the bucket i.e., the number of units that can be used at once after a quiet
+        period. Defaults to one search request (100 units) or `units_per_second`, whichever is
+        larger.
+
+    quota_limit : int
+        The number of units this executor may use, `QuotaExceededError` is raised instead of
+        making a request that would go over it. None for no limit.
+
+    cache : ResponseCache
+        Where responses are looked up before making a request and stored after it, see
+        `src.api.response_cache`. None to not cache responses. Cached responses don't use quota.
+
+    Attributes
+    ----------
+    quota_used : int
+        The number of quota units used by the requests made so far (including retries).
+
+    requests_made : int
+        The number of requests made so far (including retries).
+
+    retries : int
+        The number of requests that were retried.
+
+    """
+
+    def __init__(self, max_retries=5, backoff_base=1.0, backoff_max=64.0, units_per_second=None, burst=None,
+                 quota_limit=None, cache=None):
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.units_per_second = units_per_second
+        self.burst = burst if burst is not None else max(QUOTA_COSTS["search"], units_per_second or 0)
+        self.quota_limit = quota_limit
+        self.cache = cache
+
+        self.quota_used = 0
+        self.requests_made = 0
+        self.retries = 0
+
+        self._tokens = self.burst
+        self._last_refill = time.monotonic()
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        return (f"RequestExecutor(quota_used={self.quota_used}, requests_made={self.requests_made}, "
+                f"retries={self.retries})")
+
+    def execute(self, request, cost=1):
+        """Executes a request, waiting for enough quota units and retrying temporary errors.
+
+        Parameters
+        ----------
+        request : googleapiclient HttpRequest
+            The request, e.g. `youtube_service_object.commentThreads().list(...)`.
+
+        cost : int
+            The number of quota units the request uses, see `QUOTA_COSTS`.
+
+        Returns
+        -------
+        response : dict
+            The response to the request.
+
+        """
+        if self.cache is not None:
+            response = self.cache.get(request)
+            if response is not None:
+                return response
+
+        for attempt in range(self.max_retries + 1):
+            self._acquire(cost)
+
+            try:
+                response = request.execute()
+                if self.cache is not None:
+                    self.cache.put(request, response)
+                return response
+
+            except HttpError as error:
+                reasons = _error_reasons(error)
+                if "quotaExceeded" in reasons or "dailyLimitExceeded" in reasons:
+                    raise QuotaExceededError(f"The API quota has been used up: {error}") from error
+
+                retryable = (error.resp.status in RETRYABLE_STATUS_CODES
+                             or (error.resp.status == 403 and RATE_LIMIT_REASONS & reasons))
+                if not retryable or attempt == self.max_retries:
+                    raise
+
+            except (TimeoutError, ConnectionError):
+                if attempt == self.max_retries:
+                    raise
+
+            with self._lock:
+                self.retries += 1
+            time.sleep(random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt)))
+
+    def _acquire(self, cost):
+        """Helper method that blocks until `cost` units are in the bucket, then takes them and adds
+        them to the quota used.
+
+        """
+        while True:
+            with self._lock:
+                if self.quota_limit is not None and self.quota_used + cost > self.quota_limit:
+                    raise QuotaExceededError(f"Making the request would use more than the quota limit of "
+                                             f"{self.quota_limit} units ({self.quota_used} used).")
+
+                if self.units_per_second is None:
+                    wait = 0
+                else:
+                    now = time.monotonic()
+                    self._tokens = min(self.burst, self._tokens + (now - self._last_refill) * self.units_per_second)
+                    self._last_refill = now
+                    # a request costing more than the bucket holds waits for a full bucket
+                    wait = (min(cost, self.burst) - self._tokens) / self.units_per_second
+
+                if wait <= 0:
+                    if self.units_per_second is not None:
+                        self._tokens -= cost
+                    self.quota_used += cost
+                    self.requests_made += 1
+                    return
+
+            time.sleep(wait)
+
+
+def _error_reasons(error):
+    """Helper function that returns the reasons given in the body of an `HttpError`, e.g.
+    {"quotaExceeded"}. Used as a helper for `RequestExecutor.execute`.
+
+    """
+    try:
+        content = json.loads(error.content.decode("utf-8") if isinstance(error.content, bytes) else error.content)
+        return {detail.get("reason") for detail in content["error"].get("errors", [])}
+    except (ValueError, KeyError, TypeError, AttributeError):
+        return set()
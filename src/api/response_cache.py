@@ -0,0 +1,215 @@
+# response_cache.py
+"""Module contains a persistent cache for YouTube API responses, so re-running the notebooks
+doesn't make (and use quota on) the same requests again:
+
+    `ResponseCache(path, ttls, offline)`
+    `CacheMissError`
+
+Example
+--------
+    from src.api.request_executor import RequestExecutor
+    from src.api.response_cache import ResponseCache
+
+    executor = RequestExecutor(cache=ResponseCache("data/cache/youtube_responses.sqlite"))
+    df = get_top_level_comments(youtube, video_ids, executor=executor)
+
+    # replay a crawl from the cache without using the network, any request that wasn't cached
+    # raises CacheMissError
+    executor = RequestExecutor(cache=ResponseCache("data/cache/youtube_responses.sqlite", offline=True))
+
+"""
+
+import json
+import sqlite3
+import threading
+import time
+from urllib.parse import parse_qsl, urlencode, urlsplit
+
+
+# how long (in seconds) a cached response is used for, by resource. Comments change far more often
+# than the results of a search or a video's details
+DEFAULT_TTLS = {"search": 24 * 60 * 60,
+                "videos": 7 * 24 * 60 * 60,
+                "commentThreads": 60 * 60,
+                "comments": 60 * 60}
+
+# query parameters that don't change the response, so are left out of the key (the API key would
+# otherwise also be stored in the cache)
+_IGNORED_PARAMETERS = {"key", "alt", "prettyPrint"}
+
+
+class CacheMissError(Exception):
+    """Raised in offline mode when a request's response isn't in the cache."""
+
+
+class ResponseCache:
+    """Stores API responses in a SQLite database, keyed by the resource and the request's
+    parameters. A response is used until it is older than its resource's TTL.
+
+    Parameters
+    ----------
+    path : str or Path
+        The path of the SQLite database, it is created if it doesn't exist.
+
+    ttls : dict
+        The number of seconds a response is used for, by resource, e.g. {"commentThreads": 3600}.
+        Resources that aren't given use `DEFAULT_TTLS`, None means the response never expires.
+
+    offline : bool
+        Whether to only replay cached responses (of any age) and never make requests. A request
+        whose response isn't cached raises `CacheMissError`.
+
+    Notes
+    ------
+    The cache can be shared by several threads.
+
+    """
+
+    def __init__(self, path, ttls=None, offline=False):
+        self.path = path
+        self.ttls = {**DEFAULT_TTLS, **(ttls or {})}
+        self.offline = offline
+        self.hits = 0
+        self.misses = 0
+
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute("CREATE TABLE IF NOT EXISTS responses "
+                                 "(key TEXT PRIMARY KEY, resource TEXT NOT NULL, response TEXT NOT NULL, "
+                                 "created REAL NOT NULL)")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __len__(self):
+        with self._lock:
+            return self._connection.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+
+    @staticmethod
+    def key(request):
+        """Returns the resource a request is for and the key its response is stored under.
+
+        Parameters
+        ----------
+        request : googleapiclient HttpRequest
+            The request, e.g. `youtube_service_object.commentThreads().list(...)`.
+
+        Returns
+        -------
+        resource : str
+            The resource, e.g. "commentThreads".
+
+        key : str
+            The API method followed by the request's sorted parameters, without the API key.
+
+        """
+        resource = request.methodId.split(".")[-2]
+        parameters = sorted((name, value) for name, value in parse_qsl(urlsplit(request.uri).query)
+                            if name not in _IGNORED_PARAMETERS)
+
+        return resource, f"{request.methodId}?{urlencode(parameters)}"
+
+    def get(self, request):
+        """Returns the cached response to a request.
+
+        Parameters
+        ----------
+        request : googleapiclient HttpRequest
+            The request.
+
+        Returns
+        -------
+        response : dict
+            The cached response, or None if it isn't cached or has expired.
+
+        """
+        resource, key = self.key(request)
+
+        ttl = self.ttls.get(resource)
+
+        with self._lock:
+            row = self._connection.execute("SELECT response, created FROM responses WHERE key = ?", (key,)).fetchone()
+            found = row is not None and (self.offline or ttl is None or time.time() - row[1] <= ttl)
+            if found:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+        if not found:
+            if self.offline:
+                raise CacheMissError(f"No cached response for {key}")
+            return None
+
+        return json.loads(row[0])
+
+    def put(self, request, response):
+        """Stores the response to a request.
+
+        Parameters
+        ----------
+        request : googleapiclient HttpRequest
+            The request.
+
+        response : dict
+            The response received.
+
+        Returns
+        -------
+        None
+
+        """
+        resource, key = self.key(request)
+
+        with self._lock, self._connection:
+            self._connection.execute("INSERT OR REPLACE INTO responses (key, resource, response, created) "
+                                     "VALUES (?, ?, ?, ?)", (key, resource, json.dumps(response), time.time()))
+
+    def clear(self, resource=None):
+        """Removes the cached responses for a resource, or every response if `resource` is None."""
+        with self._lock, self._connection:
+            if resource is None:
+                self._connection.execute("DELETE FROM responses")
+            else:
+                self._connection.execute("DELETE FROM responses WHERE resource = ?", (resource,))
+
+    def remove_expired(self):
+        """Removes the responses that are older than their resource's TTL.
+
+        Returns
+        -------
+        removed : int
+            The number of responses removed.
+
+        """
+        now = time.time()
+        removed = 0
+
+        with self._lock, self._connection:
+            for resource, ttl in self.ttls.items():
+                if ttl is not None:
+                    removed += self._connection.execute("DELETE FROM responses WHERE resource = ? AND created < ?",
+                                                        (resource, now - ttl)).rowcount
+
+        return removed
+
+    def stats(self):
+        """Returns the number of hits, misses and stored responses since the cache was opened.
+
+        Returns
+        -------
+        stats : dict
+            "hits", "misses", "hit_rate" and "entries".
+
+        """
+        lookups = self.hits + self.misses
+        return {"hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "entries": len(self)}
+
+    def close(self):
+        """Closes the connection to the database."""
+        self._connection.close()
@@ -0,0 +1,341 @@
+# coherence.py
+"""Module contains an index of how often the words of a vocabulary appear together in the comments,
+which scores the c_v and u_mass coherence of any number of topics without going through the
+comments again:
+
+    `CooccurrenceIndex(texts, vocabulary, window_size)`
+    `CooccurrenceIndex.load(path)`
+
+The scores are the same as gensim's `CoherenceModel` (up to floating point error), which counts the
+co-occurrences again for every model it scores.
+
+Example
+--------
+    from src.modeling.coherence import CooccurrenceIndex
+
+    texts = df["textTekkenCharactersRemoved"]
+    corpus = TokenCorpus(texts).filter_extremes(no_below=3, no_above=0.85, keep_n=5000)
+
+    index = CooccurrenceIndex(texts, corpus.vocabulary)
+    index.save("data/processed/cooccurrence_index.npz")
+
+    # the topics can be lists of tokens or of token ids, e.g. `SweepResult.topics`
+    index.coherence([["trailer", "reveal", "character"], ["wait", "release", "date"]], measure="c_v")
+
+    # score several models' topics at once
+    index.compare([topics for topics in result.topics.values()], measure="u_mass")
+
+References
+-----------
+    Röder, M., Both, A. and Hinneburg, A. (2015). Exploring the Space of Topic Coherence Measures.
+    https://svn.aksw.org/papers/2015/WSDM_Topic_Evaluation/public.pdf
+
+"""
+
+import numpy as np
+
+
+MEASURES = ("c_v", "u_mass")
+
+# the number of tokens in each sliding window for c_v, the same as gensim's default
+WINDOW_SIZE = 110
+
+# added to the probabilities before taking their log so words that never appear together don't
+# give log(0), the same value as gensim
+EPSILON = 1e-12
+
+# the most (window, token) entries counted at once when building the index
+_ENTRIES_PER_CHUNK = 1 << 22
+
+
+class CooccurrenceIndex:
+    """Counts, for every pair of words in a vocabulary, the number of sliding windows (for c_v) and
+    the number of documents (for u_mass) that contain both of them.
+
+    Parameters
+    ----------
+    texts : iterable of lists of str
+        The tokenized documents, e.g. the `textTekkenCharactersRemoved` column. Tokens that aren't
+        in the vocabulary aren't counted, but still take up their place in the windows.
+
+    vocabulary : list of str
+        The token for each token id, e.g. `TokenCorpus.vocabulary` of the corpus the models were
+        fitted to.
+
+    window_size : int
+        The number of tokens in each sliding window. A document with fewer tokens is one window.
+
+    Attributes
+    ----------
+    window_counts : scipy.sparse.csr_matrix
+        A (vocabulary x vocabulary) matrix of the number of windows containing both words, with the
+        number of windows containing each word on the diagonal.
+
+    document_counts : scipy.sparse.csr_matrix
+        The same for documents.
+
+    number_of_windows, number_of_documents : int
+        The totals the counts are divided by to give probabilities.
+
+    Notes
+    ------
+    The windows are counted exactly. gensim slides its window one token at a time and forgets the
+    token leaving it even if the same token is still further along in the window, so its c_v can
+    differ slightly for documents longer than the window that repeat words (none of the comment
+    datasets' documents are affected by more than floating point error).
+
+    """
+
+    def __init__(self, texts=None, vocabulary=(), window_size=WINDOW_SIZE):
+        from scipy.sparse import csr_matrix
+
+        self.vocabulary = list(vocabulary)
+        self.token_ids = {token: token_id for token_id, token in enumerate(self.vocabulary)}
+        self.window_size = window_size
+
+        self.window_counts = csr_matrix((len(self.vocabulary), len(self.vocabulary)), dtype=np.int64)
+        self.document_counts = csr_matrix((len(self.vocabulary), len(self.vocabulary)), dtype=np.int64)
+        self.number_of_windows = 0
+        self.number_of_documents = 0
+
+        if texts is not None:
+            self._count(texts)
+
+    def __repr__(self):
+        return (f"CooccurrenceIndex(vocabulary={len(self.vocabulary)}, documents={self.number_of_documents}, "
+                f"windows={self.number_of_windows}, window_size={self.window_size})")
+
+    def coherence(self, topics, measure="c_v"):
+        """Returns the coherence of a model's topics i.e., the mean coherence of its topics.
+
+        Parameters
+        ----------
+        topics : list of lists of str or int, or a 2D numpy array
+            The heaviest words of each topic, as tokens or token ids.
+
+        measure : str
+            "c_v" or "u_mass".
+
+        Returns
+        -------
+        coherence : float
+            The coherence.
+
+        """
+        return float(np.mean(self.topic_coherences(topics, measure)))
+
+    def compare(self, model_topics, measure="c_v"):
+        """Returns the coherence of several models' topics, scoring every topic at once.
+
+        Parameters
+        ----------
+        model_topics : list
+            The topics of each model, see `coherence`.
+
+        measure : str
+            "c_v" or "u_mass".
+
+        Returns
+        -------
+        coherences : list of float
+            The coherence of each model.
+
+        """
+        model_topics = [list(topics) for topics in model_topics]
+        scores = self.topic_coherences([topic for topics in model_topics for topic in topics], measure)
+        ends = np.cumsum([len(topics) for topics in model_topics])
+
+        return [float(np.mean(model_scores)) for model_scores in np.split(scores, ends[:-1])]
+
+    def topic_coherences(self, topics, measure="c_v"):
+        """Returns the coherence of each topic.
+
+        Parameters
+        ----------
+        topics : list of lists of str or int, or a 2D numpy array
+            The heaviest words of each topic, as tokens or token ids.
+
+        measure : str
+            "c_v" or "u_mass".
+
+        Returns
+        -------
+        coherences : numpy array
+            The coherence of each topic.
+
+        """
+        if measure == "c_v":
+            score = self._c_v
+        elif measure == "u_mass":
+            score = self._u_mass
+        else:
+            raise ValueError(f"Unknown coherence measure '{measure}', use one of {MEASURES}.")
+
+        topics = [self._topic_ids(topic) for topic in topics]
+        coherences = np.empty(len(topics))
+
+        # topics with the same number of words are scored together as one array
+        lengths = np.array([len(topic) for topic in topics])
+        for length in np.unique(lengths):
+            positions = np.flatnonzero(lengths == length)
+            coherences[positions] = score(np.array([topics[position] for position in positions]).reshape(-1, length))
+
+        return coherences
+
+    def save(self, path):
+        """Saves the index to a `.npz` file.
+
+        Parameters
+        ----------
+        path : str or Path
+            The file to write to.
+
+        Returns
+        -------
+        None
+
+        """
+        np.savez(path,
+                 vocabulary=np.array(self.vocabulary, dtype=np.str_),
+                 window_size=self.window_size,
+                 number_of_windows=self.number_of_windows,
+                 number_of_documents=self.number_of_documents,
+                 **{f"{name}_{part}": getattr(getattr(self, name), part)
+                    for name in ("window_counts", "document_counts") for part in ("data", "indices", "indptr")})
+
+    @classmethod
+    def load(cls, path):
+        """Loads an index saved with `save`.
+
+        Parameters
+        ----------
+        path : str or Path
+            The file to read.
+
+        Returns
+        -------
+        index : CooccurrenceIndex
+            The index.
+
+        """
+        from scipy.sparse import csr_matrix
+
+        with np.load(path) as arrays:
+            index = cls(vocabulary=arrays["vocabulary"].tolist(), window_size=int(arrays["window_size"]))
+            index.number_of_windows = int(arrays["number_of_windows"])
+            index.number_of_documents = int(arrays["number_of_documents"])
+
+            shape = (len(index.vocabulary), len(index.vocabulary))
+            for name in ("window_counts", "document_counts"):
+                setattr(index, name, csr_matrix((arrays[f"{name}_data"], arrays[f"{name}_indices"],
+                                                 arrays[f"{name}_indptr"]), shape=shape))
+
+        return index
+
+    def _count(self, texts):
+        """Helper method that counts the windows and documents containing each pair of words."""
+        ids = []
+        lengths = []
+        for text in texts:
+            ids.extend(self.token_ids.get(token, -1) for token in text)   # -1 for tokens not in the vocabulary
+            lengths.append(len(text))
+
+        ids = np.array(ids, dtype=np.int64)
+        lengths = np.array(lengths, dtype=np.int64)
+        offsets = np.concatenate(([0], np.cumsum(lengths)))
+
+        # each document is one row of the document matrix, and so is each document short enough to
+        # be a single window
+        documents = np.repeat(np.arange(len(lengths)), lengths)
+        self.document_counts = self._pair_counts(documents, ids, len(lengths))
+        self.number_of_documents = len(lengths)
+
+        short = lengths <= self.window_size
+        self.window_counts = self._pair_counts(documents[short[documents]], ids[short[documents]], len(lengths))
+        self.number_of_windows = int(short.sum())
+
+        # longer documents give a window starting at each token that has `window_size` tokens after it
+        window_positions = np.arange(self.window_size)
+        starts = []
+        for document in np.flatnonzero(~short).tolist():
+            starts.append(np.arange(offsets[document], offsets[document + 1] - self.window_size + 1))
+
+            if sum(len(chunk) for chunk in starts) * self.window_size >= _ENTRIES_PER_CHUNK:
+                self._add_windows(ids, np.concatenate(starts), window_positions)
+                starts = []
+
+        if starts:
+            self._add_windows(ids, np.concatenate(starts), window_positions)
+
+    def _add_windows(self, ids, starts, window_positions):
+        """Helper method that adds the counts of the windows starting at each of `starts`."""
+        windows = np.repeat(np.arange(len(starts)), len(window_positions))
+        self.window_counts = self.window_counts + self._pair_counts(
+            windows, ids[(starts[:, None] + window_positions).ravel()], len(starts))
+        self.number_of_windows += len(starts)
+
+    def _pair_counts(self, rows, ids, number_of_rows):
+        """Helper method that returns the (vocabulary x vocabulary) number of rows (documents or
+        windows) containing each pair of token ids, given the token ids in each row.
+
+        """
+        from scipy.sparse import csr_matrix
+
+        counted = ids >= 0
+        contains = csr_matrix((np.ones(counted.sum(), dtype=np.int64), (rows[counted], ids[counted])),
+                              shape=(number_of_rows, len(self.vocabulary)))
+        contains.sum_duplicates()
+        contains.data[:] = 1   # a token appearing more than once in a row is only counted once
+
+        return (contains.T @ contains).tocsr()
+
+    def _topic_ids(self, topic):
+        """Helper method that returns a topic's words as token ids."""
+        try:
+            return [word if isinstance(word, (int, np.integer)) else self.token_ids[word] for word in topic]
+        except KeyError as error:
+            raise ValueError(f"The word {error} isn't in the index's vocabulary.") from None
+
+    def _counts(self, counts, first, second):
+        """Helper method that looks up the counts of each pair of token ids in two arrays of the same
+        shape.
+
+        """
+        return np.asarray(counts[first.ravel(), second.ravel()], dtype=np.float64).reshape(first.shape)
+
+    def _c_v(self, topics):
+        """Helper method that returns the c_v coherence of each row of a (topics x words) array of
+        token ids: the mean cosine similarity between the NPMI vector of each word and the sum of
+        the topic's NPMI vectors (one set segmentation).
+
+        """
+        first, second = topics[:, :, None], topics[:, None, :]
+        occurrences = self.window_counts.diagonal().astype(np.float64)
+
+        together = self._counts(self.window_counts, *np.broadcast_arrays(first, second)) / self.number_of_windows
+        with np.errstate(divide="ignore", invalid="ignore"):
+            ratio = np.log((together + EPSILON) / ((occurrences[first] / self.number_of_windows)
+                                                   * (occurrences[second] / self.number_of_windows)))
+            npmi = ratio / -np.log(together + EPSILON)
+
+            topic_vectors = npmi.sum(axis=1, keepdims=True)
+            similarities = ((npmi * topic_vectors).sum(axis=2)
+                            / (np.sqrt((npmi ** 2).sum(axis=2)) * np.sqrt((topic_vectors ** 2).sum(axis=2))))
+
+        return similarities.mean(axis=1)
+
+    def _u_mass(self, topics):
+        """Helper method that returns the u_mass coherence of each row of a (topics x words) array
+        of token ids: the mean log conditional probability of each word given each heavier word
+        (one preceding segmentation). Pairs whose heavier word is in no documents score 0.
+
+        """
+        later, earlier = np.tril_indices(topics.shape[1], k=-1)
+        first, second = topics[:, later], topics[:, earlier]
+
+        occurrences = self.document_counts.diagonal().astype(np.float64)[second] / self.number_of_documents
+        together = self._counts(self.document_counts, first, second) / self.number_of_documents
+        with np.errstate(divide="ignore", invalid="ignore"):
+            scores = np.where(occurrences > 0, np.log((together + EPSILON) / occurrences), 0.0)
+
+        return scores.mean(axis=1)
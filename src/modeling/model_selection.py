@@ -0,0 +1,322 @@
+# model_selection.py
+"""Module contains functions that choose the number of topics for an NMF or LDA model by fitting a
+model for each number of topics in a process pool and scoring each one's coherence:
+
+    `fit_topic_model(corpus, model, num_topics, random_state, tfidf)`
+    `sweep_topic_numbers(corpus, texts, topic_numbers, model, coherence, number_of_words, max_workers,
+                         patience, refine, keep_models, random_state, index)`
+    `SweepResult`
+
+The corpus is shared with the worker processes rather than copied to each task, and the word
+co-occurrence statistics behind the coherence score are counted once for the whole vocabulary (see
+`src.modeling.coherence`) and reused for every number of topics.
+
+Example
+--------
+    from src.modeling.model_selection import sweep_topic_numbers
+    from src.modeling.token_corpus import TokenCorpus
+    from src.modeling.topic_dataframe import topic_dataframe
+
+    texts = df["textTekkenCharactersRemoved"]
+    corpus = TokenCorpus(texts).filter_extremes(no_below=3, no_above=0.85, keep_n=5000)
+
+    # score 5, 10, ..., 45 topics, then narrow in on the best number of topics
+    result = sweep_topic_numbers(corpus, texts, topic_numbers=range(5, 50, 5), model="nmf", max_workers=4,
+                                 refine=True)
+
+    result.scores.plot()
+    topic_dataframe(result.best_model, result.vocabulary, number_of_words=10)
+
+"""
+
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+
+import numpy as np
+import pandas as pd
+
+from src.modeling.coherence import MEASURES, CooccurrenceIndex
+from src.modeling.topic_dataframe import _heaviest_words_indices, _topic_word_weights
+
+
+MODELS = ("nmf", "lda")
+
+# the corpus (and its TF-IDF matrix) shared with the worker processes. They are set before the
+# pool is started, so forked workers read the parent's copy rather than receiving one with each task
+_CORPUS = None
+_TFIDF = None
+
+
+@dataclass
+class SweepResult:
+    """The coherence of the model fitted for each number of topics.
+
+    Attributes
+    ----------
+    scores : pandas Series
+        The coherence for each number of topics tried, indexed and sorted by the number of topics.
+
+    topics : dict
+        The token ids of the heaviest words of each topic, by number of topics.
+
+    models : dict
+        The fitted model, by number of topics. Empty if the sweep was run with `keep_models=False`.
+
+    vocabulary : list of str
+        The token for each token id, i.e. the `feature_names` for `topic_dataframe`.
+
+    coherence : str
+        The coherence measure used, "c_v" or "u_mass".
+
+    seconds : float
+        How long the sweep took.
+
+    index : CooccurrenceIndex
+        The co-occurrence counts the models were scored with, which can be saved and passed to
+        another sweep over the same corpus.
+
+    """
+
+    scores: pd.Series
+    topics: dict = field(repr=False)
+    models: dict = field(repr=False)
+    vocabulary: list = field(repr=False)
+    coherence: str = "c_v"
+    seconds: float = 0.0
+    index: CooccurrenceIndex = field(default=None, repr=False)
+
+    @property
+    def best_number_of_topics(self):
+        """The number of topics with the highest coherence."""
+        return int(self.scores.idxmax())
+
+    @property
+    def best_model(self):
+        """The model fitted with the best number of topics. Raises a ValueError if the sweep was run
+        with `keep_models=False`.
+
+        """
+        if self.best_number_of_topics not in self.models:
+            raise ValueError("The models weren't kept, run the sweep with keep_models=True or fit the best "
+                             "number of topics with `fit_topic_model`.")
+        return self.models[self.best_number_of_topics]
+
+
+def fit_topic_model(corpus, model="nmf", num_topics=10, random_state=42, tfidf=None):
+    """Fits a topic model to a token corpus.
+
+    Parameters
+    ----------
+    corpus : TokenCorpus
+        The corpus, see `src.modeling.token_corpus`.
+
+    model : str
+        "nmf" for scikit-learn's NMF fitted to the TF-IDF matrix, or "lda" for gensim's LdaModel
+        fitted to the token counts.
+
+    num_topics : int
+        The number of topics.
+
+    random_state : int
+        The seed, so the same model is fitted each time.
+
+    tfidf : scipy sparse matrix
+        The corpus's TF-IDF matrix, None to compute it. Used by "nmf" when fitting several models
+        to the same corpus.
+
+    Returns
+    -------
+    model : scikit-learn NMF or gensim LdaModel
+        The fitted model.
+
+    """
+    if model == "nmf":
+        from sklearn.decomposition import NMF
+        from sklearn.feature_extraction.text import TfidfTransformer
+
+        if tfidf is None:
+            tfidf = TfidfTransformer().fit_transform(corpus.to_csr())
+        return NMF(n_components=num_topics, init="nndsvd", max_iter=100, random_state=random_state).fit(tfidf)
+
+    elif model == "lda":
+        from gensim.models import LdaModel
+
+        return LdaModel(corpus=corpus, id2word=corpus.to_gensim_dictionary(), num_topics=num_topics, passes=10,
+                        random_state=random_state)
+
+    raise ValueError(f"Unknown model '{model}', use one of {MODELS}.")
+
+
+def sweep_topic_numbers(corpus, texts, topic_numbers=range(5, 50, 5), model="nmf", coherence="c_v",
+                        number_of_words=10, max_workers=None, patience=None, refine=False, keep_models=True,
+                        random_state=42, index=None):
+    """Fits a topic model for each number of topics in parallel and scores each one's coherence.
+
+    Parameters
+    ----------
+    corpus : TokenCorpus
+        The (filtered) corpus the models are fitted to, see `src.modeling.token_corpus`.
+
+    texts : iterable of lists of str
+        The tokenized documents the coherence is measured on, e.g. the `textTekkenCharactersRemoved`
+        column. Tokens that aren't in the corpus's vocabulary are ignored. Can be None if `index` is
+        given.
+
+    topic_numbers : iterable of int
+        The numbers of topics to try.
+
+    model : str
+        "nmf" or "lda", see `fit_topic_model`.
+
+    coherence : str
+        The coherence measure, "c_v" (sliding windows over `texts`) or "u_mass" (document
+        co-occurrence in the corpus).
+
+    number_of_words : int
+        The number of heaviest words of each topic that are scored.
+
+    max_workers : int
+        The number of worker processes, None for the number of CPUs.
+
+    patience : int
+        Stop trying more topics once this many numbers of topics in a row (in ascending order) have
+        scored lower than the best so far, None to try every number.
+
+    refine : bool
+        Whether to then repeatedly try the numbers of topics halfway between the best number and
+        its neighbours, until there are none left to try. This assumes the coherence rises to a
+        single peak around the best number.
+
+    keep_models : bool
+        Whether to return the fitted models (which are sent back from the worker processes) or
+        only their scores and topics.
+
+    random_state : int
+        The seed used for every model.
+
+    index : CooccurrenceIndex
+        The co-occurrence counts of `texts` over the corpus's vocabulary, e.g. one saved by an
+        earlier sweep and loaded with `CooccurrenceIndex.load`. None to count them.
+
+    Returns
+    -------
+    result : SweepResult
+        The coherence of each number of topics tried, and the models.
+
+    Notes
+    ------
+    The numbers of topics are fitted `max_workers` at a time. The co-occurrence counts (if `index`
+    isn't given) are made while the first models are fitted.
+
+    """
+    global _CORPUS, _TFIDF
+
+    if model not in MODELS:
+        raise ValueError(f"Unknown model '{model}', use one of {MODELS}.")
+    if coherence not in MEASURES:
+        raise ValueError(f"Unknown coherence '{coherence}', use one of {MEASURES}.")
+    if index is not None and index.vocabulary != corpus.vocabulary:
+        raise ValueError("The index's vocabulary doesn't match the corpus's vocabulary.")
+
+    start = time.perf_counter()
+    topic_numbers = sorted(set(int(k) for k in topic_numbers))
+    max_workers = max_workers or multiprocessing.cpu_count()
+
+    _CORPUS = corpus
+    _TFIDF = None
+    if model == "nmf":
+        from sklearn.feature_extraction.text import TfidfTransformer
+
+        _TFIDF = TfidfTransformer().fit_transform(corpus.to_csr())
+
+    # with fork the workers share the parent's memory. Other start methods send the corpus to each
+    # worker once, when it starts. Fork is only used where it's already the default (Linux), as it
+    # isn't safe on macOS
+    if multiprocessing.get_start_method() == "fork":
+        pool = ProcessPoolExecutor(max_workers, mp_context=multiprocessing.get_context("fork"))
+    else:
+        pool = ProcessPoolExecutor(max_workers, initializer=_share_corpus, initargs=(corpus, _TFIDF))
+
+    scores = {}
+    topics = {}
+    models = {}
+
+    def fit(numbers):
+        # submitting before the index is built lets the workers fit while the counts are made
+        futures = [pool.submit(_fit_topics, model, k, number_of_words, random_state, keep_models)
+                   for k in numbers]
+
+        nonlocal index
+        if index is None:
+            index = CooccurrenceIndex(texts, corpus.vocabulary)
+
+        for future in futures:
+            k, topic_words, fitted = future.result()
+            scores[k] = index.coherence(topic_words, coherence)
+            topics[k] = topic_words
+            if keep_models:
+                models[k] = fitted
+            print(f"{k} topics: {coherence} coherence {scores[k]:.4f}")
+
+    try:
+        for position in range(0, len(topic_numbers), max_workers):
+            fit(topic_numbers[position:position + max_workers])
+
+            if patience is not None:
+                best = max(scores, key=scores.get)
+                if sum(k > best for k in scores) >= patience:
+                    print(f"Stopping early, {patience} numbers of topics after {best} scored lower.")
+                    break
+
+        while refine:
+            best = max(scores, key=scores.get)
+            lower = max((k for k in scores if k < best), default=best)
+            upper = min((k for k in scores if k > best), default=best)
+            halfway = {(lower + best) // 2, (best + upper + 1) // 2} - set(scores)
+            if not halfway:
+                break
+            fit(sorted(halfway))
+
+    finally:
+        pool.shutdown()
+        _CORPUS = _TFIDF = None
+
+    result = SweepResult(scores=pd.Series(scores, name=coherence).rename_axis("number_of_topics").sort_index(),
+                         topics=dict(sorted(topics.items())),
+                         models=dict(sorted(models.items())),
+                         vocabulary=corpus.vocabulary,
+                         coherence=coherence,
+                         seconds=time.perf_counter() - start,
+                         index=index)
+
+    print(f"Best number of topics: {result.best_number_of_topics} ({coherence} coherence "
+          f"{result.scores.max():.4f}), {len(scores)} models in {result.seconds:.1f}s")
+
+    return result
+
+
+def _share_corpus(corpus, tfidf):
+    """Helper function that sets the corpus in a worker process that wasn't forked. Used as a helper
+    for `sweep_topic_numbers`.
+
+    """
+    global _CORPUS, _TFIDF
+
+    _CORPUS = corpus
+    _TFIDF = tfidf
+
+
+def _fit_topics(model, num_topics, number_of_words, random_state, keep_model):
+    """Helper function, run in a worker process, that fits a model to the shared corpus and returns
+    the token ids of the heaviest words of each topic (and the model). Used as a helper for
+    `sweep_topic_numbers`.
+
+    """
+    fitted = fit_topic_model(_CORPUS, model, num_topics, random_state, tfidf=_TFIDF)
+    topic_words = np.array([_heaviest_words_indices(topic, number_of_words)
+                            for topic in _topic_word_weights(fitted)])
+
+    return num_topics, topic_words, fitted if keep_model else None
+
@@ -0,0 +1,311 @@
+# token_corpus.py
+"""Module contains a compact corpus that stores each comment as integer token ids with a shared
+vocabulary, so the vocabulary is built once rather than by every model:
+
+    `TokenCorpus(documents)`
+    `TokenCorpus.load(path)`
+
+Example
+--------
+    from src.modeling.token_corpus import TokenCorpus
+
+    corpus = TokenCorpus(df["textTekkenCharactersRemoved"])
+    corpus.save("data/processed/token_corpus.npz")
+
+    # scikit-learn (e.g. NMF, TfidfTransformer) takes the document-term matrix
+    document_term_matrix = corpus.to_csr()
+
+    # gensim (e.g. LdaModel) takes the corpus itself as a bag-of-words stream
+    lda_model = LdaModel(corpus=corpus, id2word=corpus.to_gensim_dictionary(), num_topics=3)
+
+"""
+
+import numpy as np
+
+
+class TokenCorpus:
+    """Stores a corpus of tokenized documents in CSR form: the token ids of every document one after
+    another in a single int32 array, with `offsets[i]:offsets[i + 1]` giving the positions of
+    document i. Alongside it are the vocabulary (token id -> token) and the number of documents each
+    token appears in.
+
+    Documents can be added at any time with `add_documents`, new tokens are given the next ids.
+
+    Parameters
+    ----------
+    documents : iterable of lists of str
+        The tokenized documents, e.g. the `textTekkenCharactersRemoved` column. None for an empty
+        corpus.
+
+    Attributes
+    ----------
+    vocabulary : list of str
+        The token for each token id.
+
+    token_ids : dict
+        The token id for each token.
+
+    Notes
+    ------
+    Iterating over the corpus yields each document as a gensim bag-of-words, so it can be passed as
+    the `corpus` of any gensim model.
+
+    """
+
+    def __init__(self, documents=None):
+        self.vocabulary = []
+        self.token_ids = {}
+
+        # the arrays are allocated with spare room and only the first `_size` values are used, so
+        # adding documents doesn't copy the whole corpus each time
+        self._ids = np.empty(0, dtype=np.int32)
+        self._offsets = np.zeros(1, dtype=np.int64)
+        self._document_frequencies = np.zeros(0, dtype=np.int64)
+        self._size = 0
+        self._documents = 0
+
+        if documents is not None:
+            self.add_documents(documents)
+
+    def __repr__(self):
+        return f"TokenCorpus(documents={len(self)}, tokens={self._size}, vocabulary={len(self.vocabulary)})"
+
+    def __len__(self):
+        return self._documents
+
+    def __getitem__(self, index):
+        """Returns the token ids of a document (a view, not a copy)."""
+        if not -len(self) <= index < len(self):
+            raise IndexError(f"Document {index} is out of range for a corpus of {len(self)} documents.")
+
+        index %= len(self)
+        return self.ids[self._offsets[index]:self._offsets[index + 1]]
+
+    def __iter__(self):
+        """Yields each document as a gensim bag-of-words: a list of (token id, count) tuples."""
+        for index in range(len(self)):
+            token_ids, counts = np.unique(self[index], return_counts=True)
+            yield list(zip(token_ids.tolist(), counts.tolist()))
+
+    @property
+    def ids(self):
+        """The token ids of every document one after another (int32)."""
+        return self._ids[:self._size]
+
+    @property
+    def offsets(self):
+        """The position in `ids` where each document starts, followed by the total number of tokens."""
+        return self._offsets[:self._documents + 1]
+
+    @property
+    def document_frequencies(self):
+        """The number of documents each token id appears in."""
+        return self._document_frequencies[:len(self.vocabulary)]
+
+    def tokens(self, index):
+        """Returns the tokens of a document as strings."""
+        return [self.vocabulary[token_id] for token_id in self[index].tolist()]
+
+    def add_documents(self, documents):
+        """Adds documents to the end of the corpus, adding any new tokens to the vocabulary.
+
+        Parameters
+        ----------
+        documents : iterable of lists of str
+            The tokenized documents.
+
+        Returns
+        -------
+        None
+
+        """
+        token_ids = self.token_ids
+        vocabulary = self.vocabulary
+        vocabulary_size = len(vocabulary)
+        new_ids = []
+        lengths = []
+
+        for document in documents:
+            start = len(new_ids)
+            for token in document:
+                token_id = token_ids.get(token)
+                if token_id is None:
+                    token_id = token_ids[token] = len(vocabulary)
+                    vocabulary.append(token)
+                new_ids.append(token_id)
+            lengths.append(len(new_ids) - start)
+
+        new_ids = np.array(new_ids, dtype=np.int32)
+        lengths = np.array(lengths, dtype=np.int64)
+
+        self._ids = _reserve(self._ids, self._size + len(new_ids))
+        self._ids[self._size:self._size + len(new_ids)] = new_ids
+
+        self._offsets = _reserve(self._offsets, self._documents + len(lengths) + 1)
+        self._offsets[self._documents + 1:self._documents + len(lengths) + 1] = self._size + np.cumsum(lengths)
+
+        self._document_frequencies = _reserve(self._document_frequencies, len(vocabulary))
+        self._document_frequencies[vocabulary_size:len(vocabulary)] = 0
+
+        # each distinct (document, token id) pair adds one to the token's document frequency
+        if len(new_ids):
+            pairs = np.unique(np.repeat(np.arange(len(lengths), dtype=np.int64), lengths) * len(vocabulary) + new_ids)
+            self._document_frequencies[:len(vocabulary)] += np.bincount(pairs % len(vocabulary), minlength=len(vocabulary))
+
+        self._size += len(new_ids)
+        self._documents += len(lengths)
+
+    def filter_extremes(self, no_below=5, no_above=0.5, keep_n=100_000):
+        """Returns a new corpus without the rare and very common tokens, with the same rules as
+        gensim's `Dictionary.filter_extremes`.
+
+        Parameters
+        ----------
+        no_below : int
+            Remove tokens appearing in fewer than this many documents.
+
+        no_above : float
+            Remove tokens appearing in more than this fraction of the documents.
+
+        keep_n : int
+            Then only keep this many of the tokens appearing in the most documents, None for all.
+
+        Returns
+        -------
+        corpus : TokenCorpus
+            The filtered corpus. Every document is kept (even if it becomes empty), and the
+            remaining tokens keep their order in the vocabulary but are given new ids.
+
+        """
+        frequencies = self.document_frequencies
+        keep = (frequencies >= no_below) & (frequencies <= no_above * len(self))
+
+        if keep_n is not None and keep.sum() > keep_n:
+            kept = np.flatnonzero(keep)
+            kept = kept[np.argsort(-frequencies[kept], kind="stable")[:keep_n]]
+            keep = np.zeros_like(keep)
+            keep[kept] = True
+
+        new_ids = np.cumsum(keep, dtype=np.int64) - 1
+        kept_positions = keep[self.ids]
+
+        corpus = TokenCorpus()
+        corpus.vocabulary = [token for token, kept in zip(self.vocabulary, keep.tolist()) if kept]
+        corpus.token_ids = {token: token_id for token_id, token in enumerate(corpus.vocabulary)}
+        corpus._ids = new_ids[self.ids[kept_positions]].astype(np.int32)
+        corpus._offsets = np.concatenate(([0], np.cumsum(kept_positions, dtype=np.int64)))[self.offsets]
+        corpus._document_frequencies = frequencies[keep].copy()
+        corpus._size = len(corpus._ids)
+        corpus._documents = len(self)
+
+        return corpus
+
+    def to_csr(self):
+        """Returns the document-term matrix as a scipy CSR matrix.
+
+        Returns
+        -------
+        matrix : scipy.sparse.csr_matrix
+            A (documents x vocabulary) matrix of token counts, with sorted int32 token ids and one 
+            entry per token in each document.
+
+        Notes
+        ------
+        The matrix is built from the id arrays with numpy rather than by going through the tokens, 
+        but it doesn't share them. scipy sorts and merges the entries of a matrix with repeated 
+        token ids in place the first time it is used (even `matrix.sum()` does this), which would 
+        reorder the tokens of the corpus.
+
+        """
+        from scipy.sparse import csr_matrix
+
+        vocabulary_size = max(len(self.vocabulary), 1)
+        documents = np.repeat(np.arange(len(self), dtype=np.int64), np.diff(self.offsets))
+        keys, counts = np.unique(documents * vocabulary_size + self.ids, return_counts=True)
+
+        indptr = np.zeros(len(self) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(keys // vocabulary_size, minlength=len(self)), out=indptr[1:])
+
+        return csr_matrix((counts.astype(np.int32), (keys % vocabulary_size).astype(np.int32), indptr),
+                          shape=(len(self), len(self.vocabulary)))
+
+    def to_gensim_dictionary(self):
+        """Returns a gensim `Dictionary` with the same token ids and document frequencies, without
+        going through the documents again.
+
+        Returns
+        -------
+        dictionary : gensim.corpora.Dictionary
+            The dictionary.
+
+        """
+        from gensim.corpora import Dictionary
+
+        dictionary = Dictionary()
+        dictionary.token2id = dict(self.token_ids)
+        dictionary.dfs = dict(enumerate(self.document_frequencies.tolist()))
+        dictionary.cfs = dict(enumerate(np.bincount(self.ids, minlength=len(self.vocabulary)).tolist()))
+        dictionary.num_docs = len(self)
+        dictionary.num_pos = self._size
+        dictionary.num_nnz = int(self.document_frequencies.sum())
+
+        return dictionary
+
+    def save(self, path):
+        """Saves the corpus to a `.npz` file.
+
+        Parameters
+        ----------
+        path : str or Path
+            The file to write to.
+
+        Returns
+        -------
+        None
+
+        """
+        np.savez(path,
+                 ids=self.ids,
+                 offsets=self.offsets,
+                 document_frequencies=self.document_frequencies,
+                 vocabulary=np.array(self.vocabulary, dtype=np.str_))
+
+    @classmethod
+    def load(cls, path):
+        """Loads a corpus saved with `save`.
+
+        Parameters
+        ----------
+        path : str or Path
+            The file to read.
+
+        Returns
+        -------
+        corpus : TokenCorpus
+            The corpus, more documents can be added to it.
+
+        """
+        with np.load(path) as arrays:
+            corpus = cls()
+            corpus.vocabulary = arrays["vocabulary"].tolist()
+            corpus.token_ids = {token: token_id for token_id, token in enumerate(corpus.vocabulary)}
+            corpus._ids = arrays["ids"]
+            corpus._offsets = arrays["offsets"]
+            corpus._document_frequencies = arrays["document_frequencies"]
+            corpus._size = len(corpus._ids)
+            corpus._documents = len(corpus._offsets) - 1
+
+        return corpus
+
+
+def _reserve(array, size):
+    """Helper function that returns `array` if it can hold `size` values, otherwise a copy of it
+    with room for at least double that. Used as a helper for `TokenCorpus.add_documents`.
+
+    """
+    if size <= len(array):
+        return array
+
+    grown = np.empty(max(size, 2 * len(array)), dtype=array.dtype)
+    grown[:len(array)] = array
+    return grown
@@ -2,6 +2,7 @@
 """Module contains functions that create topics and build them into a dataframe:
 
     `_heaviest_words_indices(topic, number_of_words)`
+    `_topic_word_weights(model)`
     ``topic_dataframe((model, feature_names, number_of_words))
 
 """
@@ -36,6 +37,30 @@ def _heaviest_words_indices(topic, number_of_words):
 
 
 
+def _topic_word_weights(model):
+    """Helper function that returns a model's (topics x words) matrix of word weights. Used as a 
+    helper for the `topic_dataframe` function.
+
+
+    Parameters
+    ----------
+    model : scikit-learn or gensim topic model
+        A scikit-learn model with a `components_` attribute (e.g. NMF, LatentDirichletAllocation) 
+        or a gensim model with a `get_topics` method (e.g. LdaModel, Nmf).
+
+    Returns
+    --------
+    A numpy array with a row of word weights for each topic.
+    
+    """
+
+    if hasattr(model, "components_"):
+        return model.components_
+
+    return model.get_topics()
+
+
+
 
 def topic_dataframe(model, feature_names, number_of_words):
     """Creates a dataframe that shows the x number_of_words with the greatest weight for
@@ -43,8 +68,10 @@ def topic_dataframe(model, feature_names, number_of_words):
 
     Parameters
     ----------
-    model : scikit-learn NMF model
-        The scikit-learn Non-Negative Matrix Factorisation model.
+    model : scikit-learn NMF model or gensim topic model
+        The scikit-learn Non-Negative Matrix Factorisation model, or any model with a `components_`
+        attribute or a `get_topics` method (e.g. gensim's LdaModel, or a model chosen with 
+        `src.modeling.model_selection.sweep_topic_numbers`).
 
     feature_names : list
         The feature names created from the TF-IDF vectoriser.
@@ -63,7 +90,7 @@ def topic_dataframe(model, feature_names, number_of_words):
     """
     
     topics = {}
-    for topic_index, topic in enumerate(model.components_):
+    for topic_index, topic in enumerate(_topic_word_weights(model)):
         t = (topic_index)
         topics[t] = [feature_names[i] for i in _heaviest_words_indices(topic, number_of_words)]
     
@@ -0,0 +1,449 @@
+# pipeline.py
+"""Module contains the end-to-end pipeline that the notebooks run cell by cell, as a list of stages
+that can be run from the command line (see `src/__main__.py`):
+
+    fetch -> clean -> annotate -> vectorize -> model -> report
+
+    `PipelineConfig(...)`
+    `run_pipeline(config, until, force)`
+
+Each stage's output is cached under a key made from its configuration and the key of the stage
+before it, so re-running the pipeline skips every stage whose inputs and configuration haven't
+changed. Comments fetched from the API are cached for the day (see `PipelineConfig.fetch_date`),
+use `--force fetch` to fetch them again sooner. The time, CPU time and memory used by each stage are printed and saved with the report.
+
+Example
+--------
+    python -m src --raw-comments data/raw/new_character_reveal_comments.csv --num-topics 10
+
+    python -m src --channel-id UC_ntXHv-XdKCD7CPynVvnQw --published-after 2023-11-01T00:00:00Z \\
+        --published-before 2023-12-21T00:00:00Z --search-term tekken \\
+        --video-title "the return of legends - new characters reveal trailer"
+
+"""
+
+import hashlib
+import json
+import os
+import pickle
+import time
+import tracemalloc
+from dataclasses import asdict, dataclass, field
+from datetime import datetime, timezone
+from importlib import metadata
+from pathlib import Path
+
+try:
+    import resource   # not available on Windows
+except ImportError:
+    resource = None
+
+
+STAGES = ("fetch", "clean", "annotate", "vectorize", "model", "report")
+
+# the settings of the token filter the annotate stage applies to the lemmas (besides `min_length`),
+# part of its cache key along with the character names file
+ANNOTATE_TOKEN_FILTER = {"stop_words": (), "unique": False}
+
+
+@dataclass
+class PipelineConfig:
+    """The settings for a pipeline run. The settings each stage uses are part of its cache key.
+
+    Parameters
+    ----------
+    raw_comments : str
+        A CSV or Parquet file of comments (e.g. data/raw/new_character_reveal_comments.csv) to use
+        instead of fetching them from the YouTube API.
+
+    channel_ids, published_after, published_before, search_term
+        The channels and date range searched for videos when fetching, see `discover_video_ids`.
+
+    video_title : str
+        Only fetch the comments of videos whose title contains this (case insensitive), None for
+        every video found.
+
+    fetch_date : str
+        The date (YYYY-MM-DD) comments fetched from the API are cached for, None for today's (UTC)
+        date. A cached fetch is reused for the rest of the day and the comments are fetched again
+        the next day. Give an earlier date to reuse that day's fetch, or force the fetch stage to
+        fetch the comments again today.
+
+    max_workers : int
+        The number of videos (and searches) fetched at the same time.
+
+    min_length : int
+        Lemmas with fewer characters are removed, as `remove_tiny_tokens` does.
+
+    batch_size, n_process
+        Passed to `process_comments`.
+
+    no_below, no_above, keep_n
+        The vocabulary filter, see `TokenCorpus.filter_extremes`.
+
+    model : str
+        "nmf" (scikit-learn NMF of the TF-IDF matrix) or "lda" (gensim LdaModel).
+
+    num_topics : int
+        The number of topics.
+
+    random_state : int
+        The seed used by the model.
+
+    number_of_words : int
+        The number of words shown for each topic in the report.
+
+    output_dir : str
+        Where the report and the run summary are written.
+
+    cache_dir : str
+        Where each stage's output is cached.
+
+    trace_memory : bool
+        Whether to also measure the peak memory allocated by Python in each stage with
+        `tracemalloc`. This slows the stages down.
+
+    """
+    raw_comments: str = None
+    channel_ids: list = field(default_factory=list)
+    published_after: str = None
+    published_before: str = None
+    search_term: str = None
+    video_title: str = None
+    fetch_date: str = None
+    max_workers: int = 1
+
+    min_length: int = 3
+    batch_size: int = 1000
+    n_process: int = 1
+
+    no_below: int = 3
+    no_above: float = 0.85
+    keep_n: int = 5000
+
+    model: str = "nmf"
+    num_topics: int = 10
+    random_state: int = 42
+
+    number_of_words: int = 10
+
+    output_dir: str = "models/pipeline"
+    cache_dir: str = "data/cache/pipeline"
+    trace_memory: bool = False
+
+    def stage_config(self, stage):
+        """Returns the settings that change the output of a stage."""
+        if stage == "fetch":
+            if self.raw_comments is not None:
+                return {"raw_comments": _file_hash(self.raw_comments)}
+            return {"channel_ids": self.channel_ids, "published_after": self.published_after,
+                    "published_before": self.published_before, "search_term": self.search_term,
+                    "video_title": self.video_title,
+                    "fetch_date": self.fetch_date or datetime.now(timezone.utc).date().isoformat()}
+
+        if stage == "clean":
+            from src.processing.text_cleaning import DEFAULT_CLEANING_STEPS
+            return {"steps": [step.__name__ for step in DEFAULT_CLEANING_STEPS]}
+
+        if stage == "annotate":
+            from src.processing.text_processing import MODEL_NAME, TEKKEN_CHARACTER_NAMES_PATH
+            return {"model": MODEL_NAME, "model_version": _package_version(MODEL_NAME),
+                    "spacy": _package_version("spacy"), "min_length": self.min_length,
+                    "token_filter": ANNOTATE_TOKEN_FILTER, "character_names": _file_hash(TEKKEN_CHARACTER_NAMES_PATH)}
+
+        if stage == "vectorize":
+            return {"no_below": self.no_below, "no_above": self.no_above, "keep_n": self.keep_n}
+
+        if stage == "model":
+            return {"model": self.model, "num_topics": self.num_topics, "random_state": self.random_state}
+
+        if stage == "report":
+            return {"number_of_words": self.number_of_words}
+
+        raise ValueError(f"Unknown stage '{stage}', use one of {STAGES}.")
+
+
+def run_pipeline(config, until="report", force=()):
+    """Runs the pipeline up to and including a stage, reusing the cached output of every stage whose
+    inputs and configuration haven't changed.
+
+    Parameters
+    ----------
+    config : PipelineConfig
+        The settings for the run.
+
+    until : str
+        The last stage to run.
+
+    force : iterable of str
+        Stages to run even if their output is cached (the stages after them then run too).
+
+    Returns
+    -------
+    summary : list of dict
+        For each stage: "stage", "key", "status" ("cached" or "ran"), "seconds", "cpu_seconds",
+        "peak_rss_mb" and (with `trace_memory`) "peak_python_mb".
+
+    """
+    stages = STAGES[:STAGES.index(until) + 1]
+    cache_dir = Path(config.cache_dir)
+    cache_dir.mkdir(parents=True, exist_ok=True)
+
+    # each key depends on the key before it, so a change to one stage invalidates every later stage
+    keys = {}
+    previous_key = ""
+    for stage in stages:
+        keys[stage] = previous_key = _hash({"stage": stage, "config": config.stage_config(stage), "input": previous_key})
+
+    paths = {stage: cache_dir / f"{stage}-{keys[stage][:16]}{_STAGE_EXTENSIONS[stage]}" for stage in stages}
+
+    # the first stage that has to run, every stage before it is loaded from the cache (if needed)
+    first = next((index for index, stage in enumerate(stages) if stage in force or not paths[stage].exists()),
+                 len(stages))
+
+    summary = []
+    output = None
+
+    for index, stage in enumerate(stages):
+        if index < first:
+            summary.append({"stage": stage, "key": keys[stage][:16], "status": "cached"})
+            print(f"[{stage}] cached ({paths[stage].name})")
+            continue
+
+        if output is None and index > 0:
+            output = _STAGE_LOADERS[stages[index - 1]](paths[stages[index - 1]])
+
+        # written to a temporary file first, so a stage that fails part way through isn't cached
+        temporary_path = paths[stage].with_name(f"{paths[stage].stem}.tmp{paths[stage].suffix}")
+        with _StageMeasurement(config.trace_memory) as measurement:
+            output = _STAGE_FUNCTIONS[stage](output, config)
+            _STAGE_SAVERS[stage](output, temporary_path)
+        temporary_path.replace(paths[stage])
+
+        summary.append({"stage": stage, "key": keys[stage][:16], "status": "ran", **measurement.results})
+        print(f"[{stage}] ran in {measurement.results['seconds']:.2f}s "
+              f"(cpu {measurement.results['cpu_seconds']:.2f}s, peak RSS {measurement.results['peak_rss_mb']} MB)")
+
+    _write_report(config, stages, paths, summary)
+
+    return summary
+
+
+def _fetch(_, config):
+    """Stage that returns the raw comments, from `raw_comments` or the YouTube API."""
+    if config.raw_comments is not None:
+        from src.storage.comment_store import read_comments, read_comments_csv
+        return read_comments(config.raw_comments) if str(config.raw_comments).endswith(".parquet") \
+            else read_comments_csv(config.raw_comments)
+
+    import googleapiclient.discovery
+    from src.api.get_youtube_data import discover_video_ids, get_top_level_comments, get_video_data
+
+    api_key = os.environ.get("API_KEY")
+    def build_service():
+        return googleapiclient.discovery.build("youtube", "v3", developerKey=api_key)
+
+    youtube = build_service()
+    video_ids = discover_video_ids(youtube, config.channel_ids, config.published_after, config.published_before,
+                                   config.search_term, max_workers=config.max_workers, service_factory=build_service)
+    videos = get_video_data(youtube, video_ids)
+    if config.video_title is not None:
+        videos = videos.loc[videos["title"].str.lower().str.contains(config.video_title.lower(), regex=False)]
+
+    return get_top_level_comments(youtube, videos["videoId"].tolist(), max_workers=config.max_workers,
+                                  service_factory=build_service)
+
+
+def _clean(df, config):
+    """Stage that cleans the comments' text, as in `~2.prepare-data.ipynb`."""
+    from src.processing.text_cleaning import clean_series
+    from src.processing.text_processing import word_count
+
+    df = df.copy()
+    df["textDisplay"] = clean_series(df["textDisplay"].fillna(""))
+    df["textDisplayWordCount"] = df["textDisplay"].map(word_count)
+
+    return df
+
+
+def _annotate(df, config):
+    """Stage that adds the token, lemma and part of speech columns, removes short lemmas and
+    character names, and drops the comments left without any lemmas.
+
+    """
+    from src.processing.comment_cache import CommentCache
+    from src.processing.text_processing import (CharacterNameFilter, TokenFilter, load_tekken_character_names,
+                                                model_version, process_comments)
+
+    # comments parsed by an earlier run (of any configuration) aren't parsed again
+    with CommentCache(Path(config.cache_dir) / "comments.sqlite", config={"function": "process_comments"},
+                      model_version=model_version()) as cache:
+        df = process_comments(df, batch_size=config.batch_size, n_process=config.n_process, cache=cache)
+        print(f"[annotate] comment cache: {cache.stats()}")
+
+    df["textLemmatized"] = TokenFilter(min_length=config.min_length, **ANNOTATE_TOKEN_FILTER).filter_many(
+        df["textLemmatized"])
+    # only exact matches, as the clean stage has already removed the apostrophes of any possessives
+    df["textTekkenCharactersRemoved"] = CharacterNameFilter(load_tekken_character_names(),
+                                                            possessives=False).filter_many(df["textLemmatized"])
+    df["textProcessedCharactersRemoved"] = df["textTekkenCharactersRemoved"].map(" ".join)
+
+    df = df.loc[df["textProcessedCharactersRemoved"] != ""].reset_index(drop=True)
+
+    return df
+
+
+def _vectorize(df, config):
+    """Stage that builds the token corpus used by the models."""
+    from src.modeling.token_corpus import TokenCorpus
+
+    return (TokenCorpus(df["textTekkenCharactersRemoved"])
+            .filter_extremes(no_below=config.no_below, no_above=config.no_above, keep_n=config.keep_n))
+
+
+def _model(corpus, config):
+    """Stage that fits the topic model, returning the model and the vocabulary it was fitted on."""
+    from src.modeling.model_selection import fit_topic_model
+
+    model = fit_topic_model(corpus, config.model, config.num_topics, config.random_state)
+
+    return {"model": model, "vocabulary": corpus.vocabulary}
+
+
+def _report(fitted, config):
+    """Stage that returns the most heavily weighted words for each topic."""
+    from src.modeling.topic_dataframe import topic_dataframe
+
+    return topic_dataframe(fitted["model"], fitted["vocabulary"], config.number_of_words)
+
+
+def _write_report(config, stages, paths, summary):
+    """Helper function that copies the last stage's output to `output_dir` (when it is the report)
+    and writes the run summary next to it. Used as a helper for `run_pipeline`.
+
+    """
+    output_dir = Path(config.output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    if stages[-1] == "report":
+        (output_dir / "topics.csv").write_bytes(paths["report"].read_bytes())
+
+    with open(output_dir / "run_summary.json", "w") as file:
+        json.dump({"config": asdict(config), "stages": summary}, file, indent=2, default=str)
+
+
+class _StageMeasurement:
+    """Helper context manager that measures the wall time, CPU time and peak memory of a stage.
+    Used as a helper for `run_pipeline`.
+
+    """
+
+    def __init__(self, trace_memory=False):
+        self.trace_memory = trace_memory
+        self.results = {}
+
+    def __enter__(self):
+        if self.trace_memory:
+            tracemalloc.start()
+        self._start = time.perf_counter()
+        self._cpu_start = time.process_time()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.results["seconds"] = round(time.perf_counter() - self._start, 3)
+        self.results["cpu_seconds"] = round(time.process_time() - self._cpu_start, 3)
+        # the peak for the whole process so far, so it only goes up from one stage to the next
+        self.results["peak_rss_mb"] = _peak_rss_mb()
+
+        if self.trace_memory:
+            self.results["peak_python_mb"] = round(tracemalloc.get_traced_memory()[1] / 2 ** 20, 1)
+            tracemalloc.stop()
+
+
+def _peak_rss_mb():
+    """Helper function that returns the peak resident memory of the process in MB, None where the
+    `resource` module isn't available.
+
+    """
+    if resource is None:
+        return None
+
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (2 ** 20 if os.uname().sysname == "Darwin" else 2 ** 10), 1)
+
+
+def _hash(value):
+    """Helper function that returns the SHA-256 hash of a JSON serialisable value."""
+    return hashlib.sha256(json.dumps(value, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+def _file_hash(path):
+    """Helper function that returns the SHA-256 hash of a file's contents."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        for chunk in iter(lambda: file.read(2 ** 20), b""):
+            digest.update(chunk)
+
+    return digest.hexdigest()
+
+
+def _package_version(name):
+    """Helper function that returns the installed version of a package without importing it, None
+    if it isn't installed.
+
+    """
+    try:
+        return metadata.version(name)
+    except metadata.PackageNotFoundError:
+        return None
+
+
+def _save_comments(df, path):
+    """Helper function that saves the output of the comment stages."""
+    from src.storage.comment_store import write_comments
+    write_comments(df, path)
+
+
+def _load_comments(path):
+    """Helper function that loads the output of the comment stages."""
+    from src.storage.comment_store import read_comments
+    return read_comments(path)
+
+
+def _save_pickle(value, path):
+    """Helper function that saves the output of the model stage."""
+    with open(path, "wb") as file:
+        pickle.dump(value, file)
+
+
+def _load_pickle(path):
+    """Helper function that loads the output of the model stage."""
+    with open(path, "rb") as file:
+        return pickle.load(file)
+
+
+def _load_corpus(path):
+    """Helper function that loads the output of the vectorize stage."""
+    from src.modeling.token_corpus import TokenCorpus
+    return TokenCorpus.load(path)
+
+
+_STAGE_FUNCTIONS = {"fetch": _fetch, "clean": _clean, "annotate": _annotate, "vectorize": _vectorize,
+                    "model": _model, "report": _report}
+
+_STAGE_EXTENSIONS = {"fetch": ".parquet", "clean": ".parquet", "annotate": ".parquet", "vectorize": ".npz",
+                     "model": ".pickle", "report": ".csv"}
+
+_STAGE_SAVERS = {"fetch": _save_comments,
+                 "clean": _save_comments,
+                 "annotate": _save_comments,
+                 "vectorize": lambda corpus, path: corpus.save(path),
+                 "model": _save_pickle,
+                 "report": lambda df, path: df.to_csv(path, index=False)}
+
+_STAGE_LOADERS = {"fetch": _load_comments,
+                  "clean": _load_comments,
+                  "annotate": _load_comments,
+                  "vectorize": _load_corpus,
+                  "model": _load_pickle}
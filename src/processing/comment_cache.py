@@ -0,0 +1,208 @@
+# comment_cache.py
+"""Module contains an on-disk cache for cleaned and processed comments, so re-running the pipeline
+only processes comments that are new or have been edited:
+
+    `CommentCache(path, config, model_version, max_entries)`
+
+Example
+--------
+    from src.processing.comment_cache import CommentCache
+    from src.processing.text_processing import annotate_comment, model_version, process_comments
+
+    # only the comments that are new or have been edited since the last run are parsed
+    with CommentCache("data/cache/processed_comments.sqlite", config={"function": "process_comments"},
+                      model_version=model_version()) as cache:
+        df = process_comments(df, cache=cache)
+
+    # or cache the results of any function of the comments
+
+    with CommentCache("data/cache/comments.sqlite", config={"steps": "default"},
+                      model_version=model_version()) as cache:
+        annotations = cache.process(df["textDisplay"].tolist(),
+                                    lambda texts: [annotate_comment(text) for text in texts])
+        print(cache.stats())
+
+"""
+
+import hashlib
+import json
+import sqlite3
+
+
+# the number of keys looked up per SQL query (SQLite limits the number of parameters in a query)
+_QUERY_BATCH_SIZE = 500
+
+
+class CommentCache:
+    """Stores the processed version of each comment in a SQLite database, keyed by a hash of the
+    raw text, the processing configuration and the spaCy model version. Changing the configuration
+    or the model therefore never returns stale results.
+
+    When the cache holds more than `max_entries` comments, the least recently used are removed.
+
+    Parameters
+    ----------
+    path : str or Path
+        The path of the SQLite database, it is created if it doesn't exist.
+
+    config : dict
+        Anything that changes the processed output, e.g. the cleaning steps used. Must be JSON
+        serialisable (other values are converted with `str`).
+
+    model_version : str
+        The spaCy model version, see `src.processing.text_processing.model_version`.
+
+    max_entries : int
+        The maximum number of comments stored.
+
+    """
+
+    def __init__(self, path, config=None, model_version=None, max_entries=1_000_000):
+        self.path = path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+
+        self._namespace = json.dumps({"config": config, "model_version": model_version}, sort_keys=True, default=str)
+        self._connection = sqlite3.connect(path)
+        self._connection.execute("CREATE TABLE IF NOT EXISTS comments "
+                                 "(key TEXT PRIMARY KEY, value TEXT NOT NULL, last_used INTEGER NOT NULL)")
+        self._connection.execute("CREATE INDEX IF NOT EXISTS comments_last_used ON comments (last_used)")
+        self._clock = self._connection.execute("SELECT COALESCE(MAX(last_used), 0) FROM comments").fetchone()[0]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __len__(self):
+        return self._connection.execute("SELECT COUNT(*) FROM comments").fetchone()[0]
+
+    def key(self, text):
+        """Returns the key a comment is stored under: the SHA-256 hash of the configuration, the
+        model version and the raw text.
+
+        """
+        return hashlib.sha256(f"{self._namespace}\0{text}".encode("utf-8")).hexdigest()
+
+    def get_many(self, texts):
+        """Looks up a list of comments.
+
+        Parameters
+        ----------
+        texts : list of str
+            The raw comments.
+
+        Returns
+        -------
+        records : list
+            The stored record for each comment, or None if the comment isn't in the cache.
+
+        """
+        keys = [self.key(text) for text in texts]
+        found = {}
+
+        for start in range(0, len(keys), _QUERY_BATCH_SIZE):
+            batch = keys[start:start + _QUERY_BATCH_SIZE]
+            query = f"SELECT key, value FROM comments WHERE key IN ({', '.join('?' * len(batch))})"
+            found.update(self._connection.execute(query, batch))
+
+        if found:
+            self._clock += 1
+            with self._connection:
+                self._connection.executemany("UPDATE comments SET last_used = ? WHERE key = ?",
+                                             ((self._clock, key) for key in found))
+
+        records = [json.loads(found[key]) if key in found else None for key in keys]
+        self.hits += len(keys) - records.count(None)
+        self.misses += records.count(None)
+
+        return records
+
+    def put_many(self, texts, records):
+        """Stores the processed records for a list of comments.
+
+        Parameters
+        ----------
+        texts : list of str
+            The raw comments.
+
+        records : list
+            The processed version of each comment, anything JSON serialisable (e.g. a dictionary
+            of the cleaned text, tokens, lemmas and parts of speech).
+
+        Returns
+        -------
+        None
+
+        """
+        self._clock += 1
+        with self._connection:
+            self._connection.executemany("INSERT OR REPLACE INTO comments (key, value, last_used) VALUES (?, ?, ?)",
+                                         ((self.key(text), json.dumps(record), self._clock)
+                                          for text, record in zip(texts, records)))
+            self._evict()
+
+    def process(self, texts, function):
+        """Returns the processed version of each comment, only calling `function` for the comments
+        that aren't already in the cache and storing its results.
+
+        Parameters
+        ----------
+        texts : list of str
+            The raw comments.
+
+        function : callable
+            Takes a list of the (distinct) comments missing from the cache and returns a list with
+            the processed version of each one.
+
+        Returns
+        -------
+        records : list
+            The processed version of each comment, in the same order as `texts`.
+
+        """
+        texts = list(texts)
+        records = self.get_many(texts)
+        missing = [index for index, record in enumerate(records) if record is None]
+
+        if missing:
+            missing_texts = list(dict.fromkeys(texts[index] for index in missing))   # each distinct comment is processed once
+            new_records = list(function(missing_texts))
+            self.put_many(missing_texts, new_records)
+
+            new_records = dict(zip(missing_texts, new_records))
+            for index in missing:
+                records[index] = new_records[texts[index]]
+
+        return records
+
+    def stats(self):
+        """Returns the number of hits, misses and stored comments since the cache was opened.
+
+        Returns
+        -------
+        stats : dict
+            "hits", "misses", "hit_rate" and "entries".
+
+        """
+        lookups = self.hits + self.misses
+        return {"hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "entries": len(self)}
+
+    def close(self):
+        """Closes the connection to the database."""
+        self._connection.close()
+
+    def _evict(self):
+        """Helper method that removes the least recently used comments once there are more than
+        `max_entries`.
+
+        """
+        excess = len(self) - self.max_entries
+        if excess > 0:
+            self._connection.execute("DELETE FROM comments WHERE key IN "
+                                     "(SELECT key FROM comments ORDER BY last_used LIMIT ?)", (excess,))
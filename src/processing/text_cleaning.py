@@ -11,6 +11,8 @@
     `remove_digits(text)`
     `remove_href_pattern(text)`
     `remove_website_links(text)`
+    `CleaningPipeline(steps)`
+    `clean_series(series, steps)`
 
 
 """
@@ -20,6 +22,21 @@ from bs4 import BeautifulSoup
 import html
 import contractions
 import re
+from functools import partial
+
+
+# patterns are compiled once when the module is imported rather than on every call
+_PUNCTUATION_PATTERN = re.compile(r"[^\w\s]")
+_DIGITS_PATTERN = re.compile(r"\d")
+_WHITESPACE_PATTERN = re.compile(r"\s+")
+_HREF_PATTERN = re.compile(r"href\S+")
+
+# patterns used by `remove_website_links`, each one is a single character class (or fixed length) 
+# so none of them can backtrack
+_HOST_PATTERN = re.compile(r"[\da-z.-]+")
+_TOP_LEVEL_DOMAIN_PATTERN = re.compile(r"\.[a-z.]{2}")
+_LINK_PATH_PATTERN = re.compile(r"[\/\w .-]*")
+_LINK_SCHEMES = ("https://", "http://")
 
 
 def normalize_text(text):
@@ -70,8 +87,7 @@ def remove_all_punctuation(text):
         The string of text without punctuation and special characters.
 
     """
-    pattern = r"[^\w\s]"
-    return re.sub(pattern, "", text)
+    return _PUNCTUATION_PATTERN.sub("", text)
 
 
 def remove_emojis(text):
@@ -153,9 +169,7 @@ def remove_digits(text):
         The string of text without any digits.
 
     """
-    pattern = r"\d"
-    
-    return re.sub(pattern, "", text)
+    return _DIGITS_PATTERN.sub("", text)
     
 
 def remove_extra_whitespace(text):
@@ -172,11 +186,16 @@ def remove_extra_whitespace(text):
     
     """
 
-    return re.sub(r"\s+", " ", text).strip()
+    return _WHITESPACE_PATTERN.sub(" ", text).strip()
 
 
 def remove_website_links(text):
     """Removes website links from a string.
+
+    Removes the same text as `re.sub(r"(https?:\/\/)?([\da-z\.-]+)\.([a-z\.]{2,6})([\/\w \.-]*)*\/?", "", text)`
+    but runs in time proportional to the length of the text. The regex backtracks over every run 
+    of letters, digits, dots and hyphens that doesn't contain a link, which makes it quadratic on 
+    long comments.
     
     Parameters
     -----------
@@ -186,10 +205,33 @@ def remove_website_links(text):
     Returns
     --------
     The string with website links removed.
+
+    Notes
+    ------
+    A link is a run of lower case letters, digits, "." and "-" (the host) containing a "." followed 
+    by two or more lower case letters or dots (the top level domain), optionally preceded by 
+    "http://" or "https://". As with the regex, the link continues to the end of the following 
+    run of word characters, spaces, "/", "." and "-" (the path).
     """
+    pieces = []
+    position = 0   # the end of the last link removed
+
+    for host in _HOST_PATTERN.finditer(text):
+        start = host.start()
+        if start < position or not _TOP_LEVEL_DOMAIN_PATTERN.search(text, start + 1, host.end()):
+            continue
+
+        for scheme in _LINK_SCHEMES:
+            if start - len(scheme) >= position and text.startswith(scheme, start - len(scheme)):
+                start -= len(scheme)
+                break
 
-    pattern = r"(https?:\/\/)?([\da-z\.-]+)\.([a-z\.]{2,6})([\/\w \.-]*)*\/?"  # Comprehensive pattern for URLs
-    return re.sub(pattern, "", text)
+        pieces.append(text[position:start])
+        position = _LINK_PATH_PATTERN.match(text, host.start()).end()
+
+    pieces.append(text[position:])
+
+    return "".join(pieces)
 
 
 def remove_href_pattern(text):
@@ -206,6 +248,199 @@ def remove_href_pattern(text):
        The string with the "href" pattern removed.
  """
     
- pattern = r"href\S+"
+ return _HREF_PATTERN.sub("", text)
+
+
+
+# the cleaning steps in the order they are applied in the notebooks
+DEFAULT_CLEANING_STEPS = (normalize_text, process_contractions, remove_website_links, remove_html_unescape, 
+                          remove_emojis, remove_digits, remove_all_punctuation, remove_href_pattern, 
+                          remove_extra_whitespace)
+
+# the operations each step is made of, so consecutive regex steps can be fused by `CleaningPipeline`:
+#   ("lower",) - str.lower
+#   ("strip",) - str.strip
+#   ("sub", pattern, replacement) - pattern.sub(replacement, text)
+# any step not listed here is called as it is
+_STEP_OPERATIONS = {normalize_text: (("lower",),),
+                    remove_all_punctuation: (("sub", _PUNCTUATION_PATTERN, ""),),
+                    remove_digits: (("sub", _DIGITS_PATTERN, ""),),
+                    remove_extra_whitespace: (("sub", _WHITESPACE_PATTERN, " "), ("strip",)),
+                    remove_href_pattern: (("sub", _HREF_PATTERN, ""),)}
+
+# patterns that match exactly one character no matter what surrounds it. Removing the characters 
+# matched by one of these patterns can't create or break a match for another, so consecutive 
+# removals can be done in a single pass by joining the patterns with "|"
+_SINGLE_CHARACTER_PATTERNS = {_PUNCTUATION_PATTERN, _DIGITS_PATTERN}
+
+
+class CleaningPipeline:
+    """Applies an ordered list of cleaning functions to text, using precompiled patterns and 
+    combining consecutive removals of single characters (e.g., digits and punctuation) into one 
+    regex pass.
+
+    The result is the same as calling the functions one after another.
+
+    Parameters
+    -----------
+    steps : list of functions
+        The functions to apply, in order. These are usually the functions in this module, but any
+        function that takes and returns a string can be used.
+
+    Example
+    --------
+    Input:
+        cleaner = CleaningPipeline([normalize_text, remove_digits, remove_all_punctuation, remove_extra_whitespace])
+        cleaner("Tekken 8 is   OUT!!")
+
+    Output:
+        'tekken is out'
+    
+    """
+
+    def __init__(self, steps=DEFAULT_CLEANING_STEPS):
+        self.steps = tuple(steps)
+        self.operations = _fuse_operations(operation for step in self.steps 
+                                           for operation in _STEP_OPERATIONS.get(step, (("call", step),)))
+        self._functions = tuple(_operation_function(operation) for operation in self.operations)
+
+    def __repr__(self):
+        return f"CleaningPipeline(steps=[{', '.join(step.__name__ for step in self.steps)}])"
+
+    def __call__(self, text):
+        return self.clean(text)
+
+    def clean(self, text):
+        """Cleans a single string of text.
+
+        Parameters
+        -----------
+        text : str
+            A string of text.
+
+        Returns
+        --------
+        text : str
+            The cleaned string of text.
+
+        """
+        for function in self._functions:
+            text = function(text)
+
+        return text
+
+    def transform(self, texts):
+        """Cleans each string in a list, pandas Series or any other iterable.
+
+        Parameters
+        -----------
+        texts : list, pandas Series or iterable
+            The strings of text to clean.
+
+        Returns
+        --------
+        texts : list, pandas Series or iterator
+            A list for a list input, a Series with the same index for a Series input, otherwise an 
+            iterator that cleans each string as it is consumed.
+
+        """
+        if isinstance(texts, list):
+            return [self.clean(text) for text in texts]
+
+        if hasattr(texts, "map") and hasattr(texts, "index"):
+            return texts.map(self.clean)
+
+        return map(self.clean, texts)
+
+
+def clean_series(series, steps=DEFAULT_CLEANING_STEPS, dtype=object):
+    """Cleans a pandas Series of text, running each step over the whole column at once with the
+    `Series.str` methods where possible.
+
+    Lower casing and the regex steps (digits, punctuation, whitespace and href) are vectorised, 
+    steps without a `Series.str` equivalent (e.g., `process_contractions`, `remove_emojis`, 
+    `remove_website_links`) are applied to each element. As with `CleaningPipeline`, consecutive single 
+    character removals are done in one pass.
+
+    Parameters
+    -----------
+    series : pandas Series
+        The strings of text to clean.
+
+    steps : list of functions
+        The cleaning functions to apply, in order.
+
+    dtype : str or type
+        The dtype the series is converted to before cleaning. With "string[pyarrow]" lower casing 
+        and stripping run in Arrow's compute kernels, which is faster but may treat a few unusual 
+        unicode characters differently to Python (see Notes).
+
+    Returns
+    --------
+    series : pandas Series
+        The cleaned strings of text, with the same index as the input.
+
+    Notes
+    ------
+    With the default `object` dtype the result is the same as applying the functions one after 
+    another with `.apply`, except that missing values are left as missing rather than raising an 
+    error. The regex steps always use Python's `re` module (the patterns are precompiled), so they 
+    give the same result for any dtype.
+
+    """
+    series = series.astype(dtype)
+
+    for operation in CleaningPipeline(steps).operations:
+        if operation[0] == "lower":
+            series = series.str.lower()
+        elif operation[0] == "strip":
+            series = series.str.strip()
+        elif operation[0] == "sub":
+            series = series.str.replace(operation[1], operation[2], regex=True)
+        else:
+            series = series.map(operation[1], na_action="ignore")
+
+    return series
+
+
+def _fuse_operations(operations):
+    """Helper function that combines consecutive single character removals into one operation.
+    Used as a helper for `CleaningPipeline`.
+    
+    """
+    single_character_patterns = set(_SINGLE_CHARACTER_PATTERNS)
+    fused = []
+
+    for operation in operations:
+        if (fused and _is_removal(fused[-1], single_character_patterns) 
+                and _is_removal(operation, single_character_patterns)):
+            pattern = re.compile(f"(?:{fused[-1][1].pattern})|(?:{operation[1].pattern})")
+            single_character_patterns.add(pattern)
+            fused[-1] = ("sub", pattern, "")
+        else:
+            fused.append(operation)
+
+    return tuple(fused)
+
+
+def _is_removal(operation, patterns):
+    """Helper function that checks if an operation removes the text matched by one of the patterns.
+    Used as a helper for `_fuse_operations`.
+    
+    """
+    return operation[0] == "sub" and operation[1] in patterns and operation[2] == ""
+
+
+def _operation_function(operation):
+    """Helper function that turns an operation into a function that takes and returns a string. 
+    Used as a helper for `CleaningPipeline`.
     
- return re.sub(pattern, "", text)
+    """
+    if operation[0] == "lower":
+        return str.lower
+    if operation[0] == "strip":
+        return str.strip
+    if operation[0] == "sub":
+        return partial(operation[1].sub, operation[2])
+
+    return operation[1]
@@ -1,6 +1,12 @@
 # text_processing.py
 """Module contains functions that process strings of text:
 
+    `get_pipeline(name)`
+    `warm_up(pipelines)`
+    `model_version()`
+    `annotation_session(pipeline)`
+    `annotate_comment(text)`
+    `process_comments(df, column, batch_size, n_process, cache)`
     `remove_stop_words(text)`
     `tokenize_comment(text)`
     `lemmatize_comment(text)`
@@ -10,9 +16,12 @@
     `part_of_speech_alpha(text)`
     `part_of_speech_shape(text)`
     `part_of_speech_is_stop(text)`
+    `load_tekken_character_names(path)`
+    `CharacterNameFilter(names, possessives, s_endings)`
     `remove_tekken_character_names_from_tokens(tokens)`
     `remove_tiny_tokens(tokens)`
     `unique_words_from_tokens(tokens)`
+    `TokenFilter(min_length, stop_words, name_filter, unique)`
     `word_count(text)`
 
     # Not used
@@ -21,14 +30,314 @@
 
 """
 
-import spacy
-nlp = spacy.load("en_core_web_sm")
+from collections import OrderedDict
+from contextlib import contextmanager
+from functools import lru_cache
+from pathlib import Path
+
+MODEL_NAME = "en_core_web_sm"
+
+# components left out of the model for each task, so each function only runs what it needs:
+#   "tokenizer" - tokens and lexical attributes (is_stop, is_alpha, shape)
+#   "tagger"    - adds the tagger, attribute ruler and lemmatizer (lemmas, pos, tags)
+#   "parser"    - adds the dependency parser
+PIPELINE_EXCLUDES = {"tokenizer": ["tok2vec", "tagger", "parser", "senter", "attribute_ruler", "lemmatizer", "ner"],
+                     "tagger": ["parser", "senter", "ner"],
+                     "parser": ["senter", "ner"]}
+
+# pipelines ordered from the smallest to the largest, an annotation from a pipeline can be reused 
+# by any function that needs a pipeline earlier in the list
+PIPELINE_ORDER = ("tokenizer", "tagger", "parser")
+
+_pipelines = {}
+
+# one name per line, edit this file (or pass another to `load_tekken_character_names`) when new 
+# characters are released
+TEKKEN_CHARACTER_NAMES_PATH = Path(__file__).with_name("tekken_character_names.txt")
+
+# endings added to each name so possessives are removed too, e.g. "kazuya's"
+POSSESSIVE_ENDINGS = ("'s", "\u2019s")
+
+# the ending of a possessive once the punctuation has been removed, e.g. "kazuyas". It is only used 
+# when asked for, as it also matches the plurals of names that are ordinary words ("masters", "kings")
+S_ENDING = "s"
+
+
+def get_pipeline(name="parser"):
+    """Returns the spaCy pipeline for a task, loading it the first time it is requested.
+
+    Parameters
+    ----------
+    name : str
+        One of the keys of `PIPELINE_EXCLUDES`: "tokenizer", "tagger" or "parser".
+
+    Returns
+    -------
+    nlp : spaCy Language object
+        `MODEL_NAME` loaded without the components listed in `PIPELINE_EXCLUDES[name]`.
+    
+    """
+    if name not in _pipelines:
+        import spacy   # imported here so the helpers that don't use spaCy can be imported without it
+        _pipelines[name] = spacy.load(MODEL_NAME, exclude=PIPELINE_EXCLUDES[name])
+
+    return _pipelines[name]
+
+
+def warm_up(pipelines=PIPELINE_ORDER):
+    """Loads the spaCy pipelines up front rather than on the first call that needs them.
+
+    Useful for long-lived workers, and before starting a pool of processes so the forked workers 
+    share the loaded models instead of each loading their own.
+
+    Parameters
+    ----------
+    pipelines : iterable of str
+        The names of the pipelines to load, see `PIPELINE_EXCLUDES`.
+
+    Returns
+    -------
+    None
+    
+    """
+    for name in pipelines:
+        get_pipeline(name)
+
+
+def model_version():
+    """Returns the name and version of the spaCy model and of spaCy itself, e.g. for keying cached 
+    results (see `src.processing.comment_cache`).
+
+    Returns
+    -------
+    version : str
+        e.g. "en_core_web_sm-3.7.1 (spaCy 3.7.2)"
+    
+    """
+    import spacy
+    meta = get_pipeline("tokenizer").meta
+
+    return f"{meta['lang']}_{meta['name']}-{meta['version']} (spaCy {spacy.__version__})"
+
+
+def __getattr__(name):
+    """Keeps `from src.processing.text_processing import nlp` working now the model is only loaded 
+    when it is first needed.
+    
+    """
+    if name == "nlp":
+        return get_pipeline("parser")
+
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+# number of annotated comments kept in memory so that the per-attribute functions below can share a
+# single spaCy parse of a comment. Only used outside `annotation_session`: the notebooks apply the 
+# functions one column at a time, so once there are more comments than this the oldest annotations 
+# are always evicted before they are reused
+ANNOTATION_CACHE_SIZE = 2 ** 17
+
+_annotation_cache = OrderedDict()
+
+# the pipeline level of each `annotation_session` block currently open, the cache isn't bounded 
+# while any are
+_session_levels = []
+
+# dataframe column written by `process_comments` for each key of an annotation
+ANNOTATION_COLUMNS = {"tokens": "textTokenized",
+                      "lemmas": "textLemmatized",
+                      "pos": "pos",
+                      "pos_tags": "posTag",
+                      "dep_tags": "posDependency",
+                      "shape": "posShape",
+                      "alpha": "posAlpha",
+                      "stop_word": "posStopWord"}
+
+
+@contextmanager
+def annotation_session(pipeline="tokenizer"):
+    """Keeps every annotation made inside the block, so each comment is only parsed once however 
+    many of the per-attribute functions are applied to it and however many comments there are. The 
+    annotations are cleared at the end of the block.
+
+    Parameters
+    ----------
+    pipeline : str
+        The smallest pipeline each comment is parsed with inside the block (see `PIPELINE_ORDER`). 
+        Pass the largest pipeline any of the functions applied will need, e.g. "parser" before 
+        `part_of_speech_dependency`, so comments tokenized first aren't parsed again when a later 
+        column needs more.
+
+    Example
+    --------
+        with annotation_session("parser"):
+            df["textTokenized"] = df["textStopWordsRemoved"].apply(tokenize_comment)
+            df["textLemmatized"] = df["textStopWordsRemoved"].apply(lemmatize_comment)
+            df["pos"] = df["textStopWordsRemoved"].apply(part_of_speech)
+
+    Notes
+    ------
+    Every comment's annotation is held in memory until the end of the block. For large datasets 
+    `process_comments` is faster and only holds the columns it adds.
+    
+    """
+    _session_levels.append(PIPELINE_ORDER.index(pipeline))
+    try:
+        yield
+    finally:
+        _session_levels.pop()
+        if not _session_levels:
+            _annotation_cache.clear()
+
+
+def annotate_comment(text):
+    """Uses spaCy to parse the input text once and return every token level attribute used by
+    the project.
+
+    NOTE: the spaCy model is loaded the first time it is needed, see `get_pipeline`.
+
+    Parameters
+    ----------
+    text : str
+        A string of text.
+
+    Returns
+    -------
+    annotation : dict
+        A dictionary of lists, each with one value per token of the input text:
+        "tokens", "lemmas", "pos", "pos_tags", "dep_tags", "shape", "alpha" and "stop_word".
+
+    Notes
+    ------
+    The annotation is cached, so calling several of the functions in this module on the same text 
+    only parses it once. Outside `annotation_session` only the last `ANNOTATION_CACHE_SIZE` texts 
+    are kept, so applying the functions column by column to more comments than that parses each 
+    comment again for every column.
+    
+    """
+    return {key: list(values) for key, values in _annotate(text).items()}
+
+
+def process_comments(df, column="textDisplay", batch_size=1000, n_process=1, cache=None):
+    """Streams a column of comments through spaCy's `nlp.pipe` and adds the stop word, token, 
+    lemma and part of speech columns to the dataframe in one go.
+
+    The comments are parsed in batches rather than row by row with `.apply`, and spaCy can spread 
+    the batches over several worker processes.
+
+    NOTE: the spaCy model is loaded the first time it is needed, see `get_pipeline`.
+
+    Parameters
+    ----------
+    df : pandas dataframe
+        A dataframe containing the comments.
+
+    column : str
+        The name of the column containing the (cleaned) comments.
+
+    batch_size : int
+        The number of comments spaCy processes at a time.
+
+    n_process : int
+        The number of processes spaCy uses to parse the comments, -1 uses every available CPU.
+
+    cache : CommentCache
+        Where the processed version of each comment is stored, see `src.processing.comment_cache`. 
+        Only the comments that aren't in it (new or edited comments) are parsed. None to parse 
+        every comment. Use a cache that only `process_comments` stores records in, keyed with 
+        `model_version()`.
+
+    Returns
+    -------
+    df : pandas dataframe
+        A copy of the input dataframe with the "textStopWordsRemoved" column and the columns in 
+        `ANNOTATION_COLUMNS` added.
+
+    Notes
+    ------
+    As in the notebooks, the stop words are removed first and the tokens, lemmas and part of speech 
+    attributes are taken from the text without stop words i.e., the result is the same as:
+        df["textStopWordsRemoved"] = df[column].apply(remove_stop_words)
+        df["textTokenized"] = df["textStopWordsRemoved"].apply(tokenize_comment)
+        df["textLemmatized"] = df["textStopWordsRemoved"].apply(lemmatize_comment)
+        df["pos"] = df["textStopWordsRemoved"].apply(part_of_speech)
+        ...
+    
+    """
+    df = df.copy()
+    texts = df[column].tolist()
+
+    if cache is None:
+        records = _process_texts(texts, batch_size, n_process)
+    else:
+        records = cache.process(texts, lambda missing_texts: _process_texts(missing_texts, batch_size, n_process))
+
+    df["textStopWordsRemoved"] = [record["textStopWordsRemoved"] for record in records]
+    for key, column_name in ANNOTATION_COLUMNS.items():
+        df[column_name] = [list(record[key]) for record in records]
+
+    return df
+
+
+def _process_texts(texts, batch_size, n_process):
+    """Helper function that removes the stop words from each comment and then annotates it, 
+    returning a record for each comment with the text without stop words and the annotation's 
+    lists. Used as a helper for `process_comments`.
+    
+    """
+    docs = get_pipeline("tokenizer").pipe(texts, batch_size=batch_size, n_process=n_process)
+    stop_words_removed = [" ".join(token.text for token in doc if not token.is_stop) for doc in docs]
+
+    docs = get_pipeline("parser").pipe(stop_words_removed, batch_size=batch_size, n_process=n_process)
+
+    return [{"textStopWordsRemoved": text, **{key: list(values) for key, values in _annotate_doc(doc).items()}}
+            for text, doc in zip(stop_words_removed, docs)]
+
+
+def _annotate(text, pipeline="parser"):
+    """Helper function that parses the text with the given pipeline (or the larger pipeline of an 
+    open `annotation_session`) and stores each attribute as a tuple, so the cached annotation can't 
+    be modified by the caller. A cached annotation made by the same or a larger pipeline is returned 
+    without parsing the text again. Used as a helper for `annotate_comment` and the per-attribute 
+    functions.
+    
+    """
+    # the tagger and the parser share the tok2vec layer, so text needing tags is parsed with the 
+    # parser straight away rather than running tok2vec and the tagger again if its dependencies are 
+    # requested later
+    level = max([PIPELINE_ORDER.index("parser" if pipeline == "tagger" else pipeline), *_session_levels])
+    cached = _annotation_cache.get(text)
+
+    if cached is not None and cached[0] >= level:
+        _annotation_cache.move_to_end(text)
+        return cached[1]
+
+    annotation = _annotate_doc(get_pipeline(PIPELINE_ORDER[level])(text))
+    _annotation_cache[text] = (level, annotation)
+    _annotation_cache.move_to_end(text)
+
+    if not _session_levels and len(_annotation_cache) > ANNOTATION_CACHE_SIZE:
+        _annotation_cache.popitem(last=False)
+
+    return annotation
+
+
+def _annotate_doc(doc):
+    """Helper function that extracts the token level attributes from a spaCy Doc in a single 
+    pass over its tokens.
+    
+    """
+    columns = tuple(zip(*((token.text, token.lemma_, token.pos_, token.tag_, token.dep_, token.shape_, 
+                           token.is_alpha, token.is_stop) for token in doc)))
+    if not columns:
+        columns = ((),) * 8
+
+    return dict(zip(("tokens", "lemmas", "pos", "pos_tags", "dep_tags", "shape", "alpha", "stop_word"), columns))
 
 
 def remove_stop_words(text):
     """Uses spaCy to remove the stop words for a given text input.
 
-    NOTE: "nlp = spacy.load("en_core_web_sm")" needs to be defined outside of the function.
+    NOTE: the spaCy model is loaded the first time it is needed, see `get_pipeline`.
 
     Parameters
     ----------
@@ -41,8 +350,9 @@ def remove_stop_words(text):
         The input text with the stop words removed.
     
     """
-    doc = nlp(text)
-    tokens_stop_words_removed = [token.text for token in doc if not token.is_stop]
+    annotation = _annotate(text, "tokenizer")
+    tokens_stop_words_removed = [token for token, is_stop in zip(annotation["tokens"], annotation["stop_word"]) 
+                                 if not is_stop]
     text_stop_words_removed = " ".join(tokens_stop_words_removed)
     
     return text_stop_words_removed
@@ -52,7 +362,7 @@ def remove_stop_words(text):
 def tokenize_comment(text):
     """Uses spaCy to tokenize the string passed as input.
 
-    NOTE: "nlp = spacy.load("en_core_web_sm")" needs to be defined outside of the function.
+    NOTE: the spaCy model is loaded the first time it is needed, see `get_pipeline`.
 
     Parameters
     ----------
@@ -65,8 +375,7 @@ def tokenize_comment(text):
         The input text as a list of tokens.
     
     """
-    doc = nlp(text)
-    tokenized_text = [token.text for token in doc]
+    tokenized_text = list(_annotate(text, "tokenizer")["tokens"])
     
     return tokenized_text
 
@@ -75,7 +384,7 @@ def tokenize_comment(text):
 def lemmatize_comment(text):
     """Uses spaCy to lemmatize (return the base word) for a given text input.
 
-    NOTE: "nlp = spacy.load("en_core_web_sm")" needs to be defined outside of the function.
+    NOTE: the spaCy model is loaded the first time it is needed, see `get_pipeline`.
 
     Parameters
     ----------
@@ -88,8 +397,7 @@ def lemmatize_comment(text):
         The lemmatized versions (base words) of the input text.
     
     """
-    doc = nlp(text)
-    lemmas = [token.lemma_ for token in doc]
+    lemmas = list(_annotate(text, "tagger")["lemmas"])
     
     return lemmas
 
@@ -98,7 +406,7 @@ def lemmatize_comment(text):
 def part_of_speech(text):
     """Uses spaCy to return the simple (universal) Part of Speech tag (noun, adjective, verb etc.) for a given text input.
 
-    NOTE: "nlp = spacy.load("en_core_web_sm")" needs to be defined outside of the function.
+    NOTE: the spaCy model is loaded the first time it is needed, see `get_pipeline`.
 
     Parameters
     ----------
@@ -111,8 +419,7 @@ def part_of_speech(text):
         The simple part of speech for each token of the input text.
     
     """
-    doc = nlp(text)
-    pos = [token.pos_ for token in doc]
+    pos = list(_annotate(text, "tagger")["pos"])
     
     return pos
 
@@ -121,7 +428,7 @@ def part_of_speech(text):
 def part_of_speech_tag(text):
     """Uses spaCy to return the detailed part-of-speech tag Part of Speech tag for a given text input.
 
-    NOTE: "nlp = spacy.load("en_core_web_sm")" needs to be defined outside of the function.
+    NOTE: the spaCy model is loaded the first time it is needed, see `get_pipeline`.
 
     Parameters
     ----------
@@ -134,8 +441,7 @@ def part_of_speech_tag(text):
         The part of speech tags for each token of the input text.
     
     """
-    doc = nlp(text)
-    pos_tags = [token.tag_ for token in doc]
+    pos_tags = list(_annotate(text, "tagger")["pos_tags"])
     
     return pos_tags
 
@@ -144,7 +450,7 @@ def part_of_speech_dependency(text):
     """Uses spaCy to return the syntactic dependency, i.e. the relation between tokens
     for a given text input.
 
-    NOTE: "nlp = spacy.load("en_core_web_sm")" needs to be defined outside of the function.
+    NOTE: the spaCy model is loaded the first time it is needed, see `get_pipeline`.
 
     Parameters
     ----------
@@ -157,8 +463,7 @@ def part_of_speech_dependency(text):
         The dependency tags for each token of the input text.
     
     """
-    doc = nlp(text)
-    dep_tags = [token.dep_ for token in doc]
+    dep_tags = list(_annotate(text, "parser")["dep_tags"])
     
     return dep_tags
 
@@ -166,7 +471,7 @@ def part_of_speech_dependency(text):
 def part_of_speech_alpha(text):
     """Uses spaCy to return a boolean value indicating whether the token is an alphanumeric character.
 
-    NOTE: "nlp = spacy.load("en_core_web_sm")" needs to be defined outside of the function.
+    NOTE: the spaCy model is loaded the first time it is needed, see `get_pipeline`.
 
     Parameters
     ----------
@@ -179,15 +484,14 @@ def part_of_speech_alpha(text):
         The dependency tags for each token of the input text.
     
     """
-    doc = nlp(text)
-    alpha = [token.is_alpha for token in doc]
+    alpha = list(_annotate(text, "tokenizer")["alpha"])
     
     return alpha
 
 def part_of_speech_shape(text):
     """Uses spaCy to return the word shape – capitalization, punctuation, digits.
 
-    NOTE: "nlp = spacy.load("en_core_web_sm")" needs to be defined outside of the function.
+    NOTE: the spaCy model is loaded the first time it is needed, see `get_pipeline`.
 
     Parameters
     ----------
@@ -201,8 +505,7 @@ def part_of_speech_shape(text):
         by 4 lower case characters (e.g., Apple), X.X. for something like U.K.
     
     """
-    doc = nlp(text)
-    shape = [token.shape_ for token in doc]
+    shape = list(_annotate(text, "tokenizer")["shape"])
     
     return shape
 
@@ -210,7 +513,7 @@ def part_of_speech_shape(text):
 def part_of_speech_is_stop(text):
     """Uses spaCy to return a boolean value indicating if the token is a 'stop word'.
 
-    NOTE: "nlp = spacy.load("en_core_web_sm")" needs to be defined outside of the function.
+    NOTE: the spaCy model is loaded the first time it is needed, see `get_pipeline`.
 
     Parameters
     ----------
@@ -223,45 +526,176 @@ def part_of_speech_is_stop(text):
         A true or false value dependent on whether the word is or is not a stop word.
     
     """
-    doc = nlp(text)
-    stop_word = [token.is_stop for token in doc]
+    stop_word = list(_annotate(text, "tokenizer")["stop_word"])
     
     return stop_word
     
 
-def remove_tekken_character_names_from_tokens(tokens: list):
-    """Removes Tekken character names from the comments.
+def load_tekken_character_names(path=TEKKEN_CHARACTER_NAMES_PATH):
+    """Reads the Tekken character names from a text file with one name per line. Blank lines and
+    lines starting with "#" are ignored.
 
     Parameters
     ----------
-    df : pandas dataframe
+    path : str or Path
+        The path of the file, defaults to the list kept alongside this module.
 
     Returns
     -------
-    df : pandas dataframe
-        The input dataframe
+    names : list
+        The lower cased character names.
     
     """
-    tokens_without_character_names = []
-    
-    tekken_character_names = ['akuma', 'alex', 'alisa', 'alves', 'angel', 'anna', 'armor', 'asuka', 'ayane', 'azazel', 'azucena', 'baek', 'bob', 'bobb', 'bosconovich', 
-                              'bosconovitch', 'bruce', 'bryan', 'chang', 'chang', 'chaolan', 'chevalier', 'chloe', 'christie', 'claudio', 'combot', 'craig',
-                              'cyclops', 'de', 'debug', 'devil', 'doctor', 'doo', 'dragunov', 'eddie', 'eddy', 'eddy', 'eddychristie', 'eliza', 'fahkumram',
-                              'feng', 'force', 'forest', 'fox', 'fury', 'ganryu', 'geese', 'gigas', 'gon', 'gordo', 'gordo', 'heihachi', 'howard', 'hwoarang',
-                              'irvin', 'jack', 'jack-7', 'jack-8', 'jin', 'jin', 'jinpachi', 'jinrei', 'josie', 'jr', 'julia', 'jun', 'katarina',
-                              'kazama', 'kazama', 'kazama', 'kazumi', 'kazuya', 'kazuya', 'king', 'king', 'kliesen', 'kuma', 'kunimitsu', 'law', 'lee',
-                              'lei', 'leo', 'leroy', 'lidia', 'lili', 'ling', 'lucky', 'lydia', 'marduk', 'marsxhall', 'master', 'michelle', 'miguel',
-                              'mishima','mishima', 'mishima', 'mokujin', 'monteiro', 'nancy-mi847j', 'negan', 'nina', 'nina williams', 'ninawilliams',
-                              'noctis', 'ogre', 'ogre', 'ortiz', 'pachi', 'panda', 'paul', 'phoenix', 'rachel', 'raven', 'reina', 'richard', 'rizal',
-                              'rochefort', 'roger', 'rojo', 'sake', 'san', 'serafino', 'sergei', 'saheen', 'shaheen', 'smith', 'sobieska', 'soldier', 'steve', 'tekken', 'true',
-                              'trueogre', 'victor', 'violet', 'wang', 'wei', 'williams', 'wulong', 'xiaoyu', 'yoshi', 'yoshimitsu', 'yoshimitsus', 'zafina']
+    with open(path, encoding="utf-8") as file:
+        lines = (line.strip().lower() for line in file)
+        return [line for line in lines if line and not line.startswith("#")]
+
+
+class CharacterNameFilter:
+    """Removes character names from lists of tokens.
+
+    The names are stored in sets when the filter is created, so each token is checked in constant 
+    time. Names with more than one word (e.g., "nina williams") are matched as consecutive tokens.
+
+    Parameters
+    ----------
+    names : iterable of str
+        The names to remove.
 
+    possessives : bool
+        Whether to also remove the possessive form of each name (see `POSSESSIVE_ENDINGS`).
+
+    s_endings : bool
+        Whether to also remove each name followed by a bare "s", e.g. "kazuyas" (a possessive whose
+        apostrophe has been removed). This also removes plurals such as "masters" and "kings", as
+        several names are ordinary words.
+
+    Attributes
+    ----------
+    words : frozenset of str
+        The one word names, with their endings.
+
+    phrases : frozenset of tuples of str
+        The names with more than one word, as tuples of their words.
+
+    phrase_starts : frozenset of str
+        The first word of each name in `phrases`, only tokens in `words` or `phrase_starts` can 
+        start a name.
+
+    Example
+    --------
+    Input:
+        name_filter = CharacterNameFilter(["nina williams", "kazuya"])
+        name_filter(["nina", "williams", "kazuya's", "combo"])
+
+    Output:
+        ['combo']
     
-    filtered_tokens = [word for word in tokens if word not in tekken_character_names]
+    """
+
+    def __init__(self, names, possessives=True, s_endings=False):
+        endings = ("",) + (POSSESSIVE_ENDINGS if possessives else ()) + ((S_ENDING,) if s_endings else ())
+        words = set()
+        phrases = set()
+
+        for name in names:
+            tokens = tuple(name.lower().split())
+            if len(tokens) == 1:
+                words.update(tokens[0] + ending for ending in endings)
+            elif tokens:
+                phrases.update(tokens[:-1] + (tokens[-1] + ending,) for ending in endings)
+
+        self.words = frozenset(words)
+        self.phrases = frozenset(phrases)
+        self.phrase_starts = frozenset(phrase[0] for phrase in self.phrases)
+        self._phrase_lengths = sorted({len(phrase) for phrase in self.phrases}, reverse=True)
+
+    def __call__(self, tokens):
+        """Removes the names from a list of tokens.
+
+        Parameters
+        ----------
+        tokens : list
+            The list of tokens.
+
+        Returns
+        -------
+        filtered_tokens : list
+            The input list without the names.
+        
+        """
+        if not self._phrase_lengths:
+            return [token for token in tokens if token not in self.words]
+
+        filtered_tokens = []
+        index = 0
+        while index < len(tokens):
+            length = self.match_length(tokens, index)
+            if length:
+                index += length
+            else:
+                filtered_tokens.append(tokens[index])
+                index += 1
+
+        return filtered_tokens
+
+    def match_length(self, tokens, index):
+        """Returns the number of tokens taken up by the longest name starting at `index`, or 0 if 
+        no name starts there.
+        
+        """
+        if tokens[index] in self.phrase_starts:
+            for length in self._phrase_lengths:
+                if tuple(tokens[index:index + length]) in self.phrases:
+                    return length
+
+        return 1 if tokens[index] in self.words else 0
+
+    def filter_many(self, token_lists):
+        """Removes the names from each list of tokens in a column.
+
+        Parameters
+        ----------
+        token_lists : list or pandas Series
+            The lists of tokens.
+
+        Returns
+        -------
+        token_lists : list or pandas Series
+            The lists of tokens without the names, a Series (with the same index) for a Series input.
+        
+        """
+        if hasattr(token_lists, "map") and hasattr(token_lists, "index"):
+            return token_lists.map(self)
+
+        return [self(tokens) for tokens in token_lists]
+
+
+@lru_cache(maxsize=None)
+def _tekken_character_name_filter():
+    """Helper function that builds the filter for the names in `TEKKEN_CHARACTER_NAMES_PATH` the 
+    first time it is needed. Used as a helper for `remove_tekken_character_names_from_tokens`.
     
-    tokens_without_character_names.extend(filtered_tokens)
+    """
+    return CharacterNameFilter(load_tekken_character_names(), possessives=False)
+
+
+def remove_tekken_character_names_from_tokens(tokens: list):
+    """Removes Tekken character names (see `TEKKEN_CHARACTER_NAMES_PATH`) from a list of tokens. 
+    Only exact matches are removed, use `CharacterNameFilter` to also remove possessive forms.
+
+    Parameters
+    ----------
+    tokens : list
+        The list of tokens.
 
-    return filtered_tokens
+    Returns
+    -------
+    filtered_tokens : list
+        The input list without Tekken character names.
+    
+    """
+    return _tekken_character_name_filter()(tokens)
 
 
 def remove_tiny_tokens(tokens):
@@ -298,11 +732,98 @@ def unique_words_from_tokens(tokens):
     
     
     """
-    unique_words_list = []
-    [unique_words_list.append(x) for x in tokens if x not in unique_words_list]
+    unique_words_list = list(dict.fromkeys(tokens))   # dictionaries keep insertion order, so the first occurrence of each word is kept
     return unique_words_list
 
 
+class TokenFilter:
+    """Removes short tokens, stop words, names and (optionally) duplicates from a list of tokens 
+    in one call, only looking names up when a token could start one.
+
+    Parameters
+    ----------
+    min_length : int
+        Tokens with fewer characters are removed, 3 gives the same result as `remove_tiny_tokens`.
+
+    stop_words : iterable of str
+        Tokens to remove.
+
+    name_filter : CharacterNameFilter
+        A filter whose names are removed, e.g. `CharacterNameFilter(load_tekken_character_names())`.
+
+    unique : bool
+        Whether to only keep the first occurrence of each token, as `unique_words_from_tokens` does.
+
+    Example
+    --------
+    Input:
+        token_filter = TokenFilter(min_length=3, name_filter=CharacterNameFilter(["kazuya"]), unique=True)
+        token_filter(["kazuya", "combo", "is", "combo", "broken"])
+
+    Output:
+        ['combo', 'broken']
+
+    Notes
+    ------
+    Names are matched once the short tokens and stop words have been removed, so with 
+    `min_length=3` and the filter used by `remove_tekken_character_names_from_tokens` the result is 
+    the same as `remove_tekken_character_names_from_tokens(remove_tiny_tokens(tokens))` (a name 
+    made of several words is removed even if a short token was between its words).
+    
+    """
+
+    def __init__(self, min_length=3, stop_words=(), name_filter=None, unique=False):
+        self.min_length = min_length
+        self.stop_words = frozenset(stop_words)
+        self.name_filter = name_filter
+        self.unique = unique
+        # tokens that could be (the start of) a name, the name filter is only run if one of these is left
+        self._name_tokens = (name_filter.words | name_filter.phrase_starts) if name_filter is not None else frozenset()
+
+    def __call__(self, tokens):
+        """Filters a list of tokens.
+
+        Parameters
+        ----------
+        tokens : list
+            The list of tokens.
+
+        Returns
+        -------
+        filtered_tokens : list
+            The tokens that passed every filter, in their original order.
+        
+        """
+        filtered_tokens = [token for token in tokens if len(token) >= self.min_length and token not in self.stop_words]
+
+        if not self._name_tokens.isdisjoint(filtered_tokens):
+            filtered_tokens = self.name_filter(filtered_tokens)
+
+        if self.unique:
+            filtered_tokens = list(dict.fromkeys(filtered_tokens))   # keeps the first occurrence of each token
+
+        return filtered_tokens
+
+    def filter_many(self, token_lists):
+        """Filters each list of tokens in a column.
+
+        Parameters
+        ----------
+        token_lists : list or pandas Series
+            The lists of tokens.
+
+        Returns
+        -------
+        token_lists : list or pandas Series
+            The filtered lists of tokens, a Series (with the same index) for a Series input.
+        
+        """
+        if hasattr(token_lists, "map") and hasattr(token_lists, "index"):
+            return token_lists.map(self)
+
+        return [self(tokens) for tokens in token_lists]
+
+
 
 def word_count(text):
     """Splits a string of a text by a space, turns it into a list and returns
@@ -0,0 +1,220 @@
+# comment_store.py
+"""Module contains functions that store the raw and processed comment datasets as typed Parquet
+files rather than CSV:
+
+    `write_comments(df, path)`
+    `read_comments(path, columns, memory_map)`
+    `read_comments_table(path, columns, memory_map)`
+    `read_comments_csv(path)`
+    `csv_to_parquet(csv_path, parquet_path)`
+
+The list columns (e.g. `textLemmatized`, `pos`) are stored as native lists, rather than the
+stringified Python lists in the CSV files, so they don't need `ast.literal_eval`-ing when loaded.
+The part of speech columns are dictionary encoded and the timestamps are stored as UTC.
+
+Example
+--------
+    from src.storage.comment_store import csv_to_parquet, read_comments
+
+    csv_to_parquet("data/processed/new_character_reveal_processed.csv",
+                   "data/processed/new_character_reveal_processed.parquet")
+
+    # only the requested columns are read from the file
+    df = read_comments("data/processed/new_character_reveal_processed.parquet",
+                       columns=["textProcessedCharactersRemoved"])
+
+Notes
+------
+Needs `pyarrow`.
+
+"""
+
+import ast
+
+import pandas as pd
+
+
+# columns holding a list of strings for each comment
+STRING_LIST_COLUMNS = ["textTokenized", "textLemmatized", "textTekkenCharactersRemoved", "posShape"]
+
+# columns holding a list of part of speech labels for each comment. There are only a few dozen
+# distinct labels, so each one is stored once and referred to by an integer (dictionary encoding)
+LABEL_LIST_COLUMNS = ["pos", "posTag", "posDependency"]
+
+# columns holding a list of booleans for each comment
+BOOL_LIST_COLUMNS = ["posAlpha", "posStopWord"]
+
+TIMESTAMP_COLUMNS = ["publishedAt", "updatedAt"]
+
+INTEGER_COLUMNS = ["likeCount", "totalReplyCount", "textDisplayWordCount"]
+
+
+def write_comments(df, path):
+    """Writes a comments dataframe to a Parquet file.
+
+    Parameters
+    ----------
+    df : dataframe
+        The comments, e.g. the raw comments from `get_top_level_comments` or the processed comments.
+        The list columns can hold lists or stringified lists (as read from the CSV files).
+
+    path : str or Path
+        The file to write to.
+
+    Returns
+    -------
+    None
+
+    """
+    import pyarrow.parquet as pq
+
+    pq.write_table(_comments_table(df), path)
+
+
+def read_comments(path, columns=None, memory_map=True):
+    """Reads comments from a Parquet file written by `write_comments`.
+
+    Parameters
+    ----------
+    path : str or Path
+        The file to read.
+
+    columns : list of str
+        The columns to read, None for every column. Only these columns are read from the file.
+
+    memory_map : bool
+        Whether to memory map the file rather than reading it into memory first.
+
+    Returns
+    -------
+    df : dataframe
+        The comments, with a Python list in each row of the list columns and the timestamps as
+        `datetime64[ns, UTC]`.
+
+    """
+    table = read_comments_table(path, columns, memory_map)
+    list_columns = set(STRING_LIST_COLUMNS + LABEL_LIST_COLUMNS + BOOL_LIST_COLUMNS)
+
+    # `to_pandas` would turn each list into a numpy array, so the list columns are converted separately
+    df = table.drop_columns([name for name in table.column_names if name in list_columns]).to_pandas()
+    for position, name in enumerate(table.column_names):
+        if name in list_columns:
+            df.insert(position, name, table.column(name).to_pylist())
+
+    return df
+
+
+def read_comments_table(path, columns=None, memory_map=True):
+    """Reads comments from a Parquet file written by `write_comments` as a pyarrow Table, without
+    converting them to a dataframe.
+
+    Parameters
+    ----------
+    path : str or Path
+        The file to read.
+
+    columns : list of str
+        The columns to read, None for every column.
+
+    memory_map : bool
+        Whether to memory map the file rather than reading it into memory first.
+
+    Returns
+    -------
+    table : pyarrow Table
+        The comments.
+
+    """
+    import pyarrow.parquet as pq
+
+    return pq.read_table(path, columns=columns, memory_map=memory_map)
+
+
+def read_comments_csv(path):
+    """Reads comments from one of the CSV files, turning the stringified lists back into lists and
+    the timestamps into UTC timestamps.
+
+    Parameters
+    ----------
+    path : str or Path
+        The CSV file to read.
+
+    Returns
+    -------
+    df : dataframe
+        The comments.
+
+    """
+    df = pd.read_csv(path)
+
+    for column in STRING_LIST_COLUMNS + LABEL_LIST_COLUMNS + BOOL_LIST_COLUMNS:
+        if column in df.columns:
+            df[column] = df[column].map(ast.literal_eval, na_action="ignore")
+
+    for column in TIMESTAMP_COLUMNS:
+        if column in df.columns:
+            df[column] = pd.to_datetime(df[column], utc=True).astype("datetime64[ns, UTC]")
+
+    return df
+
+
+def csv_to_parquet(csv_path, parquet_path):
+    """Converts one of the comment CSV files to a Parquet file.
+
+    Parameters
+    ----------
+    csv_path : str or Path
+        The CSV file to read.
+
+    parquet_path : str or Path
+        The Parquet file to write.
+
+    Returns
+    -------
+    None
+
+    """
+    write_comments(read_comments_csv(csv_path), parquet_path)
+
+
+def _comments_table(df):
+    """Helper function that converts a comments dataframe to a pyarrow Table with the column types
+    described at the top of the module. Used as a helper for `write_comments`.
+
+    """
+    import pyarrow as pa
+
+    arrays = {}
+
+    for column in df.columns:
+        values = df[column]
+
+        if column in STRING_LIST_COLUMNS:
+            arrays[column] = pa.array(_as_lists(values), type=pa.list_(pa.string()))
+
+        elif column in LABEL_LIST_COLUMNS:
+            labels = pa.array(_as_lists(values), type=pa.list_(pa.string()))
+            arrays[column] = pa.ListArray.from_arrays(labels.offsets, labels.values.dictionary_encode(),
+                                                      mask=labels.is_null())
+
+        elif column in BOOL_LIST_COLUMNS:
+            arrays[column] = pa.array(_as_lists(values), type=pa.list_(pa.bool_()))
+
+        elif column in TIMESTAMP_COLUMNS:
+            arrays[column] = pa.array(pd.to_datetime(values, utc=True), type=pa.timestamp("ns", tz="UTC"))
+
+        elif column in INTEGER_COLUMNS:
+            arrays[column] = pa.array(values, type=pa.int64())
+
+        else:
+            arrays[column] = pa.array(values, from_pandas=True)
+
+    return pa.table(arrays)
+
+
+def _as_lists(values):
+    """Helper function that returns the values of a list column as lists, parsing any stringified
+    lists (as stored in the CSV files). Used as a helper for `_comments_table`.
+
+    """
+    return [ast.literal_eval(value) if isinstance(value, str) else value for value in values]
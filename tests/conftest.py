@@ -0,0 +1,170 @@
+# conftest.py
+"""A local fake of the parts of the YouTube Data API the fetch functions use, so they can be tested
+without a key or network access.
+
+"""
+
+import threading
+import urllib.parse
+from datetime import datetime, timedelta
+
+import pytest
+
+
+def timestamp(minutes):
+    """An RFC 3339 timestamp `minutes` after the start of the fake's comments."""
+    return (datetime(2023, 11, 1) + timedelta(minutes=minutes)).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+class FakeRequest:
+    """Stands in for a googleapiclient HttpRequest."""
+
+    def __init__(self, service, resource, parameters):
+        self.service = service
+        self.methodId = f"youtube.{resource}.list"
+        self.uri = f"https://youtube.googleapis.com/youtube/v3/{resource}?" + urllib.parse.urlencode(
+            {**parameters, "key": "API_KEY"}, doseq=True)
+        self._resource = resource
+        self._parameters = parameters
+
+    def execute(self, **kwargs):
+        return self.service.respond(self._resource, self._parameters)
+
+
+class FakeResource:
+    def __init__(self, service, name):
+        self.service = service
+        self.name = name
+
+    def list(self, **parameters):
+        return FakeRequest(self.service, self.name, parameters)
+
+
+class FakeYouTube:
+    """A service with `videos` videos of `comments` comments each, one minute apart. Comment j of
+    each video has `j % (max_replies + 1)` replies. Pages hold `page_size` items, newest first.
+
+    Videos for `videos().list` and `search().list` are added with `add_video`. A search returns 
+    at most `search_cap` results, newest first, however many videos match.
+
+    Every request is recorded in `requests`, and `fail_after` requests are answered before the
+    rest raise `ConnectionError`.
+
+    """
+
+    def __init__(self, videos=3, comments=120, max_replies=0, page_size=50, fail_after=None, search_cap=500):
+        self.page_size = page_size
+        self.search_cap = search_cap
+        self.fail_after = fail_after
+        self.requests = []
+        self.edited = {}   # commentId -> (updatedAt minutes, new text)
+        self.video_items = {}   # videoId -> videos resource
+        self._lock = threading.Lock()
+        self.threads = {f"v{video}": [self._thread(f"v{video}", j, max_replies) for j in range(comments)]
+                        for video in range(videos)}
+
+    def commentThreads(self):
+        return FakeResource(self, "commentThreads")
+
+    def comments(self):
+        return FakeResource(self, "comments")
+
+    def videos(self):
+        return FakeResource(self, "videos")
+
+    def search(self):
+        return FakeResource(self, "search")
+
+    def add_video(self, video_id, minutes, title="Tekken 8 trailer", tags=None, statistics=None, channel_id="ch0"):
+        """Adds a video published `minutes` after the start, with the given snippet tags (left out 
+        if None) and statistics (every count 1 if None).
+        
+        """
+        snippet = {"channelTitle": f"channel {channel_id}", "channelId": channel_id, "publishedAt": timestamp(minutes),
+                   "title": title, "description": f"description of {video_id}"}
+        if tags is not None:
+            snippet["tags"] = tags
+        if statistics is None:
+            statistics = {"viewCount": "1", "likeCount": "1", "commentCount": "1", "favoriteCount": "0"}
+        self.video_items[video_id] = {"id": video_id, "snippet": snippet, "statistics": statistics}
+
+    def edit(self, comment_id, minutes, text):
+        """Edits a comment, giving it a new updatedAt and text."""
+        self.edited[comment_id] = (minutes, text)
+
+    def respond(self, resource, parameters):
+        with self._lock:
+            if self.fail_after is not None and len(self.requests) >= self.fail_after:
+                raise ConnectionError("the fake service is down")
+            self.requests.append((resource, dict(parameters)))
+
+        if resource == "videos":
+            ids = parameters["id"].split(",") if isinstance(parameters["id"], str) else parameters["id"]
+            return self._page([self.video_items[video_id] for video_id in ids if video_id in self.video_items],
+                              parameters)
+
+        if resource == "search":
+            # both ends of the date range are inclusive, as they are for the API
+            after, before = parameters["publishedAfter"], parameters["publishedBefore"]
+            matches = sorted((item for item in self.video_items.values()
+                              if item["snippet"]["channelId"] == parameters["channelId"]
+                              and after <= item["snippet"]["publishedAt"] <= before),
+                             key=lambda item: item["snippet"]["publishedAt"], reverse=True)
+            response = self._page([{"id": {"kind": "youtube#video", "videoId": item["id"]}}
+                                   for item in matches[:self.search_cap]], parameters)
+            response["pageInfo"] = {"totalResults": len(matches), "resultsPerPage": self.page_size}
+            return response
+
+        if resource == "commentThreads":
+            threads = [self._edited(thread) for thread in reversed(self.threads[parameters["videoId"]])]
+            if "replies" not in parameters["part"]:
+                threads = [{key: value for key, value in thread.items() if key != "replies"} for thread in threads]
+            return self._page(threads, parameters)
+
+        parent_id = parameters["parentId"]
+        thread = next(thread for threads in self.threads.values() for thread in threads if thread["id"] == parent_id)
+        return self._page(self._replies(thread), parameters)
+
+    def _thread(self, video_id, j, max_replies):
+        comment_id = f"{video_id}c{j}"
+        thread = {"id": comment_id,
+                  "snippet": {"videoId": video_id,
+                              "totalReplyCount": j % (max_replies + 1),
+                              "topLevelComment": {"id": comment_id,
+                                                  "snippet": {"videoId": video_id,
+                                                              "authorDisplayName": f"@user{j}",
+                                                              "publishedAt": timestamp(j),
+                                                              "updatedAt": timestamp(j),
+                                                              "likeCount": j,
+                                                              "textDisplay": f"comment {j} on {video_id}"}}}}
+        thread["replies"] = {"comments": self._replies(thread)[:5]}
+        return thread
+
+    def _replies(self, thread):
+        snippet = thread["snippet"]["topLevelComment"]["snippet"]
+        j = int(thread["id"].split("c")[-1])
+        return [{"id": f"{thread['id']}.r{k}",
+                 "snippet": {"parentId": thread["id"], "videoId": snippet["videoId"], "authorDisplayName": "@replier",
+                             "publishedAt": timestamp(j + k + 1), "updatedAt": timestamp(j + k + 1), "likeCount": 0,
+                             "textDisplay": f"reply {k} to {thread['id']}"}}
+                for k in range(thread["snippet"]["totalReplyCount"])]
+
+    def _edited(self, thread):
+        if thread["id"] not in self.edited:
+            return thread
+        minutes, text = self.edited[thread["id"]]
+        snippet = {**thread["snippet"]["topLevelComment"]["snippet"], "updatedAt": timestamp(minutes), "textDisplay": text}
+        return {**thread, "snippet": {**thread["snippet"], "topLevelComment": {"id": thread["id"], "snippet": snippet}}}
+
+    def _page(self, items, parameters):
+        start = int(parameters.get("pageToken") or 0)
+        end = start + min(self.page_size, parameters.get("maxResults", self.page_size))
+        response = {"items": items[start:end]}
+        if end < len(items):
+            response["nextPageToken"] = str(end)
+        return response
+
+
+@pytest.fixture
+def fake_youtube():
+    return FakeYouTube()
@@ -0,0 +1,86 @@
+# test_annotation_cache.py
+"""Tests that the per-attribute functions in `text_processing` share one spaCy parse of each comment
+when applied a column at a time, as the notebooks do, including when later columns need a larger
+pipeline than earlier ones. A blank English pipeline stands in for the
+spaCy model.
+
+"""
+
+from collections import OrderedDict
+
+import pandas as pd
+import pytest
+
+from src.processing import text_processing
+from src.processing.text_processing import (annotation_session, lemmatize_comment, part_of_speech,
+                                            part_of_speech_dependency, part_of_speech_is_stop, part_of_speech_shape,
+                                            remove_stop_words, tokenize_comment)
+
+
+TOKENIZER_HELPERS = [tokenize_comment, part_of_speech_shape, part_of_speech_is_stop, remove_stop_words]
+
+
+@pytest.fixture
+def parses(monkeypatch):
+    """Replaces the spaCy pipelines with a blank English pipeline and records the pipeline each text
+    is parsed with.
+
+    """
+    spacy = pytest.importorskip("spacy")
+    blank = spacy.blank("en")
+    parsed = []
+
+    def get_pipeline(name="parser"):
+        def parse(text):
+            parsed.append((name, text))
+            return blank(text)
+        return parse
+
+    monkeypatch.setattr(text_processing, "get_pipeline", get_pipeline)
+    monkeypatch.setattr(text_processing, "_annotation_cache", OrderedDict())
+    monkeypatch.setattr(text_processing, "ANNOTATION_CACHE_SIZE", 100)
+    return parsed
+
+
+def comments(number):
+    return pd.Series([f"comment number {j} about tekken" for j in range(number)])
+
+
+def test_columns_outside_a_session_reparse_once_the_cache_is_full(parses):
+    texts = comments(150)
+    for helper in TOKENIZER_HELPERS:
+        texts.apply(helper)
+
+    # the cache is smaller than the column, so applying the helpers column by column never reuses it
+    assert len(parses) == 150 * len(TOKENIZER_HELPERS)
+
+
+def test_a_session_parses_each_comment_once(parses):
+    texts = comments(150)
+    with annotation_session():
+        columns = [texts.apply(helper) for helper in TOKENIZER_HELPERS]
+
+    assert len(parses) == 150
+    assert text_processing._annotation_cache == {}
+    assert columns[0][3] == ["comment", "number", "3", "about", "tekken"]
+
+
+NOTEBOOK_ORDER = [tokenize_comment, lemmatize_comment, part_of_speech, part_of_speech_dependency]
+
+
+def test_tags_and_dependencies_share_one_parse(parses):
+    texts = comments(50)
+    for helper in NOTEBOOK_ORDER:
+        texts.apply(helper)
+
+    # tokenizing only runs the tokenizer, the tagged and parsed columns share one parse
+    assert [name for name, _ in parses] == ["tokenizer"] * 50 + ["parser"] * 50
+
+
+def test_a_session_with_the_largest_pipeline_parses_each_comment_once(parses):
+    texts = comments(50)
+    with annotation_session("parser"):
+        for helper in NOTEBOOK_ORDER:
+            texts.apply(helper)
+
+    assert [name for name, _ in parses] == ["parser"] * 50
@@ -0,0 +1,64 @@
+# test_batch_sink.py
+"""Tests for `BatchSink`, writing the batches the fetch functions yield."""
+
+import pandas as pd
+import pytest
+
+from conftest import timestamp
+from src.api.batch_sink import BatchSink
+from src.api.get_youtube_data import COMMENT_COLUMNS, COMMENT_DTYPES, VIDEO_COLUMNS, VIDEO_DTYPES
+
+
+def comments(start, end):
+    return pd.DataFrame([[f"c{j}", "v0", f"@user{j}", timestamp(j), timestamp(j), j, 0, f"comment {j}"]
+                         for j in range(start, end)], columns=COMMENT_COLUMNS).astype(COMMENT_DTYPES)
+
+
+def videos(tags):
+    return pd.DataFrame([["channel", "ch0", f"v{j}", timestamp(j), "title", "description", tag, 1, 1, 1, 0]
+                         for j, tag in enumerate(tags)], columns=VIDEO_COLUMNS).astype(VIDEO_DTYPES)
+
+
+@pytest.mark.parametrize("schema", ["comments", None])
+def test_an_empty_first_batch_is_skipped(tmp_path, schema):
+    path = tmp_path / "comments.parquet"
+    with BatchSink(path, schema=schema) as sink:
+        for batch in [comments(0, 0), comments(0, 3), comments(3, 3), comments(3, 5)]:
+            sink.write(batch)
+
+    pd.testing.assert_frame_equal(pd.read_parquet(path), comments(0, 5), check_dtype=False)
+    assert sink.rows_written == 5
+
+
+def test_a_batch_with_a_column_of_missing_values(tmp_path):
+    path = tmp_path / "videos.parquet"
+    with BatchSink(path, schema="videos") as sink:
+        sink.write(videos([None, None]))
+        sink.write(videos([["tekken", "reveal"], None]))
+
+    assert pd.read_parquet(path)["tags"].map(lambda tags: None if tags is None else list(tags)).tolist() == [
+        None, None, ["tekken", "reveal"], None]
+
+
+@pytest.mark.parametrize("suffix", [".csv", ".parquet"])
+def test_the_file_is_overwritten_when_the_sink_is_opened(tmp_path, suffix):
+    path = tmp_path / f"comments{suffix}"
+    with BatchSink(path, schema="comments") as sink:
+        sink.write(comments(0, 3))
+
+    with BatchSink(path, schema="comments"):
+        pass
+
+    if suffix == ".csv":
+        assert path.read_text() == ""
+    else:
+        assert len(pd.read_parquet(path)) == 0
+
+
+def test_csv_has_one_header(tmp_path):
+    path = tmp_path / "comments.csv"
+    with BatchSink(path) as sink:
+        for batch in [comments(0, 3), comments(3, 5)]:
+            sink.write(batch)
+
+    assert pd.read_csv(path)["commentId"].tolist() == [f"c{j}" for j in range(5)]
@@ -0,0 +1,52 @@
+# test_character_name_filter.py
+"""Tests that the character name filter built from the roster file removes the same tokens as the
+list comprehension it replaced, and only removes the extra forms it is asked to.
+
+"""
+
+from pathlib import Path
+
+import pytest
+
+from src.processing.text_processing import (CharacterNameFilter, load_tekken_character_names,
+                                            remove_tekken_character_names_from_tokens)
+from src.storage.comment_store import read_comments_csv
+
+
+PROCESSED_COMMENTS_PATH = Path(__file__).resolve().parents[1] / "data" / "processed" / "new_character_reveal_processed.csv"
+
+# plurals of names that are ordinary words, which must be kept unless `s_endings` is asked for
+PLURALS = ["masters", "kings", "laws", "devils", "angels", "forces", "soldiers", "ravens", "pandas", "des"]
+
+
+@pytest.fixture(scope="module")
+def lemmatized_comments():
+    return read_comments_csv(PROCESSED_COMMENTS_PATH)["textLemmatized"].tolist()
+
+
+def test_legacy_function_matches_the_list_comprehension(lemmatized_comments):
+    names = set(load_tekken_character_names())
+
+    for tokens in lemmatized_comments:
+        assert remove_tekken_character_names_from_tokens(tokens) == [token for token in tokens if token not in names]
+
+
+def test_legacy_function_keeps_plurals_and_possessives():
+    tokens = PLURALS + ["kazuya's", "kazuyas"]
+
+    assert remove_tekken_character_names_from_tokens(tokens) == tokens
+
+
+def test_possessives_and_s_endings_are_opt_in():
+    names = load_tekken_character_names()
+    tokens = ["kazuya", "kazuya's", "kazuya’s", "kazuyas"] + PLURALS
+
+    assert CharacterNameFilter(names, possessives=False)(tokens) == tokens[1:]
+    assert CharacterNameFilter(names)(tokens) == ["kazuyas"] + PLURALS
+    assert CharacterNameFilter(names, s_endings=True)(tokens) == []
+
+
+def test_multi_word_names_are_matched_as_consecutive_tokens():
+    name_filter = CharacterNameFilter(["nina williams", "kazuya"])
+
+    assert name_filter(["nina", "williams", "combo", "williams", "kazuya's"]) == ["combo", "williams"]
@@ -0,0 +1,88 @@
+# test_coherence.py
+"""Tests that `CooccurrenceIndex` scores topics the same as gensim's `CoherenceModel`, for short
+documents (one window each) and for documents longer than the c_v sliding window.
+
+"""
+
+import random
+
+import numpy as np
+import pytest
+
+from src.modeling.coherence import WINDOW_SIZE, CooccurrenceIndex
+
+
+Dictionary = pytest.importorskip("gensim.corpora").Dictionary
+CoherenceModel = pytest.importorskip("gensim.models.coherencemodel").CoherenceModel
+
+
+WORDS = [f"word{number}" for number in range(300)]
+
+
+def short_texts():
+    """Documents of 3 to 12 words drawn from a few overlapping themes, some words repeated."""
+    generator = random.Random(0)
+    themes = [WORDS[start:start + 20] for start in range(0, 100, 15)]
+    return [[generator.choice(theme) for _ in range(generator.randint(3, 12))]
+            for theme in (generator.choice(themes) for _ in range(400))]
+
+
+def long_texts():
+    """Documents up to twice `WINDOW_SIZE` long, so c_v slides a window over them. No word is repeated
+    within a document (see the notes of `CooccurrenceIndex`).
+
+    """
+    generator = random.Random(1)
+    return [generator.sample(WORDS, generator.randint(5, 2 * WINDOW_SIZE)) for _ in range(120)]
+
+
+def model_topics(dictionary, seed):
+    generator = random.Random(seed)
+    vocabulary = sorted(dictionary.token2id)
+    return [generator.sample(vocabulary, 10) for _ in range(5)]
+
+
+def gensim_coherence(topics, texts, dictionary, measure):
+    corpus = [dictionary.doc2bow(text) for text in texts]
+    return CoherenceModel(topics=topics, texts=texts, corpus=corpus, dictionary=dictionary, coherence=measure,
+                          window_size=WINDOW_SIZE if measure == "c_v" else None, processes=1).get_coherence()
+
+
+@pytest.mark.parametrize("measure", ["c_v", "u_mass"])
+@pytest.mark.parametrize("texts", [short_texts(), long_texts(), short_texts() + long_texts()],
+                         ids=["short", "sliding window", "mixed"])
+def test_matches_gensim(texts, measure):
+    dictionary = Dictionary(texts)
+    index = CooccurrenceIndex(texts, [dictionary[token_id] for token_id in range(len(dictionary))])
+    topics = [model_topics(dictionary, seed) for seed in range(3)]
+
+    expected = [gensim_coherence(model, texts, dictionary, measure) for model in topics]
+
+    np.testing.assert_allclose(index.compare(topics, measure), expected, rtol=1e-9, atol=1e-9)
+    assert index.coherence(topics[0], measure) == pytest.approx(expected[0], abs=1e-9)
+
+
+@pytest.mark.parametrize("measure", ["c_v", "u_mass"])
+def test_matches_gensim_with_a_filtered_vocabulary(measure):
+    # tokens left out of the vocabulary still take up their place in the windows
+    texts = short_texts() + long_texts()
+    dictionary = Dictionary(texts)
+    dictionary.filter_extremes(no_below=5, no_above=0.3, keep_n=None)
+    index = CooccurrenceIndex(texts, [dictionary[token_id] for token_id in range(len(dictionary))])
+    topics = [model_topics(dictionary, seed) for seed in range(3)]
+
+    expected = [gensim_coherence(model, texts, dictionary, measure) for model in topics]
+
+    np.testing.assert_allclose(index.compare(topics, measure), expected, rtol=1e-9, atol=1e-9)
+
+
+def test_saved_index_scores_the_same(tmp_path):
+    texts = long_texts()
+    dictionary = Dictionary(texts)
+    index = CooccurrenceIndex(texts, [dictionary[token_id] for token_id in range(len(dictionary))])
+    index.save(tmp_path / "index.npz")
+    loaded = CooccurrenceIndex.load(tmp_path / "index.npz")
+
+    topics = model_topics(dictionary, 0)
+    for measure in ("c_v", "u_mass"):
+        assert loaded.coherence(topics, measure) == index.coherence(topics, measure)
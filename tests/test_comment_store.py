@@ -0,0 +1,80 @@
+# test_comment_store.py
+"""Tests that comments written to Parquet with `write_comments` read back the same as they were
+written, and the same as the CSV files they are converted from.
+
+"""
+
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+from src.storage.comment_store import (LABEL_LIST_COLUMNS, csv_to_parquet, read_comments, read_comments_csv,
+                                       read_comments_table, write_comments)
+
+
+DATA_PATH = Path(__file__).resolve().parents[1] / "data"
+CSV_PATHS = [DATA_PATH / "raw" / "new_character_reveal_comments.csv",
+             DATA_PATH / "processed" / "new_character_reveal_processed.csv"]
+
+pa = pytest.importorskip("pyarrow")
+
+
+@pytest.fixture
+def comments():
+    return pd.DataFrame({
+        "videoId": ["v0", "v0", "v1"],
+        "publishedAt": pd.to_datetime(["2023-11-01 16:09:58", "2023-11-01 16:10:05", "2023-11-02 08:00:00"],
+                                      utc=True).astype("datetime64[ns, UTC]"),
+        "likeCount": [4, 1, 0],
+        "textDisplay": ["Kazuya looks great", "Reina!", ""],
+        "textLemmatized": [["kazuya", "look", "great"], ["reina"], []],
+        "pos": [["PROPN", "VERB", "ADJ"], ["PROPN"], []],
+        "posTag": [["NNP", "VBZ", "JJ"], ["NNP"], []],
+        "posDependency": [["nsubj", "ROOT", "acomp"], ["ROOT"], []],
+        "posAlpha": [[True, True, True], [True], []],
+    })
+
+
+def test_round_trip(comments, tmp_path):
+    path = tmp_path / "comments.parquet"
+    write_comments(comments, path)
+
+    pd.testing.assert_frame_equal(read_comments(path), comments, check_dtype=False)
+    assert read_comments(path)["publishedAt"].dtype == "datetime64[ns, UTC]"
+
+
+def test_part_of_speech_columns_are_dictionary_encoded(comments, tmp_path):
+    path = tmp_path / "comments.parquet"
+    write_comments(comments, path)
+
+    schema = read_comments_table(path).schema
+    for column in LABEL_LIST_COLUMNS:
+        assert pa.types.is_dictionary(schema.field(column).type.value_type)
+    assert read_comments(path)["pos"].tolist() == comments["pos"].tolist()
+
+
+def test_stringified_lists_are_parsed(comments, tmp_path):
+    path = tmp_path / "comments.parquet"
+    stringified = comments.assign(**{column: comments[column].map(str) for column in ["textLemmatized", "pos"]})
+    write_comments(stringified, path)
+
+    pd.testing.assert_frame_equal(read_comments(path), comments, check_dtype=False)
+
+
+def test_only_the_requested_columns_are_read(comments, tmp_path):
+    path = tmp_path / "comments.parquet"
+    write_comments(comments, path)
+
+    df = read_comments(path, columns=["pos", "textDisplay"])
+    assert list(df.columns) == ["pos", "textDisplay"]
+    assert df["pos"].tolist() == comments["pos"].tolist()
+    assert read_comments_table(path, columns=["likeCount"]).column_names == ["likeCount"]
+
+
+@pytest.mark.parametrize("csv_path", CSV_PATHS, ids=lambda path: path.name)
+def test_parquet_matches_the_csv(csv_path, tmp_path):
+    path = tmp_path / "comments.parquet"
+    csv_to_parquet(csv_path, path)
+
+    pd.testing.assert_frame_equal(read_comments(path), read_comments_csv(csv_path))
@@ -0,0 +1,223 @@
+# test_get_youtube_data.py
+"""Tests for finding videos and fetching their comments and data, run against the local fake of the YouTube Data API in `conftest.py`."""
+
+import pandas as pd
+import pytest
+
+from conftest import FakeYouTube, timestamp
+from src.api.crawl_checkpoint import CrawlCheckpoint
+from src.api.get_youtube_data import (comment_high_water_marks, discover_video_ids, get_comment_replies,
+                                     get_top_level_comments, get_video_data, get_video_ids, upsert_comments)
+from src.api.request_executor import RequestExecutor
+from src.api.response_cache import CacheMissError, ResponseCache
+
+
+VIDEO_IDS = ["v0", "v1", "v2"]
+
+
+def test_fetches_every_comment(fake_youtube):
+    df = get_top_level_comments(fake_youtube, VIDEO_IDS)
+
+    assert len(df) == 3 * 120
+    assert df["publishedAt"].is_monotonic_increasing
+    assert set(df["commentId"]) == {f"{video_id}c{j}" for video_id in VIDEO_IDS for j in range(120)}
+    assert len(fake_youtube.requests) == 3 * 3   # three pages of 50 for each video
+
+
+def test_concurrent_fetch_matches_sequential_fetch(fake_youtube):
+    services = []
+
+    def service_factory():
+        services.append(FakeYouTube())
+        return services[-1]
+
+    sequential = get_top_level_comments(fake_youtube, VIDEO_IDS)
+    concurrent = get_top_level_comments(fake_youtube, VIDEO_IDS, max_workers=3, service_factory=service_factory)
+
+    pd.testing.assert_frame_equal(concurrent, sequential)
+    # each worker used its own service rather than the one passed in
+    assert len(fake_youtube.requests) == 9
+    assert 1 <= len(services) <= 3 and sum(len(service.requests) for service in services) == 9
+
+
+def test_several_workers_need_a_service_factory(fake_youtube):
+    with pytest.raises(ValueError, match="service_factory"):
+        get_top_level_comments(fake_youtube, VIDEO_IDS, max_workers=2)
+
+    with pytest.raises(ValueError, match="service_factory"):
+        get_comment_replies(fake_youtube, ["v0c1"], max_workers=2)
+
+
+def test_resume_only_requests_the_missing_pages(tmp_path):
+    executor = RequestExecutor(max_retries=0)
+    expected = get_top_level_comments(FakeYouTube(), VIDEO_IDS)
+
+    with CrawlCheckpoint(tmp_path / "checkpoint.sqlite") as checkpoint:
+        with pytest.raises(ConnectionError):
+            get_top_level_comments(FakeYouTube(fail_after=5), VIDEO_IDS, executor=executor, checkpoint=checkpoint)
+
+        service = FakeYouTube()
+        df = get_top_level_comments(service, VIDEO_IDS, executor=executor, checkpoint=checkpoint, resume=True)
+
+    pd.testing.assert_frame_equal(df, expected)
+    assert len(service.requests) == 9 - 5
+
+
+def test_replies_match_the_reply_counts():
+    service = FakeYouTube(max_replies=8)
+    df, replies = get_top_level_comments(service, VIDEO_IDS, include_replies=True)
+
+    assert len(replies) == df["totalReplyCount"].sum()
+    assert replies.groupby("parentId").size().to_dict() == df.set_index("commentId")["totalReplyCount"].loc[
+        lambda counts: counts > 0].to_dict()
+    # only the comments with more than the 5 inline replies need their own requests
+    assert sum(resource == "comments" for resource, _ in service.requests) == (df["totalReplyCount"] > 5).sum()
+
+
+def test_offline_replay_gives_the_same_comments(tmp_path):
+    with ResponseCache(tmp_path / "responses.sqlite") as cache:
+        expected = get_top_level_comments(FakeYouTube(), VIDEO_IDS, executor=RequestExecutor(cache=cache))
+
+    with ResponseCache(tmp_path / "responses.sqlite", offline=True) as cache:
+        service = FakeYouTube(fail_after=0)
+        df = get_top_level_comments(service, VIDEO_IDS, executor=RequestExecutor(cache=cache))
+
+        with pytest.raises(CacheMissError):
+            get_top_level_comments(service, ["v3"], executor=RequestExecutor(cache=cache))
+
+    pd.testing.assert_frame_equal(df, expected)
+
+
+def test_since_only_fetches_the_new_comments():
+    service = FakeYouTube(videos=1)
+    stored = get_top_level_comments(service, ["v0"])
+    since = comment_high_water_marks(stored)
+
+    service.threads["v0"] += [service._thread("v0", j, 0) for j in range(120, 130)]
+    service.edit("v0c115", 200, "edited on the last page")    # on the same page as the newest stored comments
+    service.edit("v0c20", 200, "edited 100 comments deep")    # only seen by fetching the video in full
+    service.requests.clear()
+
+    new_comments = get_top_level_comments(service, ["v0"], since=since)
+    assert len(service.requests) == 1
+    assert set(new_comments["commentId"]) == {f"v0c{j}" for j in range(119, 130)} | {"v0c115"}
+
+    df = upsert_comments(stored, new_comments)
+    assert len(df) == 130
+    texts = df.set_index("commentId")["textDisplay"]
+    assert texts["v0c115"] == "edited on the last page"
+    assert texts["v0c20"] == "comment 20 on v0"
+
+    df = upsert_comments(df, get_top_level_comments(service, ["v0"]))
+    assert len(df) == 130 and df.set_index("commentId").loc["v0c20", "textDisplay"] == "edited 100 comments deep"
+
+
+def test_upsert_matches_comments_by_comment_id(fake_youtube):
+    stored = get_top_level_comments(fake_youtube, ["v0"])
+    # a different comment by the same author, posted in the same second
+    twin = stored.iloc[[0]].assign(commentId="v0twin", textDisplay="another comment")
+
+    df = upsert_comments(stored, twin)
+    assert len(df) == len(stored) + 1
+
+    with pytest.raises(ValueError, match="commentId"):
+        upsert_comments(stored.drop(columns="commentId"), twin)
+
+
+def test_delta_crawl_and_upsert_match_a_full_crawl():
+    service = FakeYouTube(videos=2)
+    for thread in service.threads["v0"][:3]:   # different comments with the same text are all kept
+        thread["snippet"]["topLevelComment"]["snippet"]["textDisplay"] = "First"
+    stored = get_top_level_comments(service, ["v0", "v1"])
+    assert len(stored) == 2 * 120
+
+    for video_id in ("v0", "v1"):
+        service.threads[video_id] += [service._thread(video_id, j, 0) for j in range(120, 125)]
+    service.edit("v1c118", 200, "edited on the last page")
+
+    df = upsert_comments(stored, get_top_level_comments(service, ["v0", "v1"], since=comment_high_water_marks(stored)))
+    expected = get_top_level_comments(service, ["v0", "v1"])
+
+    pd.testing.assert_frame_equal(df.sort_values(["publishedAt", "commentId"]).reset_index(drop=True),
+                                  expected.sort_values(["publishedAt", "commentId"]).reset_index(drop=True))
+
+
+def test_resumed_delta_crawl_does_not_replay_a_full_crawl(tmp_path):
+    service = FakeYouTube(videos=1)
+    executor = RequestExecutor(max_retries=0)
+
+    with CrawlCheckpoint(tmp_path / "checkpoint.sqlite") as checkpoint:
+        stored = get_top_level_comments(service, ["v0"], executor=executor, checkpoint=checkpoint)
+        service.threads["v0"] += [service._thread("v0", j, 0) for j in range(120, 125)]
+        service.requests.clear()
+
+        new_comments = get_top_level_comments(service, ["v0"], executor=executor, checkpoint=checkpoint,
+                                              resume=True, since=comment_high_water_marks(stored))
+
+    assert set(new_comments["commentId"]) == {f"v0c{j}" for j in range(119, 125)}
+    assert len(service.requests) == 1
+
+
+def test_each_video_gets_its_own_tags():
+    service = FakeYouTube()
+    service.add_video("a", 1, tags=["tekken", "reina"])
+    service.add_video("b", 2, tags=["tekken 8"])
+    service.add_video("c", 3)   # no tags
+
+    df = get_video_data(service, ["a", "b", "c"])
+
+    assert df.set_index("videoId")["tags"].to_dict() == {"a": ["tekken", "reina"], "b": ["tekken 8"], "c": None}
+
+
+def test_missing_statistics_are_nullable_integers():
+    service = FakeYouTube()
+    service.add_video("a", 1, statistics={"viewCount": "10", "likeCount": "3", "commentCount": "2",
+                                          "favoriteCount": "0"})
+    service.add_video("b", 2, statistics={"viewCount": "20", "favoriteCount": "0"})   # hidden likes, comments off
+    service.add_video("c", 3, statistics={})
+
+    df = get_video_data(service, ["a", "b", "c"]).set_index("videoId")
+
+    for column in ["viewCount", "likeCount", "commentCount", "favoriteCount"]:
+        assert df[column].dtype == "Int64"
+    assert df["likeCount"].tolist() == [3, pd.NA, pd.NA]
+    assert df["viewCount"].tolist() == [10, 20, pd.NA]
+
+
+def video_service(search_cap=100):
+    """A fake with 256 videos one minute apart on channel "ch0" and 30 on "ch1"."""
+    service = FakeYouTube(videos=0, search_cap=search_cap)
+    for minutes in range(256):
+        service.add_video(f"ch0-{minutes}", minutes, channel_id="ch0")
+    for minutes in range(30):
+        service.add_video(f"ch1-{minutes}", minutes * 5, channel_id="ch1")
+    return service
+
+
+EXPECTED_VIDEO_IDS = [f"ch0-{minutes}" for minutes in reversed(range(256))] + \
+                     [f"ch1-{minutes}" for minutes in reversed(range(30))]
+
+
+def test_discovery_splits_capped_windows_and_returns_each_video_once():
+    service = video_service()
+    video_ids = discover_video_ids(service, ["ch0", "ch1"], timestamp(0), timestamp(256), max_results=100)
+
+    # the windows are split on videos' publishedAt (minutes 64, 128 and 192), which both neighbouring
+    # windows return
+    assert video_ids == EXPECTED_VIDEO_IDS
+    searches = [parameters for resource, parameters in service.requests if resource == "search"]
+    assert len(searches) > 2
+    assert {parameters["channelId"] for parameters in searches} == {"ch0", "ch1"}
+
+
+def test_without_splitting_the_cap_truncates_the_search():
+    service = video_service()
+
+    assert len(get_video_ids(service, "ch0", timestamp(0), timestamp(256))) == 100
+
+
+def test_concurrent_discovery_matches_sequential_discovery():
+    video_ids = discover_video_ids(video_service(), ["ch0", "ch1"], timestamp(0), timestamp(256), max_results=100,
+                                   max_workers=4, service_factory=video_service)
+
+    assert video_ids == EXPECTED_VIDEO_IDS
@@ -0,0 +1,39 @@
+# test_model_selection.py
+"""Tests for sweeping the number of topics."""
+
+import multiprocessing
+
+import pandas as pd
+import pytest
+
+from src.modeling import model_selection
+from src.modeling.model_selection import SweepResult, sweep_topic_numbers
+from src.modeling.token_corpus import TokenCorpus
+
+
+TEXTS = [["combo", "frame", "punish"], ["trailer", "reveal", "character"], ["combo", "punish", "launcher"],
+         ["reveal", "trailer", "release"], ["frame", "launcher", "combo"], ["character", "release", "trailer"]] * 5
+
+
+def test_sweep_without_fork_shares_the_corpus_with_an_initializer(monkeypatch):
+    pools = []
+
+    class RecordingPool(model_selection.ProcessPoolExecutor):
+        def __init__(self, *args, **kwargs):
+            pools.append(kwargs)
+            super().__init__(*args, **kwargs)
+
+    monkeypatch.setattr(multiprocessing, "get_start_method", lambda *args, **kwargs: "spawn")
+    monkeypatch.setattr(model_selection, "ProcessPoolExecutor", RecordingPool)
+
+    result = sweep_topic_numbers(TokenCorpus(TEXTS), TEXTS, topic_numbers=[2, 3], max_workers=2)
+
+    assert pools[0].get("initializer") is model_selection._share_corpus and "mp_context" not in pools[0]
+    assert list(result.scores.index) == [2, 3]
+
+
+def test_best_model_without_kept_models():
+    result = SweepResult(scores=pd.Series({2: 0.1, 3: 0.2}), topics={}, models={}, vocabulary=[])
+
+    with pytest.raises(ValueError, match="keep_models"):
+        result.best_model
@@ -0,0 +1,35 @@
+# test_pipeline.py
+"""Tests for the pipeline's stage cache keys."""
+
+from datetime import datetime, timezone
+
+from src.pipeline import PipelineConfig
+from src.processing import text_processing
+
+
+def test_annotate_key_changes_with_the_character_names(tmp_path, monkeypatch):
+    config = PipelineConfig()
+    names = tmp_path / "tekken_character_names.txt"
+    names.write_text(text_processing.TEKKEN_CHARACTER_NAMES_PATH.read_text())
+    monkeypatch.setattr(text_processing, "TEKKEN_CHARACTER_NAMES_PATH", names)
+    before = config.stage_config("annotate")
+
+    names.write_text(names.read_text() + "\nreina\n")
+    assert config.stage_config("annotate") != before
+
+
+def test_api_fetch_key_changes_each_day():
+    config = PipelineConfig(channel_ids=["UC_ntXHv-XdKCD7CPynVvnQw"], published_after="2023-11-01T00:00:00Z")
+    today = config.stage_config("fetch")
+
+    assert today["fetch_date"] == datetime.now(timezone.utc).date().isoformat()
+    assert PipelineConfig(channel_ids=config.channel_ids, published_after=config.published_after,
+                          fetch_date="2023-12-21").stage_config("fetch") != today
+
+
+def test_file_fetch_key_only_depends_on_the_file(tmp_path):
+    path = tmp_path / "comments.csv"
+    path.write_text("videoId,textDisplay\nv0,first\n")
+
+    assert PipelineConfig(raw_comments=str(path), fetch_date="2023-12-21").stage_config("fetch") == \
+           PipelineConfig(raw_comments=str(path)).stage_config("fetch")
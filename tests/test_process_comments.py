@@ -0,0 +1,82 @@
+# test_process_comments.py
+"""Tests that `process_comments` gives the same columns as applying the per-function helpers one
+column at a time, gives the same columns with a `CommentCache` as without one, and only parses the
+comments that aren't in the cache. A blank English pipeline stands in for the spaCy model, so the
+tests don't need it installed.
+
+"""
+
+import pandas as pd
+import pytest
+
+from src.processing import text_processing
+from src.processing.comment_cache import CommentCache
+from src.processing.text_processing import ANNOTATION_COLUMNS, process_comments
+
+
+COMMENTS = ["tekken 8 looks amazing", "bring back the old characters", "", "tekken 8 looks amazing",
+            "the trailer was so good i watched it twice"]
+
+
+@pytest.fixture
+def parsed_texts(monkeypatch):
+    """Replaces the spaCy pipelines with a blank English pipeline and records the texts parsed."""
+    spacy = pytest.importorskip("spacy")
+    blank = spacy.blank("en")
+    parsed = []
+
+    class RecordingPipeline:
+        def pipe(self, texts, **kwargs):
+            texts = list(texts)
+            parsed.extend(texts)
+            return blank.pipe(texts)
+
+    monkeypatch.setattr(text_processing, "get_pipeline", lambda name="parser": RecordingPipeline())
+    return parsed
+
+
+def test_cached_output_matches_uncached_output(parsed_texts, tmp_path):
+    df = pd.DataFrame({"textDisplay": COMMENTS})
+    expected = process_comments(df)
+
+    with CommentCache(tmp_path / "comments.sqlite") as cache:
+        first = process_comments(df, cache=cache)
+        second = process_comments(df, cache=cache)
+
+    for result in (first, second):
+        pd.testing.assert_frame_equal(result, expected)
+    assert list(expected.columns) == ["textDisplay", "textStopWordsRemoved", *ANNOTATION_COLUMNS.values()]
+
+
+def test_only_new_comments_are_parsed(parsed_texts, tmp_path):
+    with CommentCache(tmp_path / "comments.sqlite") as cache:
+        process_comments(pd.DataFrame({"textDisplay": COMMENTS}), cache=cache)
+        parsed_texts.clear()
+
+        process_comments(pd.DataFrame({"textDisplay": COMMENTS + ["a new comment"]}), cache=cache)
+
+        # the new comment is parsed once by the stop word pipeline and once by the annotating pipeline
+        assert len(parsed_texts) == 2
+        assert cache.stats()["hits"] == len(COMMENTS)
+
+
+def test_batched_columns_match_the_per_function_columns(monkeypatch):
+    spacy = pytest.importorskip("spacy")
+    blank = spacy.blank("en")
+    monkeypatch.setattr(text_processing, "get_pipeline", lambda name="parser": blank)
+
+    df = pd.DataFrame({"textDisplay": COMMENTS})
+    expected = df.copy()
+    with text_processing.annotation_session():
+        expected["textStopWordsRemoved"] = expected["textDisplay"].apply(text_processing.remove_stop_words)
+        for function, column in [(text_processing.tokenize_comment, "textTokenized"),
+                                 (text_processing.lemmatize_comment, "textLemmatized"),
+                                 (text_processing.part_of_speech, "pos"),
+                                 (text_processing.part_of_speech_tag, "posTag"),
+                                 (text_processing.part_of_speech_dependency, "posDependency"),
+                                 (text_processing.part_of_speech_shape, "posShape"),
+                                 (text_processing.part_of_speech_alpha, "posAlpha"),
+                                 (text_processing.part_of_speech_is_stop, "posStopWord")]:
+            expected[column] = expected["textStopWordsRemoved"].apply(function)
+
+    pd.testing.assert_frame_equal(process_comments(df), expected)
@@ -0,0 +1,72 @@
+# test_remove_website_links.py
+"""Regression tests for the linear-time `remove_website_links`, which should remove exactly the same
+text as the regex it replaced.
+
+"""
+
+import random
+import re
+import time
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+from src.processing.text_cleaning import remove_website_links
+
+
+RAW_COMMENTS_PATH = Path(__file__).resolve().parents[1] / "data" / "raw" / "new_character_reveal_comments.csv"
+
+# the regex `remove_website_links` used to be
+LINK_PATTERN = re.compile(r"(https?:\/\/)?([\da-z\.-]+)\.([a-z\.]{2,6})([\/\w \.-]*)*\/?")
+
+EXAMPLES = ["check out https://www.bandainamcoent.com/games/tekken-8 for more",
+            "http://example.com and https://example.org/path/to/page.html",
+            "go to youtube.com/watch?v=abc123 now",
+            "no links here, just tekken 8",
+            "e.g. mr.x said a.b.c is 1.5 times better",
+            "https://",
+            "http://http://example.com",
+            "trailing dot example.",
+            "-.-.-.-ab",
+            "a.bc",
+            "",
+            "UPPER.CASE links.ARE kept.Mostly",
+            "link then text example.com/path more words here. and more.net"]
+
+
+def _random_texts(count, seed=0):
+    """Random strings built from the characters the pattern treats differently."""
+    rng = random.Random(seed)
+    alphabet = "abch.-/:_ 1AZ?é" + "tps"
+    return ["".join(rng.choice(alphabet) for _ in range(rng.randint(0, 40))) for _ in range(count)]
+
+
+@pytest.mark.parametrize("text", EXAMPLES)
+def test_matches_the_regex_on_examples(text):
+    assert remove_website_links(text) == LINK_PATTERN.sub("", text)
+
+
+def test_matches_the_regex_on_the_raw_comments():
+    comments = pd.read_csv(RAW_COMMENTS_PATH)["textDisplay"].tolist()
+
+    for text in comments + [comment.lower() for comment in comments]:
+        assert remove_website_links(text) == LINK_PATTERN.sub("", text), text
+
+
+def test_matches_the_regex_on_random_strings():
+    for text in _random_texts(20_000):
+        assert remove_website_links(text) == LINK_PATTERN.sub("", text), text
+
+
+def test_adversarial_input_is_linear():
+    # a long run of host characters without a top level domain makes the regex backtrack
+    # quadratically (about 12s at this length), the scanner should take milliseconds
+    text = "a-" * 20_000
+
+    start = time.perf_counter()
+    assert remove_website_links(text) == text
+    assert time.perf_counter() - start < 0.5
+
+    short = "a-" * 500
+    assert remove_website_links(short) == LINK_PATTERN.sub("", short)
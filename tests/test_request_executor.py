@@ -0,0 +1,113 @@
+# test_request_executor.py
+"""Tests for `RequestExecutor`, run against a stub request that fails a set number of times before
+it succeeds.
+
+"""
+
+import json
+import time
+
+import httplib2
+import pytest
+from googleapiclient.errors import HttpError
+
+from src.api.request_executor import QuotaExceededError, RequestExecutor
+
+
+class StubRequest:
+    """Raises each of `errors` in turn, then returns `response`."""
+
+    def __init__(self, *errors, response=None):
+        self.errors = list(errors)
+        self.response = response if response is not None else {"items": []}
+        self.calls = 0
+
+    def execute(self):
+        self.calls += 1
+        if self.errors:
+            raise self.errors.pop(0)
+        return self.response
+
+
+def http_error(status, reason=None):
+    content = {"error": {"code": status, "errors": [{"reason": reason}] if reason else []}}
+    return HttpError(httplib2.Response({"status": status}), json.dumps(content).encode("utf-8"))
+
+
+@pytest.fixture
+def executor():
+    return RequestExecutor(max_retries=3, backoff_base=0)
+
+
+@pytest.mark.parametrize("error", [http_error(500), http_error(503), http_error(429),
+                                   http_error(403, "rateLimitExceeded"), http_error(403, "userRateLimitExceeded"),
+                                   ConnectionError("reset"), TimeoutError("timed out")])
+def test_temporary_errors_are_retried_until_they_succeed(executor, error):
+    request = StubRequest(error, error, response={"items": [1]})
+
+    assert executor.execute(request) == {"items": [1]}
+    assert request.calls == 3
+    assert executor.retries == 2 and executor.requests_made == 3 and executor.quota_used == 3
+
+
+def test_errors_are_raised_once_the_retries_run_out(executor):
+    request = StubRequest(*[http_error(500)] * 4)
+
+    with pytest.raises(HttpError):
+        executor.execute(request)
+    assert request.calls == 4
+
+
+@pytest.mark.parametrize("reason", ["quotaExceeded", "dailyLimitExceeded"])
+def test_quota_exceeded_is_not_retried(executor, reason):
+    request = StubRequest(http_error(403, reason))
+
+    with pytest.raises(QuotaExceededError):
+        executor.execute(request)
+    assert request.calls == 1 and executor.retries == 0
+
+
+@pytest.mark.parametrize("error", [http_error(404, "notFound"), http_error(403, "forbidden"), http_error(400)])
+def test_other_errors_are_raised_immediately(executor, error):
+    request = StubRequest(error)
+
+    with pytest.raises(HttpError):
+        executor.execute(request)
+    assert request.calls == 1 and executor.retries == 0
+
+
+def test_quota_limit_is_enforced():
+    executor = RequestExecutor(backoff_base=0, quota_limit=250)
+    request = StubRequest()
+
+    executor.execute(request, cost=100)
+    executor.execute(request, cost=100)
+    with pytest.raises(QuotaExceededError, match="quota limit of 250"):
+        executor.execute(request, cost=100)
+
+    executor.execute(request, cost=50)
+    assert request.calls == 3 and executor.quota_used == 250
+
+
+def test_token_bucket_makes_calls_wait():
+    executor = RequestExecutor(backoff_base=0, units_per_second=50, burst=1)
+    request = StubRequest()
+
+    start = time.monotonic()
+    for _ in range(5):
+        executor.execute(request)
+
+    # the first request uses the full bucket, each one after it waits 1/50 s for a unit
+    assert time.monotonic() - start >= 4 / 50 * 0.9
+    assert request.calls == 5
+
+
+def test_without_a_rate_limit_calls_do_not_wait():
+    executor = RequestExecutor(backoff_base=0)
+    request = StubRequest()
+
+    start = time.monotonic()
+    for _ in range(100):
+        executor.execute(request, cost=100)
+
+    assert time.monotonic() - start < 0.5
@@ -0,0 +1,75 @@
+# test_text_cleaning.py
+"""Tests that `CleaningPipeline` and `clean_series` give the same text as applying the cleaning
+functions one after another, as the prepare-data notebook does.
+
+"""
+
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+from src.processing.text_cleaning import (DEFAULT_CLEANING_STEPS, CleaningPipeline, clean_series, normalize_text,
+                                          remove_all_punctuation, remove_digits, remove_emojis,
+                                          remove_extra_whitespace, remove_href_pattern, remove_html_unescape)
+
+
+RAW_COMMENTS_PATH = Path(__file__).resolve().parents[1] / "data" / "raw" / "new_character_reveal_comments.csv"
+
+# orders of steps that fuse differently, e.g. digits and punctuation next to each other are one pass
+STEP_ORDERS = [DEFAULT_CLEANING_STEPS,
+               (remove_all_punctuation, remove_digits, normalize_text),
+               (remove_digits, remove_emojis, remove_all_punctuation, remove_extra_whitespace),
+               (remove_html_unescape, remove_href_pattern, remove_digits, remove_all_punctuation, remove_digits),
+               (remove_extra_whitespace, remove_extra_whitespace, normalize_text)]
+
+
+@pytest.fixture(scope="module")
+def raw_comments():
+    return pd.read_csv(RAW_COMMENTS_PATH)["textDisplay"]
+
+
+def _chained(texts, steps):
+    """Applies each step to the whole column in turn, as in the notebooks."""
+    for step in steps:
+        texts = texts.apply(step)
+    return texts
+
+
+@pytest.mark.parametrize("steps", STEP_ORDERS)
+def test_pipeline_matches_chained_functions(raw_comments, steps):
+    expected = _chained(raw_comments, steps)
+    cleaner = CleaningPipeline(steps)
+
+    assert [cleaner(text) for text in raw_comments] == expected.tolist()
+
+
+@pytest.mark.parametrize("steps", STEP_ORDERS)
+def test_clean_series_matches_chained_functions(raw_comments, steps):
+    expected = _chained(raw_comments, steps)
+
+    # clean_series converts to `object` first, the chained functions keep the column's dtype
+    pd.testing.assert_series_equal(clean_series(raw_comments, steps), expected, check_dtype=False)
+
+
+def test_transform_keeps_the_input_type(raw_comments):
+    cleaner = CleaningPipeline()
+    texts = raw_comments.head(20)
+
+    assert cleaner.transform(texts.tolist()) == _chained(texts, DEFAULT_CLEANING_STEPS).tolist()
+    pd.testing.assert_series_equal(cleaner.transform(texts), _chained(texts, DEFAULT_CLEANING_STEPS))
+    assert list(cleaner.transform(iter(texts))) == _chained(texts, DEFAULT_CLEANING_STEPS).tolist()
+
+
+def test_consecutive_single_character_removals_are_fused():
+    cleaner = CleaningPipeline([remove_digits, remove_all_punctuation, remove_extra_whitespace])
+
+    assert len(cleaner.operations) == 3   # one removal, then whitespace's sub and strip
+    assert cleaner("Tekken 8 is   OUT!!") == "Tekken is OUT"
+
+
+def test_clean_series_leaves_missing_values():
+    cleaned = clean_series(pd.Series(["Tekken 8!", None]), [normalize_text, remove_digits, remove_extra_whitespace])
+
+    assert cleaned[0] == "tekken !"
+    assert pd.isna(cleaned[1])
@@ -0,0 +1,77 @@
+# test_token_corpus.py
+"""Tests that `TokenCorpus` filters, counts and saves the comments' tokens the same way as gensim's
+`Dictionary`.
+
+"""
+
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from src.modeling.token_corpus import TokenCorpus
+from src.storage.comment_store import read_comments_csv
+
+
+PROCESSED_COMMENTS_PATH = Path(__file__).resolve().parents[1] / "data" / "processed" / "new_character_reveal_processed.csv"
+
+gensim_corpora = pytest.importorskip("gensim.corpora")
+
+
+@pytest.fixture(scope="module")
+def texts():
+    return read_comments_csv(PROCESSED_COMMENTS_PATH)["textTekkenCharactersRemoved"].tolist()
+
+
+@pytest.mark.parametrize("no_below, no_above, keep_n", [(1, 1.0, None), (3, 0.85, 5000), (2, 0.5, 100),
+                                                        (5, 0.05, 20)])
+def test_filter_extremes_keeps_the_same_vocabulary_as_gensim(texts, no_below, no_above, keep_n):
+    dictionary = gensim_corpora.Dictionary(texts)
+    dictionary.filter_extremes(no_below=no_below, no_above=no_above, keep_n=keep_n)
+
+    corpus = TokenCorpus(texts).filter_extremes(no_below=no_below, no_above=no_above, keep_n=keep_n)
+
+    assert set(corpus.vocabulary) == set(dictionary.token2id)
+    assert {token: corpus.document_frequencies[token_id] for token, token_id in corpus.token_ids.items()} == \
+           {token: dictionary.dfs[token_id] for token, token_id in dictionary.token2id.items()}
+
+
+def test_csr_rows_match_doc2bow(texts):
+    corpus = TokenCorpus(texts).filter_extremes(no_below=3, no_above=0.85)
+    dictionary = corpus.to_gensim_dictionary()
+    matrix = corpus.to_csr()
+
+    assert matrix.shape == (len(texts), len(corpus.vocabulary))
+    for row, tokens in enumerate(texts):
+        start, end = matrix.indptr[row], matrix.indptr[row + 1]
+        assert list(zip(matrix.indices[start:end].tolist(), matrix.data[start:end].tolist())) == \
+               dictionary.doc2bow(tokens)
+    assert list(corpus) == [dictionary.doc2bow(tokens) for tokens in texts]
+
+
+def test_save_and_load_round_trip(texts, tmp_path):
+    corpus = TokenCorpus(texts)
+    corpus.save(tmp_path / "corpus.npz")
+    loaded = TokenCorpus.load(tmp_path / "corpus.npz")
+
+    assert loaded.vocabulary == corpus.vocabulary and loaded.token_ids == corpus.token_ids
+    np.testing.assert_array_equal(loaded.ids, corpus.ids)
+    np.testing.assert_array_equal(loaded.offsets, corpus.offsets)
+    np.testing.assert_array_equal(loaded.document_frequencies, corpus.document_frequencies)
+    assert [loaded.tokens(index) for index in range(len(loaded))] == texts
+
+
+def test_adding_documents_after_load_matches_building_in_one_go(texts, tmp_path):
+    half = len(texts) // 2
+    TokenCorpus(texts[:half]).save(tmp_path / "corpus.npz")
+
+    loaded = TokenCorpus.load(tmp_path / "corpus.npz")
+    loaded.add_documents(texts[half:])
+    loaded.add_documents([["a", "brand", "new", "token", "brand"]])
+    expected = TokenCorpus(texts + [["a", "brand", "new", "token", "brand"]])
+
+    assert loaded.vocabulary == expected.vocabulary
+    np.testing.assert_array_equal(loaded.ids, expected.ids)
+    np.testing.assert_array_equal(loaded.offsets, expected.offsets)
+    np.testing.assert_array_equal(loaded.document_frequencies, expected.document_frequencies)
+    assert loaded.tokens(-1) == ["a", "brand", "new", "token", "brand"]
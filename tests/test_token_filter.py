@@ -0,0 +1,50 @@
+# test_token_filter.py
+"""Tests that `TokenFilter` gives the same tokens as the functions it replaces applied one after
+another.
+
+"""
+
+import pytest
+
+from src.processing.text_processing import (CharacterNameFilter, TokenFilter, load_tekken_character_names,
+                                            remove_tekken_character_names_from_tokens, remove_tiny_tokens,
+                                            unique_words_from_tokens)
+
+
+TOKENS = [
+    ["nina", "williams", "combo", "is", "broken"],
+    ["nina", "is", "williams"],                       # a tiny token between the words of a name
+    ["williams", "nina", "kazuya", "jr", "de"],
+    ["Nina", "Williams", "KAZUYA", "Kazuya", "kazuya"],
+    ["nina", "nina", "williams", "williams"],
+    ["nina"],
+    ["ok", "go", "x"],
+    [],
+    ["kazuya's", "reveal", "trailer", "reveal", "kazuya"],
+]
+
+
+@pytest.fixture(scope="module")
+def legacy_name_filter():
+    return CharacterNameFilter(load_tekken_character_names(), possessives=False)
+
+
+@pytest.mark.parametrize("tokens", TOKENS)
+def test_matches_the_chained_functions(tokens, legacy_name_filter):
+    token_filter = TokenFilter(min_length=3, name_filter=legacy_name_filter)
+
+    assert token_filter(tokens) == remove_tekken_character_names_from_tokens(remove_tiny_tokens(tokens))
+
+
+@pytest.mark.parametrize("tokens", TOKENS)
+def test_unique_matches_the_chained_functions(tokens, legacy_name_filter):
+    token_filter = TokenFilter(min_length=3, name_filter=legacy_name_filter, unique=True)
+
+    assert token_filter(tokens) == unique_words_from_tokens(
+        remove_tekken_character_names_from_tokens(remove_tiny_tokens(tokens)))
+
+
+def test_names_are_lower_cased_but_tokens_are_not():
+    token_filter = TokenFilter(min_length=3, name_filter=CharacterNameFilter(["Nina Williams"]))
+
+    assert token_filter(["nina", "williams", "Nina", "Williams", "nina", "williams's"]) == ["Nina", "Williams"]